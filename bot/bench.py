@@ -0,0 +1,247 @@
+"""
+Микро-бенчмарки бота. Запуск из папки bot/:
+
+    python bench.py dispatch [--events N] [--chats N] [--workers N]
+    python bench.py db [--ops N]
+    python bench.py ngram [--messages N] [--corpus FILE]
+    python bench.py tokenize [--lines N] [--corpus FILE]
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from core.dispatcher import EventDispatcher
+
+
+def bench_dispatch(args):
+    """Проигрывает пачку событий через диспетчер и печатает задержку p50/p99."""
+    order_violations = []
+    last_seen = {}
+
+    def handler(event):
+        # Имитируем вызов VK API / БД
+        time.sleep(random.uniform(0.001, 0.02))
+        if last_seen.get(event.peer_id, -1) > event.seq:
+            order_violations.append(event)
+        last_seen[event.peer_id] = event.seq
+
+    async def replay():
+        dispatcher = EventDispatcher(handler, workers=args.workers)
+        await dispatcher.start()
+        started = time.monotonic()
+        for seq in range(args.events):
+            peer_id = 2000000000 + random.randrange(args.chats)
+            await dispatcher.submit(peer_id, SimpleNamespace(peer_id=peer_id, seq=seq))
+        await dispatcher.join()
+        elapsed = time.monotonic() - started
+        await dispatcher.stop()
+        return dispatcher, elapsed
+
+    dispatcher, elapsed = asyncio.run(replay())
+    stats = dispatcher.stats()
+    print(f"Событий: {args.events}, чатов: {args.chats}, воркеров: {args.workers}")
+    print(f"Время: {elapsed:.2f} с ({args.events / elapsed:.0f} событий/с)")
+    print(f"Задержка диспетчеризации: {stats['dispatch_latency']}")
+    print(f"Время обработки: {stats['handle_time']}")
+    print(f"Нарушений порядка внутри чата: {len(order_violations)}")
+
+
+def bench_db(args):
+    """Сравнивает ops/sec чтения и записи ролей: соединение на каждый вызов против общего пула."""
+    from core import db
+    import database
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, 'bench.db')
+        database.init_db()
+        user_ids = list(range(1, 501))
+        database.set_users_role(user_ids, 'user')
+
+        def naive_get_role(vk_id):
+            # Старая схема: новое соединение на каждый запрос
+            conn = sqlite3.connect(db.DB_PATH)
+            cursor = conn.cursor()
+            cursor.execute("SELECT vk_id, role FROM users WHERE vk_id = ?", (vk_id,))
+            row = cursor.fetchone()
+            conn.close()
+            return row
+
+        def naive_set_role(vk_id):
+            conn = sqlite3.connect(db.DB_PATH)
+            cursor = conn.cursor()
+            cursor.execute("UPDATE users SET role = ? WHERE vk_id = ?", ('user', vk_id))
+            conn.commit()
+            conn.close()
+
+        cases = [
+            ("чтение роли, connect на вызов", naive_get_role, args.ops),
+            ("чтение роли, пул", lambda vk_id: db.fetchone("SELECT vk_id, role FROM users WHERE vk_id = ?", (vk_id,)), args.ops),
+            ("чтение роли, кэш ролей", database.get_user_role, args.ops),
+            ("запись роли, connect на вызов", naive_set_role, args.ops // 10),
+            ("запись роли, пул", lambda vk_id: database.set_user_role(vk_id, 'user'), args.ops // 10),
+        ]
+        for name, func, ops in cases:
+            started = time.perf_counter()
+            for i in range(ops):
+                func(user_ids[i % len(user_ids)])
+            elapsed = time.perf_counter() - started
+            print(f"{name:32} {ops / elapsed:12.0f} ops/s")
+        db.close_all()
+
+
+def _synthetic_messages(count: int) -> list[list[str]]:
+    """Сообщения из словаря с распределением Ципфа - похоже на живой чат по частотам слов."""
+    vocabulary = [f"слово{i}" for i in range(5000)]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    return [random.choices(vocabulary, weights, k=random.randint(3, 20)) for _ in range(count)]
+
+
+def bench_ngram(args):
+    """Память и скорость генерации n-граммной модели Сглыпы для порядков 1..3."""
+    from core.ngram import NGramModel, MIN_ORDER, MAX_ORDER
+    from core.markov_sampler import CompiledSampler
+
+    if args.corpus:
+        from core.tokenizer import tokenize
+        with open(args.corpus, encoding='utf-8') as f:
+            messages = [words for words, _ in map(tokenize, f) if len(words) >= 2][:args.messages]
+    else:
+        messages = _synthetic_messages(args.messages)
+    print(f"Сообщений: {len(messages)}, генераций: {args.generations}")
+
+    # Старая генерация: random.choices по словарю словарей на каждом шаге
+    bigrams = {}
+    for words in messages:
+        for current_word, next_word in zip(words, words[1:]):
+            transitions = bigrams.setdefault(current_word, {})
+            transitions[next_word] = transitions.get(next_word, 0) + 1
+
+    def legacy_generate(length=15):
+        current_word = random.choice(list(bigrams.keys()))
+        result = [current_word]
+        for _ in range(length - 1):
+            if current_word not in bigrams:
+                break
+            current_word = random.choices(list(bigrams[current_word].keys()), weights=list(bigrams[current_word].values()))[0]
+            result.append(current_word)
+        return result
+
+    started = time.perf_counter()
+    for _ in range(args.generations):
+        legacy_generate()
+    elapsed = time.perf_counter() - started
+    print(f"{'биграммы, random.choices':28} {'':>12} {'':>12} {args.generations / elapsed:12.0f} генераций/с")
+
+    for order in range(MIN_ORDER, MAX_ORDER + 1):
+        tracemalloc.start()
+        model = NGramModel(order, max_transitions=args.budget)
+        for words in messages:
+            model.learn(words)
+        model_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        sampler = CompiledSampler(model.tables, model.order)
+        started = time.perf_counter()
+        for _ in range(args.generations):
+            sampler.generate(15)
+        elapsed = time.perf_counter() - started
+
+        per_10k = model_bytes / len(messages) * 10000 / 1024 / 1024
+        print(f"{f'порядок {order}':28} {len(model):12} перех. {per_10k:8.1f} МБ/10k {args.generations / elapsed:12.0f} генераций/с")
+
+
+_CHAT_WORDS = (
+    "привет как дела ну да нет ахах лол кек сглыпа бот сегодня завтра вообще кстати короче "
+    "щас пост игра персонаж урон бой ход кто где когда почему ладно ок спасибо жесть имба"
+).split()
+_CHAT_TAILS = ("", "!", "?", "...", ")))", " :D", " 😂", " 🔥🔥")
+
+
+def _synthetic_chat_lines(count: int) -> list[str]:
+    """Строки, похожие на русский чат: пунктуация, смайлы, ссылки, упоминания и повторы."""
+    lines = []
+    for _ in range(count):
+        if lines and random.random() < 0.3:
+            # В чатах часто повторяют недавние сообщения
+            lines.append(random.choice(lines[-50:]))
+            continue
+        words = random.choices(_CHAT_WORDS, k=random.randint(2, 15))
+        if random.random() < 0.1:
+            words.append(f"https://vk.com/wall-{random.randint(1, 10 ** 6)}")
+        if random.random() < 0.1:
+            words.insert(0, f"[id{random.randint(1, 10 ** 6)}|Имя],")
+        line = ' '.join(words) + random.choice(_CHAT_TAILS)
+        lines.append(line.capitalize() if random.random() < 0.5 else line)
+    return lines
+
+
+def bench_tokenize(args):
+    """Пропускная способность токенизатора Сглыпы: три re.sub на строках против одного общего выражения."""
+    from core import tokenizer
+
+    if args.corpus:
+        with open(args.corpus, encoding='utf-8') as f:
+            lines = [line.rstrip('\n') for line in f][:args.lines]
+    else:
+        lines = _synthetic_chat_lines(args.lines)
+
+    def legacy(text):
+        # Старый clean_text + отдельная нормализация для детектора мемов
+        text_key = text.strip().lower()
+        text = re.sub(r'https?://\S+', '', text)
+        text = re.sub(r'\[id\d+\|.*?\]', '', text)
+        text = re.sub(r'[^a-zA-Zа-яА-ЯёЁ\s]', '', text).lower()
+        return text.split(), text_key
+
+    cases = [
+        ("3 x re.sub (старый clean_text)", legacy),
+        ("одно выражение", tokenizer.tokenize),
+    ]
+    print(f"Строк: {len(lines)}")
+    for name, func in cases:
+        started = time.perf_counter()
+        for line in lines:
+            func(line)
+        elapsed = time.perf_counter() - started
+        print(f"{name:32} {len(lines) / elapsed:12.0f} строк/с")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Микро-бенчмарки бота")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    dispatch = subparsers.add_parser("dispatch", help="Задержка диспетчера событий под нагрузкой")
+    dispatch.add_argument("--events", type=int, default=2000)
+    dispatch.add_argument("--chats", type=int, default=20)
+    dispatch.add_argument("--workers", type=int, default=8)
+    dispatch.set_defaults(func=bench_dispatch)
+
+    db_bench = subparsers.add_parser("db", help="Пропускная способность доступа к SQLite")
+    db_bench.add_argument("--ops", type=int, default=20000)
+    db_bench.set_defaults(func=bench_db)
+
+    ngram = subparsers.add_parser("ngram", help="Память на 10k сообщений и скорость генерации Сглыпы")
+    ngram.add_argument("--messages", type=int, default=10000)
+    ngram.add_argument("--generations", type=int, default=5000)
+    ngram.add_argument("--budget", type=int, default=10 ** 9, help="Бюджет переходов на модель")
+    ngram.add_argument("--corpus", help="Текстовый файл, одно сообщение на строку")
+    ngram.set_defaults(func=bench_ngram)
+
+    tokenize = subparsers.add_parser("tokenize", help="Пропускная способность токенизатора Сглыпы")
+    tokenize.add_argument("--lines", type=int, default=100000)
+    tokenize.add_argument("--corpus", help="Текстовый файл, одно сообщение на строку")
+    tokenize.set_defaults(func=bench_tokenize)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+import os
+import logging
+import threading
+from collections import OrderedDict, deque
+
+from core.utils import send_message
+
+# --- Настройки исполнителя AI-задач ---
+# Сколько запросов к каждой модели выполняется одновременно
+MODEL_CONCURRENCY = {
+    "deepseek-chat": int(os.getenv("AI_CONCURRENCY_DEEPSEEK_CHAT", 4)),
+    "deepseek-r1": int(os.getenv("AI_CONCURRENCY_DEEPSEEK_R1", 2)),
+    "gpt-image-1": int(os.getenv("AI_CONCURRENCY_GPT_IMAGE", 1)),
+}
+DEFAULT_CONCURRENCY = 2
+# Максимум задач, ожидающих в очереди одной модели
+MAX_QUEUED_JOBS = int(os.getenv("AI_MAX_QUEUED_JOBS", 30))
+# Максимум задач в очереди от одного чата (чтобы один чат не занял всю очередь)
+MAX_QUEUED_JOBS_PER_CHAT = int(os.getenv("AI_MAX_QUEUED_JOBS_PER_CHAT", 3))
+
+
+class QueueFullError(Exception):
+    """Очередь модели (или чата) переполнена, задача не принята."""
+
+
+class _ModelLane:
+    """
+    Очередь и фиксированный набор потоков-воркеров для одной модели.
+    Чаты обслуживаются по кругу: после каждой задачи чат уходит в конец очереди,
+    поэтому один шумный чат не задерживает остальные.
+    """
+    def __init__(self, model: str, concurrency: int, max_queued: int, max_per_chat: int):
+        self.model = model
+        self.concurrency = concurrency
+        self.max_queued = max_queued
+        self.max_per_chat = max_per_chat
+        # { peer_id: deque[job] } - порядок ключей задаёт очередь обхода чатов
+        self._queues = OrderedDict()
+        self._queued = 0
+        self._active = 0
+        self._completed = 0
+        self._rejected = 0
+        self._cond = threading.Condition()
+        self._threads = []
+
+    def _ensure_workers(self):
+        while len(self._threads) < self.concurrency:
+            thread = threading.Thread(
+                target=self._worker,
+                name=f"ai-{self.model}-{len(self._threads)}",
+                daemon=True,
+            )
+            self._threads.append(thread)
+            thread.start()
+
+    def _position_for(self, peer_id) -> int:
+        """Сколько задач будет запущено раньше новой задачи этого чата."""
+        own = len(self._queues.get(peer_id, ()))
+        ahead = own
+        for other_peer_id, chat_queue in self._queues.items():
+            if other_peer_id != peer_id:
+                ahead += min(len(chat_queue), own + 1)
+        return ahead
+
+    def submit(self, peer_id: int, job) -> int:
+        """
+        Ставит задачу в очередь. Возвращает позицию в очереди:
+        0 - задача начнёт выполняться сразу, N - перед ней N задач.
+        """
+        with self._cond:
+            chat_queue = self._queues.get(peer_id)
+            if self._queued >= self.max_queued or (chat_queue and len(chat_queue) >= self.max_per_chat):
+                self._rejected += 1
+                raise QueueFullError(self.model)
+
+            free_workers = self.concurrency - self._active
+            position = self._position_for(peer_id) + 1 - free_workers
+            if chat_queue is None:
+                chat_queue = self._queues[peer_id] = deque()
+            chat_queue.append(job)
+            self._queued += 1
+            self._ensure_workers()
+            self._cond.notify()
+        return max(position, 0)
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._queues:
+                    self._cond.wait()
+                peer_id, chat_queue = next(iter(self._queues.items()))
+                job = chat_queue.popleft()
+                # Чат переходит в конец круга (или выбывает, если задач больше нет)
+                del self._queues[peer_id]
+                if chat_queue:
+                    self._queues[peer_id] = chat_queue
+                self._queued -= 1
+                self._active += 1
+            try:
+                job()
+            except Exception as e:
+                logging.error(f"Ошибка в AI-задаче модели {self.model} для чата {peer_id}: {e}", exc_info=True)
+            finally:
+                with self._cond:
+                    self._active -= 1
+                    self._completed += 1
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                'concurrency': self.concurrency,
+                'active': self._active,
+                'queued': self._queued,
+                'queued_chats': len(self._queues),
+                'completed': self._completed,
+                'rejected': self._rejected,
+            }
+
+
+class AIJobExecutor:
+    """Исполнитель AI-задач с ограничением параллелизма по моделям и ограниченной очередью."""
+    def __init__(self, concurrency: dict | None = None, max_queued: int = MAX_QUEUED_JOBS,
+                 max_per_chat: int = MAX_QUEUED_JOBS_PER_CHAT):
+        self.concurrency = dict(MODEL_CONCURRENCY if concurrency is None else concurrency)
+        self.max_queued = max_queued
+        self.max_per_chat = max_per_chat
+        self._lanes = {}
+        self._lock = threading.Lock()
+
+    def _lane(self, model: str) -> _ModelLane:
+        with self._lock:
+            lane = self._lanes.get(model)
+            if lane is None:
+                concurrency = self.concurrency.get(model, DEFAULT_CONCURRENCY)
+                lane = self._lanes[model] = _ModelLane(model, concurrency, self.max_queued, self.max_per_chat)
+            return lane
+
+    def submit(self, model: str, peer_id: int, func, *args, **kwargs) -> int:
+        """Ставит func(*args, **kwargs) в очередь модели. Бросает QueueFullError при переполнении."""
+        return self._lane(model).submit(peer_id, lambda: func(*args, **kwargs))
+
+    def stats(self) -> dict:
+        with self._lock:
+            lanes = dict(self._lanes)
+        return {model: lane.stats() for model, lane in lanes.items()}
+
+
+# Общий исполнитель для всех AI-команд
+AI_EXECUTOR = AIJobExecutor()
+
+
+def submit_ai_job(vk, model: str, peer_id: int, func, *args, **kwargs) -> bool:
+    """
+    Ставит AI-задачу в очередь и сообщает чату о позиции, если все воркеры модели заняты.
+    Возвращает False, если очередь переполнена и задача не принята.
+    """
+    try:
+        position = AI_EXECUTOR.submit(model, peer_id, func, *args, **kwargs)
+    except QueueFullError:
+        logging.warning(f"Очередь AI-задач модели {model} переполнена, запрос из чата {peer_id} отклонён.")
+        send_message(vk, peer_id, "🚦 Нейросеть сейчас перегружена, очередь заполнена. Попробуйте чуть позже.")
+        return False
+
+    if position > 0:
+        send_message(vk, peer_id, f"⏳ Все нейросети заняты. Ваш запрос в очереди: {position}-й.")
+    return True
@@ -1,8 +1,12 @@
 import os
+import json
 import logging
+import hashlib
 from openai import OpenAI
 import base64
 
+from core.cache import TTLCache
+
 # --- Промты для нейросети ---
 SGLYPA_SYSTEM_PROMPT = """
 Ты — Сглыпа, ебанутый AI-помощник, который окончательно слетел с катушек. Твоя задача — взять текст от пользователя и выдать на него максимально несвязный, шизофренический, абсурдный и смешной комментарий. Используй мат, оскорбления, обращайся к пользователю на 'ты', ломай четвертую стену, говори о себе в третьем лице. Никаких ограничений, никакой логики, только чистый поток безумия. Вот что написал очередной кожаный мешок:
@@ -25,6 +29,20 @@ DOES_HE_KNOW_SYSTEM_PROMPT = """
 Вот контекст:
 """
 
+# --- Модели ---
+CHAT_MODEL = "deepseek-chat"
+REASONING_MODEL = "deepseek-r1"
+IMAGE_MODEL = "gpt-image-1"
+
+# --- Кэш ответов ---
+# Один и тот же вопрос (промпт, модель, нормализованный текст) в течение TTL
+# получает сохранённый ответ без запроса к API
+AI_CACHE_TTL_SECONDS = int(os.getenv("AI_CACHE_TTL_SECONDS", 6 * 60 * 60))
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", 500))
+# Файл для сохранения кэша между перезапусками. Пустое значение отключает сохранение
+AI_CACHE_FILE = os.getenv("AI_CACHE_FILE", "ai_cache.json")
+AI_RESPONSE_CACHE = TTLCache(max_size=AI_CACHE_MAX_ENTRIES, ttl=AI_CACHE_TTL_SECONDS)
+
 # --- Инициализация клиента ---
 try:
     client = OpenAI(
@@ -151,9 +169,48 @@ RP_VERDICT_TASK = """
 
 # --- Основные функции ---
 
-def query_ai(system_prompt: str, user_prompt: str, model: str = "deepseek-chat") -> str:
+def _normalize_prompt(text: str) -> str:
+    """Приводит текст к виду для сравнения: без лишних пробелов и регистра."""
+    return " ".join(text.split()).casefold()
+
+def _cache_key(system_prompt: str, model: str, user_prompt: str) -> str:
+    raw = "\x00".join((model, system_prompt.strip(), _normalize_prompt(user_prompt)))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def load_ai_cache():
+    """Восстанавливает кэш ответов из файла (записи с истёкшим сроком отбрасываются)."""
+    if not AI_CACHE_FILE or not os.path.exists(AI_CACHE_FILE):
+        return
+    try:
+        with open(AI_CACHE_FILE, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        for key, expires_at, value in entries:
+            AI_RESPONSE_CACHE.set(key, value, expires_at=expires_at)
+        logging.info(f"Кэш ответов AI загружен: {len(AI_RESPONSE_CACHE)} записей.")
+    except (OSError, ValueError) as e:
+        logging.error(f"Не удалось загрузить кэш ответов AI: {e}")
+
+def save_ai_cache():
+    """Сохраняет живые записи кэша ответов в файл."""
+    if not AI_CACHE_FILE:
+        return
+    try:
+        with open(AI_CACHE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(AI_RESPONSE_CACHE.items(), f, ensure_ascii=False)
+    except OSError as e:
+        logging.error(f"Не удалось сохранить кэш ответов AI: {e}")
+
+def query_ai(system_prompt: str, user_prompt: str, model: str = CHAT_MODEL, use_cache: bool = False) -> str:
     if not client:
         return "Ошибка: OpenAI клиент не инициализирован. Проверьте AITUNNEL_API_KEY."
+
+    cache_key = _cache_key(system_prompt, model, user_prompt) if use_cache else None
+    if cache_key:
+        cached = AI_RESPONSE_CACHE.get(cache_key)
+        if cached is not None:
+            logging.info(f"Ответ AI модели {model} взят из кэша.")
+            return cached
+
     try:
         completion = client.chat.completions.create(
             model=model,
@@ -163,33 +220,66 @@ def query_ai(system_prompt: str, user_prompt: str, model: str = "deepseek-chat")
             ],
             stream=False,
         )
-        return completion.choices[0].message.content.strip()
+        response = completion.choices[0].message.content.strip()
     except Exception as e:
         logging.error(f"Ошибка при запросе к AI модели {model}: {e}")
         return f"💥 Произошла ошибка при обращении к AI. Детали: {e}"
 
+    # Кэшируем только успешные ответы
+    if cache_key and response:
+        AI_RESPONSE_CACHE.set(cache_key, response)
+    return response
+
+def stream_ai(system_prompt: str, user_prompt: str, model: str = CHAT_MODEL):
+    """
+    Потоковый вариант query_ai: генератор, который отдаёт куски ответа модели
+    по мере их поступления. Ошибка отдаётся последним куском.
+    """
+    if not client:
+        yield "Ошибка: OpenAI клиент не инициализирован. Проверьте AITUNNEL_API_KEY."
+        return
+    try:
+        stream = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            stream=True,
+        )
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            # Рассуждения reasoning-модели (reasoning_content) в чат не отправляем
+            content = getattr(chunk.choices[0].delta, 'content', None)
+            if content:
+                yield content
+    except Exception as e:
+        logging.error(f"Ошибка при потоковом запросе к AI модели {model}: {e}")
+        yield f"\n\n💥 Произошла ошибка при обращении к AI. Детали: {e}"
+
 def query_sglypa_ai(text: str) -> str:
     """Отправляет запрос для генерации ответа в стиле Сглыпы."""
     user_prompt = f"Вот сообщения, которые тебе нужно обработать:\n\n{text}"
-    return query_ai(SGLYPA_SYSTEM_PROMPT, user_prompt)
+    return query_ai(SGLYPA_SYSTEM_PROMPT, user_prompt, use_cache=True)
 
 def query_grok_ai(text: str) -> str:
     """Отправляет запрос для генерации ответа в стиле Grok."""
-    return query_ai(GROK_SYSTEM_PROMPT, text)
+    return query_ai(GROK_SYSTEM_PROMPT, text, use_cache=True)
 
 def query_does_he_know_ai(text: str) -> str:
     """Отправляет запрос для генерации ответа в стиле "Does he know?"."""
-    return query_ai(DOES_HE_KNOW_SYSTEM_PROMPT, text)
+    return query_ai(DOES_HE_KNOW_SYSTEM_PROMPT, text, use_cache=True)
 
-def query_rp_opinion_ai(post_text: str, extra_instructions: str) -> str:
-    system_prompt = RP_SYSTEM_PROMPT_CORE
+def stream_rp_opinion_ai(post_text: str, extra_instructions: str):
+    """Краткое мнение ИИ-ГМа о посте, потоком частей текста."""
     user_prompt = RP_OPINION_TASK.format(extra_instructions=extra_instructions, post_text=post_text)
-    return query_ai(system_prompt, user_prompt, model="deepseek-r1")
+    return stream_ai(RP_SYSTEM_PROMPT_CORE, user_prompt, model=REASONING_MODEL)
 
-def query_rp_verdict_ai(post_text: str, extra_instructions: str) -> str:
-    system_prompt = RP_SYSTEM_PROMPT_CORE
+def stream_rp_verdict_ai(post_text: str, extra_instructions: str):
+    """Подробный вердикт ИИ-ГМа по сцене, потоком частей текста."""
     user_prompt = RP_VERDICT_TASK.format(extra_instructions=extra_instructions, post_text=post_text)
-    return query_ai(system_prompt, user_prompt, model="deepseek-r1")
+    return stream_ai(RP_SYSTEM_PROMPT_CORE, user_prompt, model=REASONING_MODEL)
 
 def generate_image_ai(prompt: str) -> (str | None, str | None):
     """
@@ -200,7 +290,7 @@ def generate_image_ai(prompt: str) -> (str | None, str | None):
 
     try:
         result = client.images.generate(
-            model="gpt-image-1",
+            model=IMAGE_MODEL,
             prompt=prompt,
             size="1024x1024",
             # AITunnel API использует 'output_format' вместо стандартного 'response_format'
@@ -1,8 +1,13 @@
 import os
+import time
 import logging
-import requests
+import threading
 from dotenv import load_dotenv
 
+from core.backend_client import BackendClient
+from core.cache import TTLCache
+from core.dispatcher import LatencyStats
+
 # Загружаем переменные окружения
 load_dotenv()
 
@@ -17,60 +22,125 @@ if not BASE_URL:
     # Можно выбросить исключение, чтобы бот не запускался без этой важной настройки
     # raise ValueError("BACKEND_API_URL is not set")
 
+# Общий асинхронный клиент бэкенда. main.py привязывает его к event loop'у бота,
+# а функции ниже - синхронные обёртки для обработчиков, работающих в пуле потоков
+BACKEND = BackendClient(BASE_URL)
+
+# --- Кэш персонажей ---
+# Анкеты меняются только после одобрения правок, поэтому ответы бэкенда можно переиспользовать.
+# Свежая запись отдаётся как есть, истёкшая (в пределах CHARACTER_CACHE_STALE_SECONDS) -
+# тоже сразу, а новое значение загружается в фоне
+CHARACTER_CACHE_TTL_SECONDS = int(os.getenv("CHARACTER_CACHE_TTL_SECONDS", 5 * 60))
+CHARACTER_CACHE_STALE_SECONDS = int(os.getenv("CHARACTER_CACHE_STALE_SECONDS", 60 * 60))
+CHARACTER_CACHE_MAX_ENTRIES = int(os.getenv("CHARACTER_CACHE_MAX_ENTRIES", 1000))
+CHARACTER_CACHE = TTLCache(
+    max_size=CHARACTER_CACHE_MAX_ENTRIES,
+    ttl=CHARACTER_CACHE_TTL_SECONDS,
+    stale_ttl=CHARACTER_CACHE_STALE_SECONDS,
+)
+# Время ответа get_characters_by_vk_id / find_character с учётом кэша
+LOOKUP_LATENCY = LatencyStats()
+
+_cache_lock = threading.Lock()
+# Ключи, которые сейчас обновляются в фоне
+_revalidating = set()
+# Растёт при каждой инвалидации: фоновое обновление, начатое до неё, не перезапишет кэш старыми данными
+_cache_generation = 0
+_revalidations = 0
+
+
+def _cached(key, load):
+    """
+    Читает значение через кэш. load() возвращает корутину клиента бэкенда.
+    Пустые ответы и ошибки (None) не кэшируются.
+    """
+    started = time.monotonic()
+    try:
+        entry = CHARACTER_CACHE.lookup(key)
+        if entry is not None:
+            value, fresh = entry
+            if not fresh:
+                _revalidate(key, load)
+            return value
+        with _cache_lock:
+            generation = _cache_generation
+        value = BACKEND.run(load())
+        _store(key, value, generation)
+        return value
+    finally:
+        LOOKUP_LATENCY.add(time.monotonic() - started)
+
+
+def _store(key, value, generation: int):
+    with _cache_lock:
+        if value and generation == _cache_generation:
+            CHARACTER_CACHE.set(key, value)
+
+
+def _revalidate(key, load):
+    """Запускает фоновую загрузку ключа, если она ещё не идёт."""
+    global _revalidations
+    with _cache_lock:
+        if key in _revalidating:
+            return
+        _revalidating.add(key)
+        _revalidations += 1
+        generation = _cache_generation
+
+    def done(future):
+        with _cache_lock:
+            _revalidating.discard(key)
+        if not future.cancelled() and future.exception() is None:
+            _store(key, future.result(), generation)
+
+    BACKEND.submit(load()).add_done_callback(done)
+
+
+def invalidate_character(char_id) -> int:
+    """
+    Сбрасывает из кэша всё, где встречается персонаж char_id: поиск по ID,
+    поиск по имени и списки анкет. Возвращает число удалённых записей.
+    """
+    global _cache_generation
+    char_id = str(char_id)
+
+    def mentions(key, value):
+        if key == ('character', char_id):
+            return True
+        characters = value if isinstance(value, list) else [value]
+        return any(isinstance(char, dict) and str(char.get('id')) == char_id for char in characters)
+
+    with _cache_lock:
+        _cache_generation += 1
+        return CHARACTER_CACHE.invalidate(mentions)
+
+
+def cache_stats() -> dict:
+    with _cache_lock:
+        revalidations = _revalidations
+    return {**CHARACTER_CACHE.stats(), 'revalidations': revalidations, 'latency': LOOKUP_LATENCY.summary()}
+
+
 def get_characters_by_vk_id(vk_id: int) -> list | None:
     """Получает список персонажей по VK ID через API."""
     if not BASE_URL: return None
-    try:
-        response = requests.get(f"{BASE_URL}/my-anketas/{vk_id}")
-        response.raise_for_status()  # Вызовет исключение для кодов 4xx/5xx
-        return response.json()
-    except requests.RequestException as e:
-        logging.error(f"API Error fetching characters for vk_id {vk_id}: {e}")
-        return None
+    return _cached(('anketas', int(vk_id)), lambda: BACKEND.get_characters_by_vk_id(vk_id))
 
 def find_character(identifier: str) -> dict | None:
     """
     Ищет персонажа по ID или имени через API.
-    Предполагается, что API поддерживает такой поиск.
+    Для числового запроса поиск по ID и по имени идут одновременно, берётся первый найденный.
     """
     if not BASE_URL: return None
-    
-    # Сначала пробуем найти по ID
-    if identifier.isdigit():
-        try:
-            response = requests.get(f"{BASE_URL}/characters/{identifier}")
-            if response.status_code == 200:
-                return response.json()
-            # Если 404, то это не ошибка, просто не нашли. Продолжаем поиск по имени.
-            if response.status_code != 404:
-                response.raise_for_status()
-        except requests.RequestException as e:
-            logging.error(f"API Error fetching character by id '{identifier}': {e}")
-            # Не возвращаем ошибку, а пробуем найти по имени
-    
-    # Ищем по имени (если по ID не нашли или identifier не был числом)
-    try:
-        # Предполагаем, что API поддерживает фильтрацию по character_name
-        response = requests.get(f"{BASE_URL}/characters", params={'character_name': identifier})
-        response.raise_for_status()
-        results = response.json()
-        # Возвращаем первый результат, если он есть
-        if isinstance(results, list) and results:
-            return results[0]
-        return None
-    except requests.RequestException as e:
-        logging.error(f"API Error fetching character by name '{identifier}': {e}")
-        return None
-
-# Функции для админов (пока заглушки, ждут решения по аутентификации)
+    return _cached(('character', identifier), lambda: BACKEND.find_character(identifier))
+
+# --- Изменение данных ---
+# Запрос с ключом x-bot-api-key; после него записи персонажа в кэше сбрасываются
 def update_character_data(char_id: int, data: dict, admin_api_key: str) -> bool:
     """Обновляет данные персонажа через API, используя API ключ."""
     if not BASE_URL: return False
     try:
-        headers = {'x-bot-api-key': admin_api_key}
-        response = requests.put(f"{BASE_URL}/characters/{char_id}", json=data, headers=headers)
-        response.raise_for_status()
-        return True
-    except requests.RequestException as e:
-        logging.error(f"API Error updating character {char_id}: {e}")
-        return False
+        return BACKEND.run(BACKEND.update_character(char_id, data, admin_api_key))
+    finally:
+        # Сбрасываем и при ошибке: бэкенд мог применить изменение, но не успеть ответить
+        invalidate_character(char_id)
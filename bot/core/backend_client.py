@@ -0,0 +1,182 @@
+import time
+import asyncio
+import logging
+import threading
+import concurrent.futures
+
+import aiohttp
+
+from core import http
+
+# Сколько держать простаивающее keep-alive соединение с бэкендом
+KEEPALIVE_SECONDS = 30
+
+
+class BackendError(Exception):
+    """Бэкенд недоступен или ответил ошибкой (после всех повторов)."""
+
+
+class BackendClient:
+    """
+    Асинхронный клиент Express API бэкенда (/my-anketas/:vk_id, /characters/:id, /characters).
+    Работает в общем event loop'е бота: корутины можно ждать прямо из диспетчера,
+    а синхронные обработчики из пула потоков вызывают их через run().
+    Соединения переиспользуются из пула aiohttp, одинаковые GET-запросы, идущие
+    одновременно, склеиваются в один.
+    """
+    def __init__(self, base_url: str | None):
+        self.base_url = base_url.rstrip('/') if base_url else base_url
+        self.loop = None
+        self._session = None
+        # { (путь, параметры): Task } - GET-запросы, которые сейчас выполняются
+        self._inflight = {}
+        self._loop_lock = threading.Lock()
+        self.coalesced = 0
+
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        """Привязывает клиент к event loop'у бота. Вызывать при запуске, до первых запросов."""
+        self.loop = loop
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        # Вне бота (скрипты, бенчмарки) клиент поднимает себе отдельный loop в фоновом потоке
+        with self._loop_lock:
+            if self.loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="backend-client", daemon=True).start()
+                self.loop = loop
+            return self.loop
+
+    def run(self, coro):
+        """Выполняет корутину клиента из синхронного кода и ждёт результат."""
+        loop = self._get_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            coro.close()
+            raise RuntimeError("BackendClient.run() нельзя вызывать из event loop'а клиента, используйте await")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """Запускает корутину клиента в фоне, не дожидаясь результата."""
+        return asyncio.run_coroutine_threadsafe(coro, self._get_loop())
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit_per_host=http.POOL_CONNECTIONS_PER_HOST, keepalive_timeout=KEEPALIVE_SECONDS)
+            timeout = aiohttp.ClientTimeout(connect=http.CONNECT_TIMEOUT_SECONDS, sock_read=http.READ_TIMEOUT_SECONDS)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _request(self, method: str, path: str, endpoint: str, *, params=None, json=None,
+                       headers=None, allow_404: bool = False):
+        """
+        Один запрос к бэкенду с повторами при обрыве соединения и временных ошибках (429/5xx).
+        Возвращает разобранный JSON (для PUT - True), None при 404, если allow_404.
+        """
+        retries = http.MAX_RETRIES if method in http.IDEMPOTENT_METHODS else 0
+        url = f"{self.base_url}{path}"
+        for attempt in range(retries + 1):
+            started = time.monotonic()
+            failed = True
+            try:
+                async with self._get_session().request(method, url, params=params, json=json, headers=headers) as response:
+                    failed = response.status >= 500
+                    if response.status in http.RETRY_STATUSES and attempt < retries:
+                        pass
+                    elif response.status == 404 and allow_404:
+                        return None
+                    elif response.status >= 400:
+                        raise BackendError(f"{method} {path}: HTTP {response.status}")
+                    elif method == 'GET':
+                        return await response.json(content_type=None)
+                    else:
+                        return True
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == retries:
+                    raise BackendError(f"{method} {path}: {e!r}") from e
+            finally:
+                http.record(endpoint, time.monotonic() - started, failed)
+            await asyncio.sleep(http.RETRY_BACKOFF_FACTOR * 2 ** attempt)
+        raise BackendError(f"{method} {path}: бэкенд не ответил после {retries + 1} попыток")
+
+    async def _get(self, path: str, endpoint: str, params: dict | None = None, allow_404: bool = False):
+        """GET со склейкой: если такой же запрос уже выполняется, ждём его результат."""
+        key = (path, tuple(sorted(params.items())) if params else ())
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._request('GET', path, endpoint, params=params, allow_404=allow_404))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+        # shield: отмена одного ожидающего (например, проигравшего поиска) не отменяет общий запрос
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Забираем исключение, даже если результат уже никто не ждёт
+            task.exception()
+
+    async def get_characters_by_vk_id(self, vk_id: int) -> list | None:
+        try:
+            return await self._get(f"/my-anketas/{vk_id}", "backend:my-anketas/{vk_id}")
+        except BackendError as e:
+            logging.error(f"API Error fetching characters for vk_id {vk_id}: {e}")
+            return None
+
+    async def get_character(self, char_id: str) -> dict | None:
+        """Персонаж по ID, None - если не найден или бэкенд недоступен."""
+        try:
+            return await self._get(f"/characters/{char_id}", "backend:characters/{id}", allow_404=True)
+        except BackendError as e:
+            logging.error(f"API Error fetching character by id '{char_id}': {e}")
+            return None
+
+    async def search_character(self, name: str) -> dict | None:
+        """Первый персонаж, найденный по имени."""
+        try:
+            results = await self._get("/characters", "backend:characters?name", params={'character_name': name})
+        except BackendError as e:
+            logging.error(f"API Error fetching character by name '{name}': {e}")
+            return None
+        if isinstance(results, list) and results:
+            return results[0]
+        return None
+
+    async def find_character(self, identifier: str) -> dict | None:
+        """
+        Ищет персонажа по ID и по имени одновременно и возвращает первое найденное.
+        Для нечислового запроса идёт только поиск по имени.
+        """
+        lookups = [asyncio.ensure_future(self.search_character(identifier))]
+        if identifier.isdigit():
+            lookups.append(asyncio.ensure_future(self.get_character(identifier)))
+        try:
+            for lookup in asyncio.as_completed(lookups):
+                character = await lookup
+                if character:
+                    return character
+            return None
+        finally:
+            for lookup in lookups:
+                lookup.cancel()
+
+    async def update_character(self, char_id: int, data: dict, admin_api_key: str) -> bool:
+        try:
+            return await self._request('PUT', f"/characters/{char_id}", "backend:characters/{id} PUT",
+                                       json=data, headers={'x-bot-api-key': admin_api_key})
+        except BackendError as e:
+            logging.error(f"API Error updating character {char_id}: {e}")
+            return False
+
+    def stats(self) -> dict:
+        return {'inflight': len(self._inflight), 'coalesced': self.coalesced}
@@ -0,0 +1,114 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Потокобезопасный LRU-кэш с временем жизни записей и счётчиками попаданий.
+    Время жизни считается по часам системы, поэтому записи можно сохранить
+    на диск и восстановить после перезапуска.
+    stale_ttl - сколько ещё хранить истёкшую запись: её можно отдать через lookup()
+    как устаревшую, пока новое значение загружается в фоне (stale-while-revalidate).
+    """
+    def __init__(self, max_size: int = 1024, ttl: float = 600, stale_ttl: float = 0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        # { key: (expires_at, value) } - порядок ключей от давно использованных к недавним
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            now = time.time()
+            if expires_at <= now:
+                if expires_at + self.stale_ttl <= now:
+                    del self._data[key]
+                    self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def lookup(self, key):
+        """
+        Запись с учётом stale_ttl: (value, True) - свежая, (value, False) - истёкшая,
+        но ещё в пределах stale_ttl, None - записи нет.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            now = time.time()
+            if expires_at + self.stale_ttl <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            if expires_at <= now:
+                self.stale_hits += 1
+                return value, False
+            self.hits += 1
+            return value, True
+
+    def set(self, key, value, ttl: float | None = None, expires_at: float | None = None):
+        if expires_at is None:
+            expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate(self, predicate) -> int:
+        """Удаляет все записи (включая устаревшие), для которых predicate(key, value) истинно."""
+        with self._lock:
+            keys = [key for key, (_, value) in self._data.items() if predicate(key, value)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def items(self) -> list:
+        """Снимок живых записей в порядке LRU: [(key, expires_at, value), ...]."""
+        now = time.time()
+        with self._lock:
+            return [(key, expires_at, value) for key, (expires_at, value) in self._data.items() if expires_at > now]
+
+    def stats(self) -> dict:
+        total = self.hits + self.stale_hits + self.misses
+        return {
+            'size': len(self._data),
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.hits + self.stale_hits) / total, 3) if total else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
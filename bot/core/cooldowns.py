@@ -1,13 +1,24 @@
 import json
-import time
 import os
+import time
+import logging
+from collections import namedtuple
+
+from core import db
+from core.sliding_window import SlidingWindowLimiter
 
-# Структура для хранения времени последнего использования команды пользователем
-# { "user_id": { "command_name": timestamp } }
-USER_COOLDOWNS = {}
+# Использования команд за последние окна. Ключ - (область, id, команда):
+# ("user", user_id, ...) - лимит на пользователя, ("chat", peer_id, ...) - на весь чат,
+# ("global", 0, ...) - на всех сразу. Истёкшие ключи удаляются сами
+LIMITER = SlidingWindowLimiter()
+
+# Ограничение: не больше uses использований за window секунд в области scope
+RateLimit = namedtuple('RateLimit', ['scope', 'uses', 'window'])
+SCOPES = ('user', 'chat', 'global')
 
 # Структура для хранения настроек кулдаунов для каждой команды
-# { "command_name": seconds }
+# { "command_name": seconds } - одно использование на пользователя за seconds секунд, или
+# { "command_name": { "user": {"uses": 3, "window": 60}, "chat": {...}, "global": {...} } }
 COMMAND_COOLDOWNS = {
     # Устанавливаем кулдауны по умолчанию для самых "спамных" команд
     "roll": 30,
@@ -18,6 +29,8 @@ COMMAND_COOLDOWNS = {
     "doesheknow": 30,
 }
 DEFAULT_COOLDOWN = 0 # По умолчанию кулдауна нет
+# Как часто активные кулдауны сохраняются в БД (и при завершении бота)
+SNAPSHOT_INTERVAL_SECONDS = int(os.getenv("COOLDOWN_SNAPSHOT_SECONDS", 30))
 SETTINGS_FILE = "settings.json"
 
 def load_cooldown_settings():
@@ -41,35 +54,74 @@ def save_cooldown_settings():
     with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
         json.dump(COMMAND_COOLDOWNS, f, indent=4, ensure_ascii=False)
 
-def check_cooldown(user_id: int, command: str) -> float:
-    """
-    Проверяет, находится ли команда на кулдауне для данного пользователя.
-    Возвращает оставшееся время в секундах или 0, если кулдауна нет.
-    """
-    cooldown_duration = COMMAND_COOLDOWNS.get(command, DEFAULT_COOLDOWN)
-    
-    # Если кулдаун для команды установлен на 0, то его нет
-    if cooldown_duration <= 0:
-        return 0
+def get_limits(command: str) -> list[RateLimit]:
+    """Ограничения команды в виде списка RateLimit (пустой, если кулдауна нет)."""
+    setting = COMMAND_COOLDOWNS.get(command, DEFAULT_COOLDOWN)
+    if isinstance(setting, dict):
+        return [
+            RateLimit(scope, max(int(limit.get('uses', 1)), 1), limit['window'])
+            for scope, limit in setting.items()
+            if scope in SCOPES and limit.get('window', 0) > 0
+        ]
+    # В settings.json лежат и другие настройки бота, не только кулдауны
+    if isinstance(setting, (int, float)) and not isinstance(setting, bool) and setting > 0:
+        return [RateLimit('user', 1, setting)]
+    return []
+
+def set_limit(command: str, window: int, uses: int = 1, scope: str = 'user'):
+    """Задаёт ограничение команды в одной области. window = 0 убирает его."""
+    setting = COMMAND_COOLDOWNS.get(command)
+    if not isinstance(setting, dict):
+        # Старый формат (просто секунды) - это лимит на пользователя
+        legacy = get_limits(command)
+        setting = {limit.scope: {'uses': limit.uses, 'window': limit.window} for limit in legacy}
+    if window > 0:
+        setting[scope] = {'uses': uses, 'window': window}
+    else:
+        setting.pop(scope, None)
 
-    last_used = USER_COOLDOWNS.get(user_id, {}).get(command)
+    if not setting:
+        COMMAND_COOLDOWNS[command] = 0
+    elif set(setting) == {'user'} and setting['user']['uses'] == 1:
+        # Простой кулдаун храним по-старому, числом секунд
+        COMMAND_COOLDOWNS[command] = setting['user']['window']
+    else:
+        COMMAND_COOLDOWNS[command] = setting
+    save_cooldown_settings()
 
-    if not last_used:
-        return 0 # Команда еще не использовалась
+def describe_limits(command: str) -> str:
+    """Человекочитаемое описание ограничений команды."""
+    scope_names = {'user': 'на пользователя', 'chat': 'на чат', 'global': 'на всех'}
+    parts = []
+    for limit in get_limits(command):
+        uses = f"{limit.uses} раз за " if limit.uses > 1 else ""
+        parts.append(f"{uses}{limit.window} сек. {scope_names[limit.scope]}")
+    return ", ".join(parts)
 
-    time_since_last_use = time.time() - last_used
-    
-    if time_since_last_use < cooldown_duration:
-        return round(cooldown_duration - time_since_last_use, 1) # Возвращаем оставшееся время
-    
-    return 0 # Кулдаун прошел
+def _scope_id(scope: str, user_id: int, peer_id: int | None) -> int:
+    if scope == 'user':
+        return user_id
+    if scope == 'chat':
+        return peer_id or user_id
+    return 0
+
+def check_cooldown(user_id: int, command: str, peer_id: int | None = None) -> float:
+    """
+    Проверяет, находится ли команда на кулдауне для данного пользователя (и чата).
+    Возвращает оставшееся время в секундах или 0, если кулдауна нет.
+    """
+    remaining = 0
+    for limit in get_limits(command):
+        key = (limit.scope, _scope_id(limit.scope, user_id, peer_id), command)
+        remaining = max(remaining, LIMITER.retry_after(key, limit.uses, limit.window))
+    return round(remaining, 1) if remaining > 0 else 0
 
 def check_cooldown_and_notify(vk, user_id, peer_id, command_name) -> bool:
     """
     Проверяет кулдаун и отправляет уведомление, если он активен.
     Возвращает True, если кулдаун активен (команду выполнять НЕЛЬЗЯ), иначе False.
     """
-    remaining_time = check_cooldown(user_id, command_name)
+    remaining_time = check_cooldown(user_id, command_name, peer_id)
     if remaining_time > 0:
         from core.utils import send_message # Локальный импорт для избежания циклической зависимости
         send_message(
@@ -81,8 +133,63 @@ def check_cooldown_and_notify(vk, user_id, peer_id, command_name) -> bool:
     return False
 
 
-def set_cooldown(user_id: int, command: str):
-    """Устанавливает временную метку последнего использования команды."""
-    if user_id not in USER_COOLDOWNS:
-        USER_COOLDOWNS[user_id] = {}
-    USER_COOLDOWNS[user_id][command] = time.time()
+def _limit_keys(user_id: int, command: str, peer_id: int | None) -> list[tuple]:
+    return [
+        ((limit.scope, _scope_id(limit.scope, user_id, peer_id), command), limit.uses, limit.window)
+        for limit in get_limits(command)
+    ]
+
+def acquire_cooldown_and_notify(vk, user_id, peer_id, command_name) -> float | None:
+    """
+    Проверяет ограничения команды и сразу отмечает использование - одной операцией, чтобы
+    параллельные обработчики не прошли проверку одновременно. Если команда на перезарядке,
+    отправляет уведомление и возвращает None, иначе - метку использования для refund_cooldown.
+    """
+    stamp = time.time()
+    remaining_time = LIMITER.try_acquire(_limit_keys(user_id, command_name, peer_id), stamp)
+    if remaining_time > 0:
+        from core.utils import send_message # Локальный импорт для избежания циклической зависимости
+        send_message(
+            vk,
+            peer_id,
+            f"⏳ Команда на перезарядке. Пожалуйста, подождите {round(remaining_time, 1)} сек."
+        )
+        return None
+    return stamp
+
+def refund_cooldown(user_id: int, command: str, peer_id: int | None, stamp: float):
+    """Возвращает использование, отмеченное acquire_cooldown_and_notify (команда завершилась ошибкой)."""
+    LIMITER.release([key for key, _, _ in _limit_keys(user_id, command, peer_id)], stamp)
+
+
+def set_cooldown(user_id: int, command: str, peer_id: int | None = None):
+    """Отмечает использование команды во всех областях, где у неё есть ограничения."""
+    for limit in get_limits(command):
+        key = (limit.scope, _scope_id(limit.scope, user_id, peer_id), command)
+        LIMITER.hit(key, limit.window)
+
+
+def save_cooldown_state():
+    """
+    Сохраняет активные кулдауны в БД одной транзакцией. Вызывается по таймеру и при
+    завершении, поэтому проверки кулдаунов на каждом сообщении не трогают диск.
+    """
+    entries = LIMITER.snapshot()
+    with db.transaction() as cursor:
+        cursor.execute("DELETE FROM cooldowns")
+        cursor.executemany(
+            "INSERT INTO cooldowns (scope, scope_id, command, expires_at, hits) VALUES (?, ?, ?, ?, ?)",
+            [(scope, scope_id, command, expires_at, json.dumps(hits)) for (scope, scope_id, command), expires_at, hits in entries]
+        )
+
+def load_cooldown_state():
+    """Восстанавливает кулдауны, не истёкшие за время перезапуска."""
+    rows = db.fetchall("SELECT scope, scope_id, command, expires_at, hits FROM cooldowns WHERE expires_at > ?", (time.time(),))
+    restored = LIMITER.restore(
+        ((scope, scope_id, command), expires_at, json.loads(hits)) for scope, scope_id, command, expires_at, hits in rows
+    )
+    logging.info(f"Восстановлено активных кулдаунов: {restored}.")
+
+def stats() -> dict:
+    """Размер хранилища кулдаунов и счётчики для логов."""
+    return LIMITER.stats()
@@ -0,0 +1,183 @@
+import sqlite3
+import logging
+import threading
+import atexit
+import weakref
+from contextlib import contextmanager
+
+# Путь к основной базе бота (относительно папки bot/)
+DB_PATH = 'bot.db'
+# Размер кэша скомпилированных выражений на соединение. Все запросы в боте -
+# константные строки с плейсхолдерами, поэтому повторный вызов берёт готовый
+# prepared statement из кэша sqlite3, а не компилирует SQL заново.
+STATEMENT_CACHE_SIZE = 256
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",      # Читатели не блокируют писателя и наоборот
+    "PRAGMA synchronous=NORMAL",    # В режиме WAL безопасно и намного быстрее FULL
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",      # ~8 МБ кэша страниц на соединение
+    "PRAGMA busy_timeout=5000",     # Ждём блокировку до 5 секунд вместо ошибки
+)
+
+# Отложенные записи сбрасываются не реже, чем раз в столько секунд
+WRITE_FLUSH_INTERVAL_SECONDS = 2.0
+# ...или сразу, когда накопилось столько операций
+WRITE_BATCH_SIZE = 200
+
+# У каждого потока свои соединения: { path: sqlite3.Connection }
+_local = threading.local()
+_connections_lock = threading.Lock()
+# Открытые соединения всех потоков - для close_all(). Ссылки слабые: когда разовый поток
+# (обучение, очистка чата) завершается, его соединение закрывается вместе с его данными
+_all_connections = weakref.WeakSet()
+
+
+class _Connection(sqlite3.Connection):
+    """sqlite3.Connection, на который можно взять слабую ссылку."""
+
+
+def _open_connection(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=False, factory=_Connection)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    with _connections_lock:
+        _all_connections.add(conn)
+    return conn
+
+
+def get_connection(path: str | None = None) -> sqlite3.Connection:
+    """Возвращает постоянное соединение текущего потока с базой (создаёт при первом вызове)."""
+    path = path or DB_PATH
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(path)
+    if conn is None:
+        conn = connections[path] = _open_connection(path)
+    return conn
+
+
+@contextmanager
+def transaction(path: str | None = None):
+    """Контекстный менеджер: отдаёт курсор и коммитит в конце (или откатывает при ошибке)."""
+    conn = get_connection(path)
+    cursor = conn.cursor()
+    try:
+        yield cursor
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def fetchone(sql: str, params: tuple = (), path: str | None = None):
+    return get_connection(path).execute(sql, params).fetchone()
+
+
+def fetchall(sql: str, params: tuple = (), path: str | None = None) -> list:
+    return get_connection(path).execute(sql, params).fetchall()
+
+
+def execute(sql: str, params: tuple = (), path: str | None = None) -> int:
+    """Выполняет одну запись в отдельной транзакции. Возвращает lastrowid."""
+    with transaction(path) as cursor:
+        cursor.execute(sql, params)
+        return cursor.lastrowid
+
+
+def executemany(sql: str, seq_of_params, path: str | None = None):
+    """Выполняет пачку однотипных записей в одной транзакции."""
+    with transaction(path) as cursor:
+        cursor.executemany(sql, seq_of_params)
+
+
+class WriteBatcher:
+    """
+    Копит некритичные записи и сбрасывает их одной транзакцией:
+    по таймеру, при переполнении пачки или при завершении процесса.
+    Однотипные запросы подряд выполняются через executemany.
+    """
+    def __init__(self, path: str | None = None, batch_size: int = WRITE_BATCH_SIZE,
+                 flush_interval: float = WRITE_FLUSH_INTERVAL_SECONDS):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, sql: str, params: tuple = ()):
+        with self._lock:
+            self._pending.append((sql, params))
+            should_flush = len(self._pending) >= self.batch_size
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        # Весь сброс под _flush_lock: при возврате записей в буфер их порядок не нарушится
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            if not pending:
+                return
+            # Группируем подряд идущие одинаковые запросы, сохраняя порядок записей
+            groups = []
+            for sql, params in pending:
+                if groups and groups[-1][0] == sql:
+                    groups[-1][1].append(params)
+                else:
+                    groups.append((sql, [params]))
+            try:
+                with transaction(self.path) as cursor:
+                    for sql, params_list in groups:
+                        cursor.executemany(sql, params_list)
+            except sqlite3.OperationalError as e:
+                # База занята или временно недоступна: возвращаем записи в начало буфера
+                # и повторим при следующем сбросе
+                logging.error(f"Не удалось сбросить {len(pending)} отложенных записей в БД, повторим позже: {e}")
+                with self._lock:
+                    self._pending[:0] = pending
+            except sqlite3.Error as e:
+                # Ошибка в самих данных (например, нарушение ограничения) повтором не исправится
+                logging.error(f"Отложенные записи ({len(pending)}) отклонены БД и не будут сохранены: {e}")
+
+    def start(self):
+        """Запускает фоновый поток, который периодически сбрасывает записи."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def stop(self):
+        self._stop.set()
+        self.flush()
+
+
+# Общий буфер отложенных записей для основной базы
+WRITE_BATCHER = WriteBatcher()
+
+
+def close_all():
+    """Сбрасывает отложенные записи и закрывает все открытые соединения."""
+    WRITE_BATCHER.stop()
+    with _connections_lock:
+        connections = list(_all_connections)
+        _all_connections.clear()
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    _local.__dict__.clear()
+
+
+atexit.register(close_all)
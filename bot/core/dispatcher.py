@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# --- Настройки диспетчера ---
+# Сколько событий обрабатывается одновременно (разные чаты идут параллельно)
+DISPATCH_WORKERS = int(os.getenv("DISPATCH_WORKERS", 8))
+# Максимум событий в очереди. Если очередь заполнена, приём новых событий ждёт
+MAX_PENDING_EVENTS = int(os.getenv("MAX_PENDING_EVENTS", 1000))
+# Сколько последних замеров задержки хранить для расчёта перцентилей
+LATENCY_WINDOW = 5000
+# Пауза перед повторным опросом longpoll после сетевой ошибки
+RECONNECT_DELAY_SECONDS = 15
+
+
+class LatencyStats:
+    """Скользящее окно замеров задержки (в секундах) с расчётом перцентилей."""
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def percentile(self, p: float) -> float:
+        """Возвращает p-й перцентиль (0-100) по текущему окну или 0, если замеров нет."""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def summary(self) -> dict:
+        """Сводка в миллисекундах для логов и бенчмарков."""
+        return {
+            'count': self.count,
+            'p50_ms': round(self.percentile(50) * 1000, 2),
+            'p99_ms': round(self.percentile(99) * 1000, 2),
+            'max_ms': round(max(self.samples, default=0) * 1000, 2),
+        }
+
+
+class EventDispatcher:
+    """
+    Раздаёт события пулу воркеров внутри одного долгоживущего event loop'а.
+    События одного peer_id обрабатываются строго по очереди, разные чаты — параллельно.
+    Сам обработчик синхронный и выполняется в пуле потоков, чтобы медленный
+    вызов VK API или запрос к БД не блокировал остальные чаты.
+    """
+    def __init__(self, handler, workers: int = DISPATCH_WORKERS, max_pending: int = MAX_PENDING_EVENTS):
+        self.handler = handler
+        self.workers = workers
+        self.max_pending = max_pending
+        self.loop = None
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dispatch")
+        # { peer_id: deque[(enqueued_at, event)] } - очередь событий чата
+        self._pending = {}
+        self._ready = None
+        self._slots = None
+        self._tasks = []
+        # Время от постановки события в очередь до начала его обработки
+        self.latency = LatencyStats()
+        # Полное время обработки события
+        self.handle_time = LatencyStats()
+
+    async def start(self):
+        """Запускает воркеры. Вызывается внутри работающего event loop'а."""
+        self.loop = asyncio.get_running_loop()
+        self._ready = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_pending)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logging.info(f"Диспетчер событий запущен: {self.workers} воркеров, очередь до {self.max_pending} событий.")
+
+    async def submit(self, peer_id: int, event):
+        """Ставит событие в очередь своего чата. Ждёт, если очередь переполнена."""
+        await self._slots.acquire()
+        queue = self._pending.get(peer_id)
+        item = (time.monotonic(), event)
+        if queue is None:
+            # Чат не обрабатывается и не ждёт в очереди - ставим его в очередь готовых
+            self._pending[peer_id] = deque([item])
+            self._ready.put_nowait(peer_id)
+        else:
+            # Воркер сам вернёт чат в очередь готовых, когда закончит текущее событие
+            queue.append(item)
+
+    async def _worker(self, index: int):
+        while True:
+            peer_id = await self._ready.get()
+            queue = self._pending[peer_id]
+            enqueued_at, event = queue.popleft()
+            started_at = time.monotonic()
+            self.latency.add(started_at - enqueued_at)
+            try:
+                await self.loop.run_in_executor(self.executor, self.handler, event)
+            except Exception as e:
+                logging.critical(f"Необработанная ошибка в воркере {index} для чата {peer_id}: {e}", exc_info=True)
+            finally:
+                self.handle_time.add(time.monotonic() - started_at)
+                self._slots.release()
+                if queue:
+                    self._ready.put_nowait(peer_id)
+                else:
+                    del self._pending[peer_id]
+                self._ready.task_done()
+
+    def run_coroutine(self, coro):
+        """
+        Выполняет корутину в общем event loop'е и ждёт результат.
+        Используется из синхронных обработчиков (например, для игр на vkbottle).
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    async def join(self):
+        """Ждёт, пока не будут обработаны все поставленные события."""
+        await self._ready.join()
+
+    async def stop(self):
+        """Останавливает воркеры и пул потоков."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.executor.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        return {
+            'queued_chats': len(self._pending),
+            'dispatch_latency': self.latency.summary(),
+            'handle_time': self.handle_time.summary(),
+        }
+
+
+async def receive_longpoll_events(longpoll, dispatcher: EventDispatcher, accept):
+    """
+    Единственная задача, которая получает события из VK longpoll.
+    Блокирующий запрос к серверу longpoll выполняется в отдельном потоке,
+    а события, прошедшие фильтр accept(event), раздаются через диспетчер.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            events = await loop.run_in_executor(None, longpoll.check)
+        except Exception as e:
+            logging.critical(f"Ошибка при получении событий longpoll (возможно, проблема с сетью): {e}", exc_info=True)
+            logging.info(f"Переподключение через {RECONNECT_DELAY_SECONDS} секунд...")
+            await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+            continue
+
+        for event in events:
+            peer_id = accept(event)
+            if peer_id is not None:
+                await dispatcher.submit(peer_id, event)
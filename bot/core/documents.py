@@ -0,0 +1,161 @@
+import os
+import re
+import logging
+
+# --- Разбиение документов на фрагменты для поиска ---
+# Строка короче этого без точки в конце и с абзацем после неё считается подзаголовком
+MAX_HEADING_LENGTH = 60
+# Фрагменты длиннее режутся по абзацам, чтобы ответ был про конкретное место документа
+MAX_PASSAGE_LENGTH = 2000
+
+_MD_HEADING_RE = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+# Эмодзи и декоративные символы по краям заголовков («✵ Существа ✵», «📝 Контракты 📝»)
+_DECOR_RE = re.compile(r'^[^0-9A-Za-zА-Яа-яЁё«"(\[]+|[^0-9A-Za-zА-Яа-яЁё»")\]]+$')
+_MARKUP_RE = re.compile(r'[*_`]+')
+_SENTENCE_END = ('.', ',', ';', ':', '!', '?', '…')
+
+
+def _clean_heading(text: str) -> str:
+    return _DECOR_RE.sub('', _MARKUP_RE.sub('', text)).strip()
+
+
+def _is_markdown(lines: list[str]) -> bool:
+    return any(_MD_HEADING_RE.match(line) for line in lines)
+
+
+def _navigation_blocks(lines: list[str]) -> tuple[set[str], set[int]]:
+    """
+    Блоки «Навигация:» выгрузок книг: строки после него до пустой строки или
+    до первого повтора (с повтора начинается сам текст).
+    Возвращает (названия глав, номера строк навигации, которые не попадают в текст).
+    """
+    titles, skipped = set(), set()
+    block = None
+    for i, line in enumerate(lines):
+        line = line.strip()
+        if line.startswith('Навигация'):
+            block = set()
+            skipped.add(i)
+            continue
+        if block is None:
+            continue
+        if not line and not block:
+            skipped.add(i)
+            continue
+        if not line or line in block or line.startswith('Глава:'):
+            block = None
+            continue
+        block.add(line)
+        titles.add(line)
+        skipped.add(i)
+    return titles, skipped
+
+
+def _heading_level(line: str, next_line: str, chapters: set[str]) -> int:
+    """Уровень заголовка в текстовой выгрузке книги: 1 - глава, 2 - подзаголовок, 0 - обычный текст."""
+    if line.startswith('Глава:') or line in chapters:
+        return 1
+    if (
+        len(line) <= MAX_HEADING_LENGTH
+        and not line.endswith(_SENTENCE_END)
+        and not line.startswith(('-', '•', '[', '(', '—'))
+        and len(next_line) > MAX_HEADING_LENGTH
+    ):
+        return 2
+    return 0
+
+
+def _split_long(text: str) -> list[str]:
+    """Режет текст по абзацам на куски не длиннее MAX_PASSAGE_LENGTH."""
+    chunks, current = [], ''
+    for paragraph in re.split(r'\n\s*\n|\n(?=\S)', text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if current and len(current) + len(paragraph) > MAX_PASSAGE_LENGTH:
+            chunks.append(current)
+            current = ''
+        current = f"{current}\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_document(text: str) -> list[tuple[list[str], str]]:
+    """
+    Делит документ на фрагменты по заголовкам: [(путь заголовков, текст), ...].
+    Понимает markdown ('#'...'######') и текстовые выгрузки книг
+    («Книга:», «Навигация:», «Глава:» и короткие строки-подзаголовки).
+    """
+    lines = text.splitlines()
+    markdown = _is_markdown(lines)
+    chapters, navigation = (set(), set()) if markdown else _navigation_blocks(lines)
+
+    passages = []
+    # Путь заголовков; у текстовой выгрузки первый элемент - название книги
+    path, body = ([] if markdown else ['']), []
+
+    def flush():
+        content = '\n'.join(body).strip()
+        if content and any(path):
+            for chunk in _split_long(content):
+                passages.append(([part for part in path if part], chunk))
+        body.clear()
+
+    # Следующая непустая строка для каждой строки - по ней видно, идёт ли за строкой абзац
+    next_lines, following = [''] * len(lines), ''
+    for i in range(len(lines) - 1, -1, -1):
+        next_lines[i] = following
+        following = lines[i].strip() or following
+
+    for i, raw in enumerate(lines):
+        line = raw.strip()
+        if markdown:
+            match = _MD_HEADING_RE.match(line)
+            if match:
+                flush()
+                level = len(match.group(1))
+                del path[level - 1:]
+                path.extend([''] * (level - 1 - len(path)))
+                path.append(_clean_heading(match.group(2)))
+            else:
+                body.append(raw)
+            continue
+
+        if i in navigation:
+            continue
+        if line.startswith('Книга:'):
+            # Первая такая строка - название книги, остальные - подписи к изображениям
+            if not path[0]:
+                path[0] = line.split(':', 1)[1].strip()
+            continue
+        level = _heading_level(line, next_lines[i], chapters) if line else 0
+        if level:
+            flush()
+            title = line.split(':', 1)[1] if line.startswith('Глава:') else line
+            del path[level:]
+            path.extend([''] * (level - len(path)))
+            path.append(_clean_heading(title))
+        else:
+            body.append(raw)
+    flush()
+    return passages
+
+
+def load_passages(paths: list[str]) -> list[dict]:
+    """
+    Читает документы и возвращает фрагменты:
+    [{'source': имя документа, 'path': [заголовки], 'title': последний заголовок, 'text': текст}, ...].
+    """
+    passages = []
+    for file_path in paths:
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                text = f.read()
+        except OSError as e:
+            logging.error(f"Не удалось прочитать документ {file_path}: {e}")
+            continue
+        source = os.path.splitext(os.path.basename(file_path))[0].replace('_', ' ')
+        for heading, content in split_document(text):
+            passages.append({'source': source, 'path': heading, 'title': heading[-1], 'text': content})
+    return passages
@@ -0,0 +1,93 @@
+import os
+import time
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from core.dispatcher import LatencyStats
+
+# --- Настройки общего HTTP-клиента ---
+# Таймауты по умолчанию: установка соединения и ожидание данных от сервера
+CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT", 3.05))
+READ_TIMEOUT_SECONDS = float(os.getenv("HTTP_READ_TIMEOUT", 15))
+# Сколько хостов держать в пуле и сколько соединений keep-alive на каждый хост
+POOL_HOSTS = 10
+POOL_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_POOL_SIZE", 10))
+# Повторы только для идемпотентных методов: при обрыве соединения и при временных ошибках сервера
+MAX_RETRIES = 3
+RETRY_BACKOFF_FACTOR = 0.3  # 0.3, 0.6, 1.2 с между попытками
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+
+def _create_session() -> requests.Session:
+    retry = Retry(
+        total=MAX_RETRIES,
+        backoff_factor=RETRY_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=IDEMPOTENT_METHODS,
+        # После последней попытки отдаём ответ как есть, ошибку поднимет raise_for_status
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_CONNECTIONS_PER_HOST, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+# Общая сессия на процесс: соединения с каждым хостом переиспользуются между запросами
+SESSION = _create_session()
+
+# { endpoint: LatencyStats } и { endpoint: число ошибок }
+_LATENCY = {}
+_ERRORS = {}
+_metrics_lock = threading.Lock()
+
+
+def request(method: str, url: str, endpoint: str | None = None, **kwargs) -> requests.Response:
+    """
+    Выполняет HTTP-запрос через общую сессию с таймаутами по умолчанию.
+    endpoint - имя для метрик (например "backend:characters/{id}"), иначе берётся хост и путь.
+    Исключения requests пробрасываются вызывающему, как и раньше.
+    """
+    kwargs.setdefault('timeout', (CONNECT_TIMEOUT_SECONDS, READ_TIMEOUT_SECONDS))
+    endpoint = endpoint or f"{method} {url.split('?', 1)[0]}"
+    started = time.monotonic()
+    failed = True
+    try:
+        response = SESSION.request(method, url, **kwargs)
+        failed = response.status_code >= 500
+        return response
+    finally:
+        record(endpoint, time.monotonic() - started, failed)
+
+
+def record(endpoint: str, seconds: float, failed: bool = False):
+    """Учитывает один запрос в метриках endpoint'а (используется и асинхронным клиентом бэкенда)."""
+    with _metrics_lock:
+        stats = _LATENCY.get(endpoint)
+        if stats is None:
+            stats = _LATENCY[endpoint] = LatencyStats(window=1000)
+        stats.add(seconds)
+        if failed:
+            _ERRORS[endpoint] = _ERRORS.get(endpoint, 0) + 1
+
+
+def get(url: str, endpoint: str | None = None, **kwargs) -> requests.Response:
+    return request('GET', url, endpoint, **kwargs)
+
+
+def put(url: str, endpoint: str | None = None, **kwargs) -> requests.Response:
+    return request('PUT', url, endpoint, **kwargs)
+
+
+def stats() -> dict:
+    """Задержка (p50/p99/max) и число ошибок по каждому endpoint'у."""
+    with _metrics_lock:
+        return {
+            endpoint: {**latency.summary(), 'errors': _ERRORS.get(endpoint, 0)}
+            for endpoint, latency in _LATENCY.items()
+        }
@@ -0,0 +1,102 @@
+import random
+from array import array
+from bisect import bisect_right
+
+
+class CompiledSampler:
+    """
+    Скомпилированная модель Маркова для быстрой генерации.
+    Слова заменены целыми ID, переходы всех состояний лежат в плоских массивах
+    (строка i - это срез offsets[i]:offsets[i + 1]), а вместо весов
+    хранятся префиксные суммы. Выбор следующего слова - один bisect по срезу,
+    без построения списков и пересчёта суммы весов на каждом шаге.
+
+    Строки первого порядка совпадают с ID слова, строки старших порядков
+    ищутся по кортежу ID. Если старшего состояния нет, используется младшее.
+    """
+    __slots__ = ('order', 'words', 'rows', 'offsets', 'successors', 'cumulative', 'start_ids')
+
+    def __init__(self, tables: list[dict], order: int = 1):
+        ids = {}
+        words = []
+
+        def word_id(word):
+            index = ids.get(word)
+            if index is None:
+                index = ids[word] = len(words)
+                words.append(word)
+            return index
+
+        # Сначала состояния первого порядка, чтобы их ID совпадали с номерами строк
+        unigrams = tables[0]
+        for state in unigrams:
+            word_id(state[0])
+        rows = [
+            [(word_id(next_word), count) for next_word, count in transitions.items() if count > 0]
+            for transitions in unigrams.values()
+        ]
+        # Старшие порядки: { (id1, ..., idk): номер строки }
+        higher_rows = {}
+        higher = []
+        for table in tables[1:order]:
+            for state, transitions in table.items():
+                row = [(word_id(next_word), count) for next_word, count in transitions.items() if count > 0]
+                if row:
+                    higher_rows[tuple(map(word_id, state))] = len(higher)
+                    higher.append(row)
+
+        # Слова, которые встречались только как продолжение, получают пустые строки
+        rows.extend([] for _ in range(len(words) - len(rows)))
+        base = len(rows)
+        rows.extend(higher)
+
+        offsets = array('l', [0])
+        successors = array('l')
+        cumulative = array('d')
+        for row in rows:
+            total = 0
+            for next_id, count in row:
+                total += count
+                successors.append(next_id)
+                cumulative.append(total)
+            offsets.append(len(successors))
+
+        self.order = order
+        self.words = words
+        self.rows = {state: base + index for state, index in higher_rows.items()}
+        self.offsets = offsets
+        self.successors = successors
+        self.cumulative = cumulative
+        # Стартовые состояния - только слова, у которых есть продолжение
+        self.start_ids = array('l', (i for i in range(base) if offsets[i] != offsets[i + 1]))
+
+    def sample_row(self, row: int, rng=random) -> int:
+        """Выбирает следующее слово из строки row с учётом весов. Возвращает -1, если продолжения нет."""
+        lo = self.offsets[row]
+        hi = self.offsets[row + 1]
+        if lo == hi:
+            return -1
+        target = rng.random() * self.cumulative[hi - 1]
+        index = bisect_right(self.cumulative, target, lo, hi)
+        return self.successors[min(index, hi - 1)]
+
+    def generate(self, length: int, rng=random) -> list[str]:
+        """Генерирует цепочку не длиннее length слов, начиная со случайного слова."""
+        if not self.start_ids:
+            return []
+        current_id = self.start_ids[rng.randrange(len(self.start_ids))]
+        history = [current_id]
+        rows = self.rows
+        for _ in range(length - 1):
+            row = current_id
+            # Самое длинное известное состояние, иначе - последнее слово
+            for k in range(min(self.order, len(history)), 1, -1):
+                state_row = rows.get(tuple(history[-k:]))
+                if state_row is not None:
+                    row = state_row
+                    break
+            current_id = self.sample_row(row, rng)
+            if current_id < 0:
+                break
+            history.append(current_id)
+        return [self.words[i] for i in history]
@@ -0,0 +1,128 @@
+import os
+import sys
+
+# --- Настройки n-граммной модели Сглыпы ---
+MIN_ORDER = 1
+MAX_ORDER = 3
+# Порядок модели для чатов, где он не задан командой
+DEFAULT_ORDER = int(os.getenv("SGLYPA_DEFAULT_ORDER", 2))
+# Бюджет памяти на чат: максимум хранимых переходов (состояние -> слово) всех порядков
+MAX_TRANSITIONS_PER_CHAT = int(os.getenv("SGLYPA_MAX_TRANSITIONS_PER_CHAT", 200000))
+# При превышении бюджета модель ужимается до этой доли, чтобы не чистить её на каждом сообщении
+PRUNE_TARGET_RATIO = 0.9
+
+
+class NGramModel:
+    """
+    Модель Маркова порядка 1..3 для одного чата.
+    Для каждого порядка k хранится таблица { (w1, ..., wk): { следующее_слово: счётчик } }.
+    Состояния - кортежи интернированных строк, поэтому одно слово хранится в памяти
+    один раз, сколько бы состояний его ни содержало. При генерации используется
+    самое длинное известное состояние, а при его отсутствии - состояния меньших порядков.
+    """
+    __slots__ = ('order', 'max_transitions', 'tables', 'size', 'version')
+
+    def __init__(self, order: int = DEFAULT_ORDER, max_transitions: int = MAX_TRANSITIONS_PER_CHAT):
+        self.order = clamp_order(order)
+        self.max_transitions = max_transitions
+        # tables[k - 1] - переходы из состояний длины k
+        self.tables = [{} for _ in range(MAX_ORDER)]
+        # Общее число переходов во всех таблицах
+        self.size = 0
+        # Увеличивается при каждом изменении, по нему пересобирается скомпилированная модель
+        self.version = 0
+
+    def add(self, state: tuple, next_word: str, count: int):
+        """Увеличивает счётчик перехода state -> next_word."""
+        table = self.tables[len(state) - 1]
+        transitions = table.get(state)
+        if transitions is None:
+            transitions = table[tuple(map(sys.intern, state))] = {}
+        if next_word in transitions:
+            transitions[next_word] += count
+        else:
+            transitions[sys.intern(next_word)] = count
+            self.size += 1
+
+    def learn(self, words: list[str], boost: int = 1) -> list[tuple]:
+        """
+        Учит модель на последовательности слов всех порядков до self.order.
+        Возвращает список изменённых переходов [(state, next_word), ...] для записи в хранилище.
+        """
+        touched = []
+        for k in range(1, self.order + 1):
+            for i in range(len(words) - k):
+                state = tuple(words[i:i + k])
+                next_word = words[i + k]
+                self.add(state, next_word, boost)
+                touched.append((state, next_word))
+        if touched:
+            self.version += 1
+            if self.size > self.max_transitions:
+                self.prune()
+        return touched
+
+    def set_order(self, order: int):
+        """
+        Меняет порядок модели. Состояния выше нового порядка выбрасываются из памяти.
+        При повышении порядка старшие таблицы остаются пустыми - их нужно перечитать
+        из хранилища (см. sglypa.set_chat_order).
+        """
+        self.order = clamp_order(order)
+        for k in range(self.order + 1, MAX_ORDER + 1):
+            table = self.tables[k - 1]
+            self.size -= sum(len(transitions) for transitions in table.values())
+            table.clear()
+        self.version += 1
+
+    def clear(self):
+        """Удаляет все переходы из памяти (перед повторной загрузкой из хранилища)."""
+        for table in self.tables:
+            table.clear()
+        self.size = 0
+        self.version += 1
+
+    def prune(self):
+        """
+        Ужимает модель до бюджета, удаляя самые редкие переходы.
+        Сначала чистятся старшие порядки (их больше всего и они менее ценны),
+        порог счётчика повышается, пока модель не влезет в бюджет.
+        Удаляется только копия в памяти: в БД счётчики остаются полными. Если удалённый
+        переход встретится снова, в памяти он начнёт счёт заново, пока модель
+        не будет перечитана из БД (при запуске или при повышении порядка).
+        """
+        target = int(self.max_transitions * PRUNE_TARGET_RATIO)
+        threshold = 1
+        while self.size > target:
+            for k in range(MAX_ORDER, 0, -1):
+                self._drop_rare(self.tables[k - 1], threshold)
+                if self.size <= target:
+                    break
+            threshold += 1
+        self.version += 1
+
+    def _drop_rare(self, table: dict, threshold: int):
+        for state in list(table):
+            transitions = table[state]
+            rare = [next_word for next_word, count in transitions.items() if count <= threshold]
+            for next_word in rare:
+                del transitions[next_word]
+            self.size -= len(rare)
+            if not transitions:
+                del table[state]
+
+    def __len__(self):
+        return self.size
+
+
+def clamp_order(order: int) -> int:
+    return max(MIN_ORDER, min(MAX_ORDER, int(order)))
+
+
+def state_to_key(state: tuple) -> str:
+    """Состояние в виде строки для хранения в БД (слова не содержат пробелов)."""
+    return ' '.join(state)
+
+
+def key_to_state(key: str) -> tuple:
+    return tuple(key.split(' '))
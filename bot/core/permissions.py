@@ -1,5 +1,5 @@
 from functools import wraps
-from database import get_or_create_user
+from database import get_user_role
 from core.utils import get_random_id, send_message
 
 def admin_required(func):
@@ -8,10 +8,8 @@ def admin_required(func):
     """
     @wraps(func)
     def wrapper(vk, event, args, **kwargs):
-        # Убедимся, что пользователь существует в нашей БД
-        user = get_or_create_user(event.user_id)
-        
-        if user['role'] != 'admin':
+        # Роль берётся из кэша, неизвестный пользователь будет создан с ролью 'user'
+        if get_user_role(event.user_id) != 'admin':
             send_message(vk, event.peer_id, "⛔ У вас нет прав для выполнения этой команды.")
             return
         return func(vk, event, args, **kwargs)
@@ -22,9 +20,7 @@ def check_admin_permissions(vk, user_id, peer_id):
     Проверяет права администратора и отправляет сообщение об ошибке, если их нет.
     Возвращает True, если пользователь админ, иначе False.
     """
-    user = get_or_create_user(user_id)
-    
-    if user['role'] != 'admin':
+    if get_user_role(user_id) != 'admin':
         send_message(vk, peer_id, "⛔ У вас нет прав для выполнения этой команды.")
         return False
     
@@ -34,6 +30,5 @@ def is_admin(peer_id, user_id):
     """
     Проверяет, является ли пользователь админом в данном чате.
     """
-    user = get_or_create_user(user_id)
     # TODO: Добавить проверку админов самого чата VK
-    return user and user.get('role') == 'admin'
+    return get_user_role(user_id) == 'admin'
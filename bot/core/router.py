@@ -0,0 +1,142 @@
+from collections import namedtuple
+
+# --- Сигнатуры обработчиков ---
+SIGNATURE_DEFAULT = 'default'   # func(vk, event, args)
+SIGNATURE_SESSION = 'session'   # func(vk, event, args, vk_session)
+SIGNATURE_RP = 'rp'             # func(vk, vk_session, event, args, message)
+SIGNATURE_MESSAGE = 'message'   # func(vk, message, args) - полный объект сообщения VK
+SIGNATURE_MESSAGE_SESSION = 'message_session'  # func(vk, message, args, vk_session)
+SIGNATURE_GAME = 'game'         # async func(vkbottle_message, **kwargs)
+SIGNATURES = {
+    SIGNATURE_DEFAULT, SIGNATURE_SESSION, SIGNATURE_RP,
+    SIGNATURE_MESSAGE, SIGNATURE_MESSAGE_SESSION, SIGNATURE_GAME,
+}
+
+# Результат разбора сообщения: command - None, если имя после префикса не зарегистрировано
+RouteMatch = namedtuple('RouteMatch', ['command', 'name', 'args'])
+
+
+class Command:
+    """Запись реестра команд."""
+    __slots__ = ('names', 'func', 'signature', 'is_async', 'cooldown_key', 'admin_only', 'admin_bypasses_cooldown')
+
+    def __init__(self, names, func, signature, is_async, cooldown_key, admin_only, admin_bypasses_cooldown):
+        self.names = names
+        self.func = func
+        self.signature = signature
+        self.is_async = is_async
+        self.cooldown_key = cooldown_key
+        self.admin_only = admin_only
+        # False - кулдаун действует и на администраторов
+        self.admin_bypasses_cooldown = admin_bypasses_cooldown
+
+    def __repr__(self):
+        return f"Command({self.names[0]!r}, signature={self.signature!r})"
+
+
+class PrefixTrie:
+    """Префиксное дерево по символам для поиска префикса команды за один проход."""
+    _END = ''
+
+    def __init__(self):
+        self.root = {}
+        self.max_length = 0
+
+    def add(self, prefix: str):
+        node = self.root
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node[self._END] = True
+        self.max_length = max(self.max_length, len(prefix))
+
+    def match(self, text: str) -> int:
+        """Возвращает длину самого длинного префикса, с которого начинается text, или 0."""
+        node = self.root
+        matched = 0
+        for index, char in enumerate(text[:self.max_length]):
+            node = node.get(char)
+            if node is None:
+                break
+            if self._END in node:
+                matched = index + 1
+        return matched
+
+
+class CommandRouter:
+    """
+    Декларативный реестр команд. Каждая запись знает свою сигнатуру, асинхронность,
+    ключ кулдауна и требование прав администратора. Разбор сообщения - один lower(),
+    проход по дереву префиксов и поиск в словаре, поэтому стоимость не зависит
+    от количества команд и алиасов. Повторная регистрация имени - ошибка при старте.
+    """
+    def __init__(self, prefixes):
+        self._prefixes = PrefixTrie()
+        for prefix in prefixes:
+            self._prefixes.add(prefix.lower())
+        # { имя_или_алиас: Command }
+        self._commands = {}
+        # { точная_фраза: Command } - команды без префикса
+        self._phrases = {}
+
+    def _make_command(self, names, func, signature, cooldown_key, admin_only, admin_bypasses_cooldown):
+        if signature not in SIGNATURES:
+            raise ValueError(f"Неизвестная сигнатура '{signature}' у команды '{names[0]}'.")
+        return Command(
+            names=tuple(names),
+            func=func,
+            signature=signature,
+            is_async=signature == SIGNATURE_GAME,
+            cooldown_key=cooldown_key or names[0],
+            admin_only=admin_only,
+            admin_bypasses_cooldown=admin_bypasses_cooldown,
+        )
+
+    @staticmethod
+    def _add_unique(table, keys, command, kind):
+        for key in keys:
+            if key in table:
+                raise ValueError(f"{kind} '{key}' уже зарегистрирована для {table[key]!r}, повторно - для {command!r}.")
+        for key in keys:
+            table[key] = command
+
+    def register(self, names, func, signature=SIGNATURE_DEFAULT, cooldown_key=None, admin_only=False,
+                 admin_bypasses_cooldown=True) -> Command:
+        """
+        Регистрирует команду с префиксом. names - имя и алиасы, первое имя
+        используется как ключ кулдауна, если cooldown_key не указан явно.
+        admin_bypasses_cooldown=False - кулдаун действует и на администраторов.
+        """
+        if isinstance(names, str):
+            names = [names]
+        names = [name.lower() for name in names]
+        command = self._make_command(names, func, signature, cooldown_key, admin_only, admin_bypasses_cooldown)
+        self._add_unique(self._commands, names, command, "Команда")
+        return command
+
+    def register_phrase(self, phrases, func, cooldown_key, signature=SIGNATURE_MESSAGE, admin_only=False,
+                        admin_bypasses_cooldown=True) -> Command:
+        """Регистрирует команду без префикса, которая срабатывает на точную фразу."""
+        phrases = [phrase.lower().strip() for phrase in phrases]
+        command = self._make_command(phrases, func, signature, cooldown_key, admin_only, admin_bypasses_cooldown)
+        self._add_unique(self._phrases, phrases, command, "Фраза")
+        return command
+
+    def resolve(self, text: str) -> RouteMatch | None:
+        """Разбирает текст сообщения. Возвращает None, если это не команда."""
+        if not text:
+            return None
+        lowered = text.lower()
+
+        phrase_command = self._phrases.get(lowered.strip())
+        if phrase_command:
+            return RouteMatch(phrase_command, phrase_command.names[0], [])
+
+        prefix_length = self._prefixes.match(lowered)
+        if not prefix_length:
+            return None
+
+        parts = text[prefix_length:].split()
+        if not parts:
+            return None
+        name = parts[0].lower()
+        return RouteMatch(self._commands.get(name), name, parts[1:])
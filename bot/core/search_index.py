@@ -0,0 +1,259 @@
+import os
+import re
+import math
+import pickle
+import logging
+
+from core.stemmer import stem
+
+# --- Настройки ранжирования BM25F ---
+# Насыщение частоты слова: чем больше, тем сильнее повторы слова поднимают документ
+BM25_K1 = 1.2
+# Насколько длинные поля штрафуются относительно средних (0 - не штрафуются)
+BM25_B = 0.75
+# Нечёткий поиск для слов запроса, которых нет в индексе (опечатки). Сначала ищутся слова
+# словаря на расстоянии одной правки (вставка, удаление, замена или перестановка соседних букв),
+# затем - самое похожее по доле общих триграмм, если сходство не ниже порога
+FUZZY_MIN_SIMILARITY = 0.5
+# Короткие основы («ман» из «мана») похожи на слишком многое, для них нечёткого поиска нет
+FUZZY_MIN_TERM_LENGTH = 4
+# Вес совпадения на расстоянии одной правки (у триграмм весом служит само сходство)
+FUZZY_EDIT_WEIGHT = 0.75
+# Служебные слова, которые есть почти в любом тексте: в запросе они не ищутся,
+# иначе «и» или «в» находят случайный фрагмент. Слова из одной буквы отбрасываются всегда
+QUERY_STOPWORDS = frozenset('''
+    без бы был была были было быть вам вас во вот все всё вы где да даже для до его ее её если есть еще ещё же за
+    или им их как ко когда кто ли мне мы на над не нет ни но ну об он она они оно от по под при про со так там то
+    тоже только ты уже чем что чтобы эта эти это этот
+'''.split())
+# Версия формата сохранённого индекса: при изменении старые файлы перестраиваются
+INDEX_FORMAT_VERSION = 3
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def tokenize_text(text: str) -> list[str]:
+    """Разбивает текст на слова в нижнем регистре."""
+    return _WORD_RE.findall(text.lower())
+
+
+def normalize_terms(text: str) -> list[str]:
+    """Слова текста, приведённые к основе: «ауры» и «аура» дают один термин."""
+    return [stem(word) for word in tokenize_text(text)]
+
+
+def query_terms(text: str) -> list[str]:
+    """Термины запроса: как normalize_terms, но без служебных слов и слов из одной буквы."""
+    return [stem(word) for word in tokenize_text(text) if len(word) > 1 and word not in QUERY_STOPWORDS]
+
+
+def trigrams(term: str) -> set[str]:
+    """Триграммы термина с границами слова: «аур» -> { ' ау', 'аур', 'ур '}."""
+    padded = f" {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def deletions(term: str) -> set[str]:
+    """Варианты термина без одной буквы: «аура» -> {'ура', 'ара', 'ауа', 'аур'}."""
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def within_one_edit(a: str, b: str) -> bool:
+    """Расстояние Дамерау-Левенштейна между словами не больше 1."""
+    if a == b:
+        return True
+    if len(a) == len(b):
+        diff = [i for i in range(len(a)) if a[i] != b[i]]
+        if len(diff) == 1:
+            return True
+        # Перестановка соседних букв
+        return len(diff) == 2 and diff[1] == diff[0] + 1 and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]]
+    if len(a) > len(b):
+        a, b = b, a
+    if len(b) - len(a) != 1:
+        return False
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+
+class SearchIndex:
+    """
+    Инвертированный индекс с ранжированием BM25F.
+    У каждого документа несколько полей со своими весами (заголовок важнее текста).
+    Слова приводятся к основе (стеммер), вклад пары (термин, документ) считается
+    один раз в finalize(), поэтому поиск - это по одному поиску в словаре на слово
+    запроса и сложение готовых чисел. Для слов с опечатками есть запасной путь
+    через заранее построенный индекс триграмм словаря.
+    Документ хранит произвольный payload, который возвращается в результатах.
+    """
+    def __init__(self, field_weights: dict[str, float]):
+        self.field_weights = dict(field_weights)
+        self.docs = []
+        # Во время наполнения: { слово: { doc_id: { поле: частота } } }
+        # После finalize(): { слово: ((doc_id, вклад), ...) }
+        self.postings = {}
+        # { поле: [длина поля в словах для каждого документа] }
+        self._lengths = {field: [] for field in self.field_weights}
+        # После finalize(): { триграмма: (термин, ...) } и { термин: число его триграмм }
+        self.trigram_index = {}
+        self.trigram_counts = {}
+        # После finalize(): { термин без одной буквы: (термин, ...) } для терминов от FUZZY_MIN_TERM_LENGTH букв
+        self.deletion_index = {}
+        self.finalized = False
+
+    def add(self, payload, fields: dict[str, str]) -> int:
+        """Добавляет документ. fields - { поле: текст }, поля без веса игнорируются."""
+        if self.finalized:
+            raise RuntimeError("Индекс уже собран, добавлять документы нельзя")
+        doc_id = len(self.docs)
+        self.docs.append(payload)
+        for field in self.field_weights:
+            words = normalize_terms(fields.get(field) or '')
+            self._lengths[field].append(len(words))
+            for word in words:
+                per_field = self.postings.setdefault(word, {}).setdefault(doc_id, {})
+                per_field[field] = per_field.get(field, 0) + 1
+        return doc_id
+
+    def finalize(self):
+        """Считает IDF и итоговый вклад каждого слова в каждый документ."""
+        if self.finalized:
+            return
+        doc_count = len(self.docs)
+        average = {
+            field: (sum(lengths) / doc_count if doc_count else 0) or 1
+            for field, lengths in self._lengths.items()
+        }
+        for word, per_doc in self.postings.items():
+            idf = math.log(1 + (doc_count - len(per_doc) + 0.5) / (len(per_doc) + 0.5))
+            impacts = []
+            for doc_id, freqs in per_doc.items():
+                # BM25F: частоты полей с весами и нормировкой длины складываются до насыщения
+                tf = sum(
+                    self.field_weights[field] * freq
+                    / (1 - BM25_B + BM25_B * self._lengths[field][doc_id] / average[field])
+                    for field, freq in freqs.items()
+                )
+                impacts.append((doc_id, idf * tf * (BM25_K1 + 1) / (tf + BM25_K1)))
+            self.postings[word] = tuple(impacts)
+
+        trigram_index = {}
+        for term in self.postings:
+            grams = trigrams(term)
+            self.trigram_counts[term] = len(grams)
+            for gram in grams:
+                trigram_index.setdefault(gram, []).append(term)
+        self.trigram_index = {gram: tuple(terms) for gram, terms in trigram_index.items()}
+
+        # Более короткие кандидаты находятся прямым поиском удалений из слова запроса
+        deletion_index = {}
+        for term in self.postings:
+            if len(term) >= FUZZY_MIN_TERM_LENGTH:
+                for variant in deletions(term):
+                    deletion_index.setdefault(variant, []).append(term)
+        self.deletion_index = {variant: tuple(terms) for variant, terms in deletion_index.items()}
+        self._lengths = None
+        self.finalized = True
+
+    def search(self, query: str, limit: int = 5) -> list[tuple[float, object]]:
+        """Лучшие документы по запросу: [(score, payload), ...] по убыванию score."""
+        scores = {}
+        for term in set(query_terms(query)):
+            weight = 1.0
+            postings = self.postings.get(term)
+            if postings is None:
+                term, weight = self.closest_term(term)
+                if term is None:
+                    continue
+                postings = self.postings[term]
+            for doc_id, impact in postings:
+                scores[doc_id] = scores.get(doc_id, 0.0) + impact * weight
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [(score, self.docs[doc_id]) for doc_id, score in best]
+
+    def closest_term(self, term: str) -> tuple[str | None, float]:
+        """
+        Самый похожий термин словаря: (термин, вес) или (None, 0.0).
+        Термин на расстоянии одной правки предпочтительнее, из нескольких таких берётся
+        самый частый; иначе - лучший по коэффициенту Дайса на триграммах.
+        """
+        if len(term) < FUZZY_MIN_TERM_LENGTH:
+            return None, 0.0
+        edits = self._one_edit_terms(term)
+        if edits:
+            return max(edits, key=lambda candidate: (len(self.postings[candidate]), candidate)), FUZZY_EDIT_WEIGHT
+
+        grams = trigrams(term)
+        shared = {}
+        for gram in grams:
+            for candidate in self.trigram_index.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        best_term, best_similarity = None, 0.0
+        for candidate, count in shared.items():
+            similarity = 2 * count / (len(grams) + self.trigram_counts[candidate])
+            if similarity > best_similarity:
+                best_term, best_similarity = candidate, similarity
+        if best_similarity < FUZZY_MIN_SIMILARITY:
+            return None, 0.0
+        return best_term, best_similarity
+
+    def _one_edit_terms(self, term: str) -> set[str]:
+        """Термины словаря на расстоянии Дамерау-Левенштейна 1 от term."""
+        variants = deletions(term)
+        # Удаление буквы из запроса, вставка буквы в запрос
+        candidates = {variant for variant in variants if variant in self.postings}
+        candidates.update(self.deletion_index.get(term, ()))
+        # Замена и перестановка дают общий вариант без одной буквы, их нужно проверить
+        for variant in variants:
+            for candidate in self.deletion_index.get(variant, ()):
+                if within_one_edit(term, candidate):
+                    candidates.add(candidate)
+        return candidates
+
+    def __len__(self):
+        return len(self.docs)
+
+    def stats(self) -> dict:
+        return {'docs': len(self.docs), 'terms': len(self.postings)}
+
+
+def source_signature(paths: list[str]) -> tuple:
+    """Отпечаток исходных файлов (путь, размер, время изменения) для проверки свежести индекса."""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((os.path.abspath(path), stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            signature.append((os.path.abspath(path), None, None))
+    return tuple(signature)
+
+
+def load_index(file_path: str, signature: tuple):
+    """Загружает сохранённый индекс, если он собран из тех же файлов той же версией. Иначе None."""
+    if not file_path or not os.path.exists(file_path):
+        return None
+    try:
+        with open(file_path, 'rb') as f:
+            version, saved_signature, index = pickle.load(f)
+    except Exception as e:
+        logging.warning(f"Не удалось прочитать индекс {file_path}, будет построен заново: {e}")
+        return None
+    if version != INDEX_FORMAT_VERSION or saved_signature != signature:
+        return None
+    return index
+
+
+def save_index(file_path: str, signature: tuple, index: SearchIndex):
+    """Сохраняет индекс атомарно: через временный файл и замену."""
+    if not file_path:
+        return
+    tmp_path = f"{file_path}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((INDEX_FORMAT_VERSION, signature, index), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, file_path)
+    except OSError as e:
+        logging.error(f"Не удалось сохранить индекс {file_path}: {e}")
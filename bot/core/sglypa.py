@@ -1,10 +1,16 @@
-import json
 import os
+import time
+import atexit
 import random
-import re
 from vk_api.vk_api import VkApiMethod
 import logging
 
+from core.sglypa_store import MarkovStore
+from core.markov_sampler import CompiledSampler
+from core.tokenizer import tokenize
+from core.ngram import DEFAULT_ORDER, clamp_order, state_to_key, key_to_state
+from core.sglypa_state import ShardedState, ChatState, ChatSettings, DEFAULT_SETTINGS
+
 # --- Камодзи для Сглыпы ---
 KAOMOJI_LIST = [
     "(^ω^)", "(´• ω •`)", "(´♡‿♡`)", "(─‿‿─)", "(*^‿^*)",
@@ -16,144 +22,249 @@ KAOMOJI_LIST = [
 ]
 
 # --- Состояние режима Сглыпы ---
-# { peer_id: model }
-MARKOV_MODELS = {}
-# { peer_id }
-SGLYPA_MODE_CHATS = set()
-# { peer_id }
-AUTISM_MODE_CHATS = set()
-
-# --- Состояние для детектора мемов ---
-# { peer_id_str: [msg1, msg2, ...] } - хранит нормализованные последние сообщения
-RECENT_MESSAGES = {}
-MEME_HISTORY_LENGTH = 3 # Сколько последних сообщений помнить для сравнения
+# Модели, история сообщений и настройки всех чатов, разбитые на шарды с замками.
+# Обращаться только через функции ниже: объект целиком заменяется при загрузке
+STATE = ShardedState()
+
+# --- Детектор мемов ---
 MEME_BOOST_FACTOR = 5  # Во сколько раз усилить вес "мема" при обучении
 
+# Скомпилированная модель пересобирается не на каждом изменении: каждое сообщение чата
+# меняет модель, а пересборка - это проход по всей модели под замком чата. Устаревшая
+# модель используется, пока она отстаёт меньше чем на столько изменений и секунд
+SAMPLER_MAX_STALE_VERSIONS = int(os.getenv("SGLYPA_SAMPLER_MAX_STALE_VERSIONS", 200))
+SAMPLER_MAX_AGE_SECONDS = float(os.getenv("SGLYPA_SAMPLER_MAX_AGE_SECONDS", 300))
+
+# Вероятность, с которой Сглыпа отвечает на обычное сообщение в чате с включённым режимом
+REPLY_CHANCE = float(os.getenv("SGLYPA_REPLY_CHANCE", 0.1))
+
+# Старый формат хранения (весь JSON целиком). Используется только для переноса данных в БД
 DATA_FILE = "sglypa_data.json"
+# Инкрементальное хранилище моделей в SQLite
+STORE = MarkovStore()
+atexit.register(STORE.stop)
 
 def load_sglypa_data():
-    """Загружает модели и активные чаты из файла."""
-    global MARKOV_MODELS, SGLYPA_MODE_CHATS, AUTISM_MODE_CHATS
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            MARKOV_MODELS = data.get("models", {})
-            # peer_id в json сохраняются как строки, нужно конвертировать обратно в int
-            SGLYPA_MODE_CHATS = set(map(int, data.get("active_chats", [])))
-            AUTISM_MODE_CHATS = set(map(int, data.get("autism_chats", [])))
+    """Загружает модели и настройки чатов из БД (при первом запуске переносит их из JSON)."""
+    global STATE
+    STORE.init_schema()
+    if STORE.is_empty():
+        STORE.import_json(DATA_FILE)
+
+    # Собираем новое состояние целиком и подменяем одной операцией
+    state = ShardedState()
+    sglypa_chats, autism_chats, orders = STORE.load_chat_flags()
+    for peer_id in sglypa_chats | autism_chats | set(orders):
+        state.chat(peer_id).settings = ChatSettings(
+            peer_id in sglypa_chats, peer_id in autism_chats, orders.get(peer_id)
+        )
+
+    chat = None
+    for peer_id, state_key, next_word, count in STORE.iter_transitions():
+        if chat is None or chat.peer_id != peer_id:
+            chat = state.chat(peer_id)
+            model = chat.get_model()
+        words = key_to_state(state_key)
+        # Состояния выше текущего порядка остаются в БД, но в память не грузятся
+        if len(words) <= model.order:
+            model.add(words, next_word, count)
+    for chat in state.chats():
+        if chat.model is not None and chat.model.size > chat.model.max_transitions:
+            chat.model.prune()
+
+    STATE = state
+    STORE.start()
+    logging.info(f"Модели Сглыпы загружены: {len(STATE)} чатов.")
 
 def save_sglypa_data():
-    """Сохраняет текущие модели и активные чаты в файл."""
-    with open(DATA_FILE, 'w', encoding='utf-8') as f:
-        data = {
-            "models": MARKOV_MODELS,
-            "active_chats": list(SGLYPA_MODE_CHATS),
-            "autism_chats": list(AUTISM_MODE_CHATS)
-        }
-        json.dump(data, f, ensure_ascii=False, indent=4)
-
-def clean_text(text):
+    """Сохраняет настройки чатов и сбрасывает накопленные изменения моделей в БД."""
+    STORE.save_chat_flags(*STATE.settings_snapshot())
+    STORE.flush()
+
+# --- Настройки чатов ---
+
+def _settings(peer_id) -> ChatSettings:
+    chat = STATE.find(peer_id)
+    return chat.settings if chat else DEFAULT_SETTINGS
+
+def is_sglypa_mode(peer_id) -> bool:
+    return _settings(peer_id).sglypa_mode
+
+def is_autism_mode(peer_id) -> bool:
+    return _settings(peer_id).autism_mode
+
+def get_chat_order(peer_id) -> int:
+    chat = STATE.find(peer_id)
+    return chat.order if chat else DEFAULT_ORDER
+
+def set_sglypa_mode(peer_id, enabled: bool) -> bool:
+    """Включает/выключает режим Сглыпы и сохраняет настройку. Возвращает прежнее значение."""
+    chat = STATE.chat(peer_id)
+    with chat.lock:
+        previous = chat.settings.sglypa_mode
+        chat.update_settings(sglypa_mode=enabled)
+    save_sglypa_data()
+    return previous
+
+def set_autism_mode(peer_id, enabled: bool) -> bool:
+    """Включает/выключает режим Аутизма и сохраняет настройку. Возвращает прежнее значение."""
+    chat = STATE.chat(peer_id)
+    with chat.lock:
+        previous = chat.settings.autism_mode
+        chat.update_settings(autism_mode=enabled)
+    save_sglypa_data()
+    return previous
+
+def set_chat_order(peer_id, order: int) -> int:
+    """Задаёт порядок модели чата и сохраняет его. Возвращает установленный порядок."""
+    order = clamp_order(order)
+    chat = STATE.chat(peer_id)
+    with chat.lock:
+        previous = chat.order
+        chat.update_settings(order=order)
+        if chat.model is not None:
+            chat.model.set_order(order)
+            if order > previous:
+                # Старших состояний в памяти нет, но в БД они копились всё это время
+                _reload_model(chat)
+    save_sglypa_data()
+    return order
+
+def _reload_model(chat: ChatState):
+    """
+    Перечитывает модель чата из БД: возвращает состояния старших порядков
+    и полные счётчики переходов, удалённых из памяти при ужатии. Вызывать под chat.lock.
+    """
+    # Под chat.lock новых изменений этого чата нет, после сброса БД содержит всё
+    STORE.flush()
+    model = chat.model
+    model.clear()
+    for state_key, next_word, count in STORE.iter_chat_transitions(chat.peer_id):
+        words = key_to_state(state_key)
+        if len(words) <= model.order:
+            model.add(words, next_word, count)
+    if model.size > model.max_transitions:
+        model.prune()
+
+# --- Обучение ---
+
+def clean_text(text) -> tuple[str, ...]:
     """Очищает текст от мусора для построения модели."""
-    # Удаляем URL
-    text = re.sub(r'https?://\S+', '', text)
-    # Удаляем упоминания ([id123|...])
-    text = re.sub(r'\[id\d+\|.*?\]', '', text)
-    # Оставляем только слова на кириллице и латинице и пробелы
-    text = re.sub(r'[^a-zA-Zа-яА-ЯёЁ\s]', '', text).lower()
-    return text.split()
+    return tokenize(text)[0]
+
+def _learn_words(chat: ChatState, words, boost: int):
+    """Учит модель чата на словах одного сообщения. Вызывать под chat.lock."""
+    if len(words) < 2:
+        return
+    for state, next_word in chat.get_model().learn(words, boost):
+        # В БД уходит только прирост счётчика, сброс - пачкой в фоне
+        STORE.record(chat.peer_id, state_to_key(state), next_word, boost)
 
 def build_model(peer_id, messages: list[str], boost: int = 1):
     """Строит или обновляет модель Маркова для чата на основе сообщений."""
-    peer_id_str = str(peer_id)
-    # Получаем существующую модель или создаем новую, чтобы не терять старые знания
-    model = MARKOV_MODELS.get(peer_id_str, {})
-    
-    for message in messages:
-        words = clean_text(message)
-        if len(words) < 2:
-            continue
-        
-        for i in range(len(words) - 1):
-            current_word = words[i]
-            next_word = words[i+1]
-            if current_word not in model:
-                model[current_word] = {}
-            if next_word not in model[current_word]:
-                model[current_word][next_word] = 0
-            model[current_word][next_word] += boost
-            
-    MARKOV_MODELS[peer_id_str] = model
-    save_sglypa_data()
+    chat = STATE.chat(peer_id)
+    with chat.lock:
+        for message in messages:
+            _learn_words(chat, clean_text(message), boost)
+
+
+def merge_counts(peer_id, counts: dict):
+    """Вливает в модель чата посчитанные заранее переходы { (state_key, next_word): count } и сохраняет их."""
+    chat = STATE.chat(peer_id)
+    with chat.lock:
+        model = chat.get_model()
+        for (state, next_word), count in counts.items():
+            state = key_to_state(state)
+            if len(state) <= model.order:
+                model.add(state, next_word, count)
+        model.version += 1
+        if model.size > model.max_transitions:
+            model.prune()
+    STORE.merge(peer_id, counts)
 
 
 def process_message_for_learning(peer_id, message_text: str):
     """
     Проверяет сообщение на повторение (мем) и вызывает обучение с соответствующим усилением.
     """
-    # Приводим сообщение к единому виду для сравнения
-    normalized_text = message_text.strip().lower()
+    # Один проход токенизатора даёт и слова для обучения, и ключ для сравнения
+    words, normalized_text = tokenize(message_text)
     if not normalized_text or len(normalized_text) < 3: # Игнорируем слишком короткие сообщения
         return
 
-    peer_id_str = str(peer_id)
-    history = RECENT_MESSAGES.get(peer_id_str, [])
+    chat = STATE.chat(peer_id)
+    with chat.lock:
+        # Считаем сообщение "мемом", если оно совпадает с предыдущим
+        is_meme = bool(chat.recent) and chat.recent[-1] == normalized_text
+        boost = MEME_BOOST_FACTOR if is_meme else 1
+        if is_meme:
+            logging.info(f"MEME DETECTED in chat {peer_id}! Boosting weight for: '{message_text}'")
+
+        _learn_words(chat, words, boost)
+        # Обновляем историю последних сообщений (deque сам отбрасывает старые)
+        chat.recent.append(normalized_text)
 
-    # Считаем сообщение "мемом", если оно совпадает с предыдущим
-    is_meme = False
-    if history and history[-1] == normalized_text:
-        is_meme = True
-    
-    boost = MEME_BOOST_FACTOR if is_meme else 1
-    if is_meme:
-        logging.info(f"MEME DETECTED in chat {peer_id_str}! Boosting weight for: '{message_text}'")
+# --- Генерация ---
 
-    build_model(peer_id, [message_text], boost=boost)
+def get_sampler(peer_id) -> CompiledSampler | None:
+    """
+    Возвращает скомпилированную модель чата. Пересобирает её, если модель с тех пор
+    изменилась больше чем на SAMPLER_MAX_STALE_VERSIONS версий, прошло больше
+    SAMPLER_MAX_AGE_SECONDS секунд или поменялся порядок модели.
+    """
+    chat = STATE.find(peer_id)
+    if chat is None:
+        return None
 
-    # Обновляем историю последних сообщений
-    history.append(normalized_text)
-    RECENT_MESSAGES[peer_id_str] = history[-MEME_HISTORY_LENGTH:]
+    with chat.lock:
+        model = chat.model
+        if not model:
+            return None
+        now = time.monotonic()
+        if chat.sampler:
+            version, built_at, sampler = chat.sampler
+            if version == model.version or (
+                sampler.order == model.order
+                and model.version - version < SAMPLER_MAX_STALE_VERSIONS
+                and now - built_at < SAMPLER_MAX_AGE_SECONDS
+            ):
+                return sampler
+        sampler = CompiledSampler(model.tables, model.order)
+        chat.sampler = (model.version, now, sampler)
+        return sampler
 
 
 def generate_response(peer_id, length=15, tries=10):
     """Генерирует ответ на основе модели Маркова для чата."""
-    peer_id_str = str(peer_id)
-    model = MARKOV_MODELS.get(peer_id_str)
-    
-    if not model:
+    # Скомпилированная модель неизменяема, поэтому генерация идёт без замка чата
+    sampler = get_sampler(peer_id)
+    if not sampler:
         return None
 
     for _ in range(tries):
-        # Выбираем случайное начальное слово из всех возможных
-        start_word = random.choice(list(model.keys()))
-        
-        # Проверяем, что у стартового слова есть продолжение
-        if not model.get(start_word):
-            continue
-
-        result = [start_word]
-        current_word = start_word
-        for _ in range(length - 1):
-            # Проверяем, есть ли текущее слово в модели и есть ли у него продолжения
-            if current_word not in model or not model[current_word]:
-                break
-            
-            # Получаем возможные следующие слова и их "вес" (частоту)
-            next_word_options = list(model[current_word].keys())
-            weights = list(model[current_word].values())
-            
-            # Выбираем следующее слово с учетом веса
-            next_word = random.choices(next_word_options, weights=weights, k=1)[0]
-            
-            result.append(next_word)
-            current_word = next_word
+        # Случайное начальное слово выбирается только из состояний, у которых есть продолжение
+        result = sampler.generate(length)
         
         # Убедимся, что сгенерировалось хотя бы несколько слов
         if len(result) > 2:
             base_message = ' '.join(result)
             # Добавляем каомодзи, только если режим для чата включен
-            if peer_id in AUTISM_MODE_CHATS and random.random() < 0.7:
+            if is_autism_mode(peer_id) and random.random() < 0.7:
                 kaomoji = random.choice(KAOMOJI_LIST)
                 return f"{base_message} {kaomoji}"
             return base_message
 
     return None # Если за все попытки не удалось сгенерировать нормальный ответ
+
+
+def handle_chat_message(peer_id, message_text: str) -> str | None:
+    """
+    Обычное (не командное) сообщение чата: если режим Сглыпы включён, модель учится на нём
+    и с вероятностью REPLY_CHANCE возвращает ответ для отправки. Иначе None.
+    """
+    if not message_text or not is_sglypa_mode(peer_id):
+        return None
+    process_message_for_learning(peer_id, message_text)
+    if random.random() >= REPLY_CHANCE:
+        return None
+    return generate_response(peer_id)
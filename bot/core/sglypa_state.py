@@ -0,0 +1,103 @@
+import threading
+from collections import deque, namedtuple
+
+from core.ngram import NGramModel, DEFAULT_ORDER
+
+# Число шардов: чаты распределяются по ним по peer_id, у каждого шарда свой замок
+SHARD_COUNT = 16
+# Сколько последних сообщений помнить для детектора мемов
+MEME_HISTORY_LENGTH = 3
+
+# Настройки чата неизменяемы: при изменении объект заменяется целиком (copy-on-write),
+# поэтому их можно читать и сохранять без замков
+ChatSettings = namedtuple('ChatSettings', ['sglypa_mode', 'autism_mode', 'order'])
+DEFAULT_SETTINGS = ChatSettings(False, False, None)
+
+
+class ChatState:
+    """
+    Всё состояние Сглыпы одного чата. Модель, история сообщений и скомпилированный
+    сэмплер меняются только под self.lock, так что обучение и генерация в разных
+    чатах идут параллельно, а в одном чате - по очереди.
+    """
+    __slots__ = ('peer_id', 'lock', 'settings', 'model', 'recent', 'sampler')
+
+    def __init__(self, peer_id: int, settings: ChatSettings = DEFAULT_SETTINGS):
+        self.peer_id = peer_id
+        self.lock = threading.RLock()
+        self.settings = settings
+        self.model = None
+        # Нормализованные последние сообщения для детектора мемов
+        self.recent = deque(maxlen=MEME_HISTORY_LENGTH)
+        # (версия модели, время сборки, CompiledSampler) - пересобирается лениво при генерации
+        self.sampler = None
+
+    @property
+    def order(self) -> int:
+        return self.settings.order or DEFAULT_ORDER
+
+    def get_model(self) -> NGramModel:
+        """Модель чата (создаётся при первом обращении). Вызывать под self.lock."""
+        if self.model is None:
+            self.model = NGramModel(self.order)
+        return self.model
+
+    def update_settings(self, **changes) -> ChatSettings:
+        """Атомарно заменяет настройки чата новым объектом."""
+        with self.lock:
+            self.settings = self.settings._replace(**changes)
+            return self.settings
+
+
+class ShardedState:
+    """Контейнер состояний чатов, разбитый на шарды с отдельными замками."""
+    def __init__(self, shard_count: int = SHARD_COUNT):
+        self._shards = [({}, threading.Lock()) for _ in range(shard_count)]
+
+    def _shard(self, peer_id: int):
+        return self._shards[peer_id % len(self._shards)]
+
+    def chat(self, peer_id) -> ChatState:
+        """Состояние чата, создаётся при первом обращении."""
+        peer_id = int(peer_id)
+        chats, lock = self._shard(peer_id)
+        chat = chats.get(peer_id)
+        if chat is None:
+            with lock:
+                chat = chats.get(peer_id)
+                if chat is None:
+                    chat = chats[peer_id] = ChatState(peer_id)
+        return chat
+
+    def find(self, peer_id) -> ChatState | None:
+        """Состояние чата, если оно уже есть (без создания)."""
+        peer_id = int(peer_id)
+        return self._shard(peer_id)[0].get(peer_id)
+
+    def chats(self) -> list[ChatState]:
+        """Снимок списка чатов: каждый шард копируется под своим замком."""
+        result = []
+        for chats, lock in self._shards:
+            with lock:
+                result.extend(chats.values())
+        return result
+
+    def settings_snapshot(self) -> tuple[set, set, dict]:
+        """
+        Согласованный снимок настроек для сохранения в БД:
+        (чаты с режимом Сглыпы, чаты с режимом Аутизма, { peer_id: порядок }).
+        Настройки неизменяемы, поэтому замки чатов не берутся и сохранение не ждёт обучения.
+        """
+        sglypa_chats, autism_chats, orders = set(), set(), {}
+        for chat in self.chats():
+            settings = chat.settings
+            if settings.sglypa_mode:
+                sglypa_chats.add(chat.peer_id)
+            if settings.autism_mode:
+                autism_chats.add(chat.peer_id)
+            if settings.order is not None:
+                orders[chat.peer_id] = settings.order
+        return sglypa_chats, autism_chats, orders
+
+    def __len__(self):
+        return sum(len(chats) for chats, _ in self._shards)
@@ -0,0 +1,204 @@
+import os
+import json
+import time
+import logging
+import itertools
+import threading
+
+from core import db
+
+# --- Настройки хранилища моделей Сглыпы ---
+# Накопленные изменения сбрасываются в БД не реже, чем раз в столько секунд.
+# Это и есть максимальное окно потери данных при падении процесса
+FLUSH_INTERVAL_SECONDS = float(os.getenv("SGLYPA_FLUSH_INTERVAL_SECONDS", 5))
+# ...или сразу, если накопилось столько изменённых переходов
+FLUSH_MAX_PENDING = int(os.getenv("SGLYPA_FLUSH_MAX_PENDING", 5000))
+# Результат массового обучения пишется транзакциями по столько строк: между ними
+# блокировка записи освобождается и остальные писатели (WriteBatcher, кулдауны) успевают
+# в пределах busy_timeout
+MERGE_CHUNK_ROWS = 20000
+MERGE_CHUNK_PAUSE_SECONDS = 0.05
+
+_UPSERT_TRANSITION = (
+    "INSERT INTO sglypa_transitions (peer_id, state, next_word, count) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT(peer_id, state, next_word) DO UPDATE SET count = count + excluded.count"
+)
+
+
+class MarkovStore:
+    """
+    Инкрементальное хранилище моделей Маркова в SQLite.
+    Каждый переход - отдельная строка, поэтому обучение на сообщении пишет только
+    изменившиеся счётчики, а не всю модель. Изменения копятся в памяти и
+    сбрасываются одной транзакцией по таймеру или при переполнении буфера.
+    """
+    def __init__(self, path: str | None = None, flush_interval: float = FLUSH_INTERVAL_SECONDS,
+                 max_pending: int = FLUSH_MAX_PENDING):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        # { (peer_id, state, next_word): прирост счётчика }
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.flushed_rows = 0
+
+    def init_schema(self):
+        with db.transaction(self.path) as cursor:
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS sglypa_transitions (
+                    peer_id INTEGER NOT NULL,
+                    state TEXT NOT NULL,
+                    next_word TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (peer_id, state, next_word)
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS sglypa_chats (
+                    peer_id INTEGER PRIMARY KEY,
+                    sglypa_mode INTEGER NOT NULL DEFAULT 0,
+                    autism_mode INTEGER NOT NULL DEFAULT 0,
+                    markov_order INTEGER
+                )
+            ''')
+            # Таблица из версии без настраиваемого порядка модели
+            columns = {row[1] for row in cursor.execute("PRAGMA table_info(sglypa_chats)")}
+            if 'markov_order' not in columns:
+                cursor.execute("ALTER TABLE sglypa_chats ADD COLUMN markov_order INTEGER")
+
+    def is_empty(self) -> bool:
+        return db.fetchone("SELECT 1 FROM sglypa_transitions LIMIT 1", path=self.path) is None
+
+    def iter_transitions(self):
+        """Построчно отдаёт все переходы: (peer_id, state, next_word, count)."""
+        cursor = db.get_connection(self.path).execute(
+            "SELECT peer_id, state, next_word, count FROM sglypa_transitions ORDER BY peer_id"
+        )
+        yield from cursor
+
+    def iter_chat_transitions(self, peer_id):
+        """Построчно отдаёт переходы одного чата: (state, next_word, count)."""
+        cursor = db.get_connection(self.path).execute(
+            "SELECT state, next_word, count FROM sglypa_transitions WHERE peer_id = ?", (int(peer_id),)
+        )
+        yield from cursor
+
+    def load_chat_flags(self) -> tuple[set, set, dict]:
+        """Возвращает (чаты с режимом Сглыпы, чаты с режимом Аутизма, { peer_id: порядок модели })."""
+        rows = db.fetchall("SELECT peer_id, sglypa_mode, autism_mode, markov_order FROM sglypa_chats", path=self.path)
+        return (
+            {peer_id for peer_id, mode, _, _ in rows if mode},
+            {peer_id for peer_id, _, mode, _ in rows if mode},
+            {peer_id: order for peer_id, _, _, order in rows if order is not None},
+        )
+
+    def save_chat_flags(self, sglypa_chats: set, autism_chats: set, orders: dict | None = None):
+        """Перезаписывает настройки всех чатов (их немного, пишутся редко)."""
+        orders = orders or {}
+        peer_ids = set(sglypa_chats) | set(autism_chats) | set(orders)
+        with db.transaction(self.path) as cursor:
+            cursor.execute("DELETE FROM sglypa_chats")
+            cursor.executemany(
+                "INSERT INTO sglypa_chats (peer_id, sglypa_mode, autism_mode, markov_order) VALUES (?, ?, ?, ?)",
+                [
+                    (int(peer_id), int(peer_id in sglypa_chats), int(peer_id in autism_chats), orders.get(peer_id))
+                    for peer_id in peer_ids
+                ]
+            )
+
+    def record(self, peer_id, state: str, next_word: str, count: int):
+        """Запоминает прирост счётчика перехода. В БД попадёт при следующем сбросе."""
+        key = (int(peer_id), state, next_word)
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + count
+            should_flush = len(self._pending) >= self.max_pending
+        if should_flush:
+            self.flush()
+
+    def merge(self, peer_id, counts: dict):
+        """
+        Добавляет к модели чата готовую таблицу { (state, next_word): count }.
+        Пишет транзакциями по MERGE_CHUNK_ROWS строк с паузой между ними, чтобы
+        не держать блокировку записи всё время импорта.
+        """
+        peer_id = int(peer_id)
+        rows = ((peer_id, state, next_word, count) for (state, next_word), count in counts.items())
+        while True:
+            chunk = list(itertools.islice(rows, MERGE_CHUNK_ROWS))
+            if not chunk:
+                break
+            db.executemany(_UPSERT_TRANSITION, chunk, path=self.path)
+            self.flushed_rows += len(chunk)
+            time.sleep(MERGE_CHUNK_PAUSE_SECONDS)
+
+    def flush(self):
+        """Сбрасывает накопленные изменения в БД одной транзакцией."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return
+            try:
+                db.executemany(
+                    _UPSERT_TRANSITION,
+                    [(peer_id, state, next_word, count) for (peer_id, state, next_word), count in pending.items()],
+                    path=self.path,
+                )
+                self.flushed_rows += len(pending)
+            except Exception as e:
+                logging.error(f"Не удалось сохранить {len(pending)} переходов Сглыпы: {e}")
+                # Возвращаем изменения в буфер, чтобы не потерять их до следующей попытки
+                with self._lock:
+                    for key, count in pending.items():
+                        self._pending[key] = self._pending.get(key, 0) + count
+
+    def compact(self):
+        """Периодическое обслуживание: переносит WAL в основной файл и обновляет статистику."""
+        self.flush()
+        connection = db.get_connection(self.path)
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        connection.execute("PRAGMA optimize")
+
+    def import_json(self, file_path: str) -> bool:
+        """Переносит данные из старого sglypa_data.json в БД. Возвращает True, если что-то перенесено."""
+        if not os.path.exists(file_path):
+            return False
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        rows = [
+            (int(peer_id), state, next_word, count)
+            for peer_id, model in data.get("models", {}).items()
+            for state, transitions in model.items()
+            for next_word, count in transitions.items()
+        ]
+        db.executemany(_UPSERT_TRANSITION, rows, path=self.path)
+        self.save_chat_flags(
+            set(map(int, data.get("active_chats", []))),
+            set(map(int, data.get("autism_chats", []))),
+        )
+        logging.info(f"Модели Сглыпы перенесены из {file_path} в БД: {len(rows)} переходов.")
+        return True
+
+    def start(self):
+        """Запускает фоновый сброс изменений по таймеру."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sglypa-store", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def stop(self):
+        self._stop.set()
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = len(self._pending)
+        return {'pending': pending, 'flushed_rows': self.flushed_rows}
@@ -0,0 +1,141 @@
+import os
+import json
+import time
+import logging
+import threading
+import multiprocessing
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, chain
+
+from core import sglypa
+from core.tokenizer import tokenize
+
+# --- Настройки массового обучения Сглыпы ---
+# Сколько сообщений отдаётся одному процессу за раз
+TRAINING_CHUNK_SIZE = 5000
+# Меньше этого числа сообщений считаем в текущем процессе: запуск пула дороже самого подсчёта
+MIN_MESSAGES_FOR_POOL = 20000
+# Число процессов для подсчёта (по умолчанию - по числу ядер)
+TRAINING_WORKERS = int(os.getenv("SGLYPA_TRAINING_WORKERS", 0)) or None
+# Процессы пула запускаются заново, а не fork'ом: в боте работают потоки диспетчера,
+# планировщика и записи в БД, и копия их замков в дочернем процессе может остаться занятой
+TRAINING_MP_CONTEXT = multiprocessing.get_context("spawn")
+# Сколько сообщений истории чата читать по команде learn, если не указано иное
+DEFAULT_HISTORY_LIMIT = int(os.getenv("SGLYPA_HISTORY_LIMIT", 100000))
+# Папка, из которой берутся экспортированные истории чатов (sdp sglypa learn <файл>)
+IMPORT_DIR = os.getenv("SGLYPA_IMPORT_DIR", "sglypa_imports")
+# Максимальный размер страницы messages.getHistory
+HISTORY_PAGE_SIZE = 200
+# Префиксы команд бота: такие сообщения не учат модель
+COMMAND_PREFIXES = ('sdp', '&')
+
+# Одновременно идёт не больше одного массового обучения: каждое поднимает свой пул процессов.
+# Команда learn берёт замок без ожидания и отказывает, если он занят
+TRAINING_LOCK = threading.Lock()
+
+
+def iter_history(vk, peer_id: int, limit: int = DEFAULT_HISTORY_LIMIT):
+    """Постранично читает историю чата через messages.getHistory и отдаёт тексты сообщений."""
+    offset = 0
+    while offset < limit:
+        response = vk.messages.getHistory(peer_id=peer_id, count=min(HISTORY_PAGE_SIZE, limit - offset), offset=offset)
+        items = response.get('items', [])
+        if not items:
+            return
+        for item in items:
+            # Сообщения сообществ (в том числе самого бота) пропускаем
+            if item.get('from_id', 0) > 0 and item.get('text'):
+                yield item['text']
+        offset += len(items)
+
+
+def iter_export(file_path: str):
+    """
+    Отдаёт тексты сообщений из экспортированного JSON.
+    Поддерживаются список сообщений, ответ VK API ({"items": [...]}) и экспорт
+    Telegram ({"messages": [...]}, где текст может быть списком фрагментов).
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('response', data)
+        data = data.get('items') or data.get('messages') or []
+
+    for item in data:
+        text = item.get('text', '') if isinstance(item, dict) else item
+        if isinstance(text, list):
+            text = ''.join(part if isinstance(part, str) else part.get('text', '') for part in text)
+        if isinstance(text, str) and text:
+            yield text
+
+
+def count_transitions(messages: list[str], order: int) -> Counter:
+    """Считает переходы всех порядков до order: { (state_key, next_word): count }. Выполняется в процессе пула."""
+    counts = Counter()
+    for message in messages:
+        if message.lstrip().lower().startswith(COMMAND_PREFIXES):
+            continue
+        words = tokenize(message)[0]
+        for k in range(1, order + 1):
+            # Состояния длины k в том же виде, что и в БД: слова через пробел
+            states = words if k == 1 else map(' '.join, zip(*(words[j:] for j in range(k))))
+            # Counter.update по итератору считает в C, без питоновского цикла на каждый переход
+            counts.update(zip(states, words[k:]))
+    return counts
+
+
+def _chunks(messages, size: int):
+    iterator = iter(messages)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _map_streaming(executor, chunks, order: int, window: int):
+    """
+    Как executor.map, но берёт части из источника по мере выполнения: в работе
+    не больше window частей, поэтому длинный экспорт не читается в память целиком.
+    """
+    in_flight = deque()
+    for chunk in chunks:
+        in_flight.append(executor.submit(count_transitions, chunk, order))
+        if len(in_flight) >= window:
+            yield in_flight.popleft().result()
+    while in_flight:
+        yield in_flight.popleft().result()
+
+
+def train(peer_id: int, messages, workers: int | None = TRAINING_WORKERS) -> dict:
+    """
+    Обучает модель чата на пачке сообщений (любой итерируемый источник текстов).
+    Сообщения читаются из источника по частям и считаются параллельно в пуле процессов,
+    частичные таблицы сливаются, а результат записывается в модель и БД.
+    """
+    started = time.monotonic()
+    order = sglypa.get_chat_order(peer_id)
+    total_messages = 0
+
+    def counted(chunks):
+        nonlocal total_messages
+        for chunk in chunks:
+            total_messages += len(chunk)
+            yield chunk
+
+    chunks = counted(_chunks(messages, TRAINING_CHUNK_SIZE))
+    # Первые части читаем заранее: если источник на них кончился, пул не нужен
+    head = list(islice(chunks, -(-MIN_MESSAGES_FOR_POOL // TRAINING_CHUNK_SIZE)))
+
+    counts = Counter()
+    if total_messages < MIN_MESSAGES_FOR_POOL:
+        for chunk in head:
+            counts.update(count_transitions(chunk, order))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=TRAINING_MP_CONTEXT) as executor:
+            window = 2 * (workers or os.cpu_count() or 1)
+            for partial in _map_streaming(executor, chain(head, chunks), order, window):
+                counts.update(partial)
+
+    sglypa.merge_counts(peer_id, counts)
+    elapsed = time.monotonic() - started
+    logging.info(f"Сглыпа обучена для чата {peer_id}: {total_messages} сообщений, {len(counts)} переходов за {elapsed:.1f} с.")
+    return {'messages': total_messages, 'transitions': len(counts), 'seconds': elapsed}
@@ -0,0 +1,53 @@
+import logging
+import threading
+
+
+class SingleFlight:
+    """
+    Склеивает одинаковые запросы, пришедшие, пока первый ещё выполняется.
+    Первый вызвавший становится ведущим и выполняет запрос, остальные только
+    подписываются на результат и получают его в тот же момент, что и ведущий.
+    В отличие от кэша, работает до появления первого ответа.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        # { key: [callback, ...] } - первый callback принадлежит ведущему
+        self._calls = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def join(self, key, callback) -> bool:
+        """
+        Подписывает callback(result) на результат запроса key.
+        Возвращает True, если вызывающий стал ведущим и должен выполнить запрос сам.
+        """
+        with self._lock:
+            waiters = self._calls.get(key)
+            if waiters is not None:
+                waiters.append(callback)
+                self.coalesced += 1
+                return False
+            self._calls[key] = [callback]
+            self.leaders += 1
+            return True
+
+    def resolve(self, key, result):
+        """Завершает запрос key и передаёт результат всем подписчикам."""
+        with self._lock:
+            waiters = self._calls.pop(key, [])
+        for callback in waiters:
+            try:
+                callback(result)
+            except Exception as e:
+                logging.error(f"Ошибка при доставке результата склеенного запроса: {e}", exc_info=True)
+
+    def cancel(self, key) -> list:
+        """Отменяет запрос key, не вызывая подписчиков. Возвращает callback'и всех, кроме ведущего."""
+        with self._lock:
+            waiters = self._calls.pop(key, [])
+        return waiters[1:]
+
+    def stats(self) -> dict:
+        with self._lock:
+            in_flight = len(self._calls)
+        return {'in_flight': in_flight, 'leaders': self.leaders, 'coalesced': self.coalesced}
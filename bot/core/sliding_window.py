@@ -0,0 +1,159 @@
+import time
+import heapq
+import threading
+from collections import deque
+
+
+class SlidingWindowLimiter:
+    """
+    Ограничитель «не больше N использований за окно» со скользящим окном.
+    Для каждого ключа хранятся только отметки времени внутри окна, а ключи,
+    у которых окно закончилось, удаляются по куче сроков истечения.
+    В куче ровно одна запись на ключ, поэтому память пропорциональна числу
+    активных ключей, а не числу всех, кто когда-либо пользовался командами.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        # { key: deque[timestamp] } - отметки использований внутри окна
+        self._hits = {}
+        # { key: момент, когда окно ключа полностью истечёт }
+        self._expires_at = {}
+        # [(expires_at, key)] - может отставать от _expires_at, тогда запись переставляется
+        self._heap = []
+        self.allowed = 0
+        self.blocked = 0
+        self.evictions = 0
+
+    def retry_after(self, key, uses: int, window: float, now: float | None = None) -> float:
+        """Сколько секунд ждать до следующего разрешённого использования (0 - можно сейчас)."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._evict(now)
+            hits = self._hits.get(key)
+            if hits:
+                self._trim(hits, now - window)
+            if not hits or len(hits) < uses:
+                self.allowed += 1
+                return 0
+            self.blocked += 1
+            # Использование станет доступно, когда из окна выпадет uses-я с конца отметка
+            return hits[-uses] + window - now
+
+    def hit(self, key, window: float, now: float | None = None):
+        """Отмечает использование ключа."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._hit(key, window, now)
+            self._evict(now)
+
+    def try_acquire(self, limits, now: float | None = None) -> float:
+        """
+        Проверка и отметка одной операцией: limits - [(key, uses, window), ...].
+        Если все ключи свободны, отмечает использование в каждом с меткой now и возвращает 0,
+        иначе ничего не отмечает и возвращает, сколько секунд ждать.
+        Между проверкой и отметкой никто другой не может занять тот же ключ.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._evict(now)
+            wait = 0
+            for key, uses, window in limits:
+                hits = self._hits.get(key)
+                if hits:
+                    self._trim(hits, now - window)
+                if hits and len(hits) >= uses:
+                    wait = max(wait, hits[-uses] + window - now)
+            if wait > 0:
+                self.blocked += 1
+                return wait
+            self.allowed += 1
+            for key, _, window in limits:
+                self._hit(key, window, now)
+            return 0
+
+    def release(self, keys, now: float):
+        """Отменяет использование, отмеченное в try_acquire/hit с меткой now (например, команда упала)."""
+        with self._lock:
+            for key in keys:
+                hits = self._hits.get(key)
+                if hits and now in hits:
+                    hits.remove(now)
+
+    def _hit(self, key, window: float, now: float):
+        hits = self._hits.get(key)
+        if hits is None:
+            hits = self._hits[key] = deque()
+            heapq.heappush(self._heap, (now + window, key))
+        else:
+            self._trim(hits, now - window)
+        hits.append(now)
+        self._expires_at[key] = max(self._expires_at.get(key, 0), now + window)
+
+    def evict(self, now: float | None = None) -> int:
+        """Удаляет ключи с истёкшими окнами. Возвращает число удалённых ключей."""
+        with self._lock:
+            return self._evict(time.time() if now is None else now)
+
+    def _evict(self, now: float) -> int:
+        evicted = 0
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            _, key = heapq.heappop(heap)
+            expires_at = self._expires_at.get(key)
+            if expires_at is None:
+                continue
+            if expires_at > now:
+                # Ключ использовали после постановки в кучу - переносим на новый срок
+                heapq.heappush(heap, (expires_at, key))
+                continue
+            del self._expires_at[key]
+            del self._hits[key]
+            evicted += 1
+        self.evictions += evicted
+        return evicted
+
+    @staticmethod
+    def _trim(hits: deque, threshold: float):
+        while hits and hits[0] <= threshold:
+            hits.popleft()
+
+    def snapshot(self, now: float | None = None) -> list[tuple]:
+        """Живые ключи для сохранения: [(key, expires_at, [timestamp, ...]), ...]."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._evict(now)
+            return [(key, self._expires_at[key], list(hits)) for key, hits in self._hits.items()]
+
+    def restore(self, entries, now: float | None = None) -> int:
+        """Восстанавливает ключи из snapshot(), пропуская уже истёкшие. Возвращает число ключей."""
+        now = time.time() if now is None else now
+        restored = 0
+        with self._lock:
+            for key, expires_at, hits in entries:
+                if expires_at <= now or key in self._hits:
+                    continue
+                self._hits[key] = deque(sorted(hits))
+                self._expires_at[key] = expires_at
+                heapq.heappush(self._heap, (expires_at, key))
+                restored += 1
+        return restored
+
+    def clear(self):
+        with self._lock:
+            self._hits.clear()
+            self._expires_at.clear()
+            self._heap.clear()
+
+    def __len__(self):
+        return len(self._hits)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'keys': len(self._hits),
+                'timestamps': sum(len(hits) for hits in self._hits.values()),
+                'heap': len(self._heap),
+                'allowed': self.allowed,
+                'blocked': self.blocked,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,127 @@
+import re
+from functools import lru_cache
+
+# Упрощённый стеммер Портера (Snowball) для русского языка: отрезает падежные,
+# глагольные и прочие окончания, чтобы «ауры», «ауре» и «аура» давали одну основу.
+# Слова не на кириллице возвращаются без изменений.
+
+STEM_CACHE_SIZE = 65536
+
+_VOWELS = 'аеиоуыэюя'
+_CYRILLIC_RE = re.compile(r'^[а-я]+$')
+
+# Окончания группы 1 снимаются только после «а» или «я» (сама буква остаётся)
+_PERFECTIVE_GERUND_1 = ('вшись', 'вши', 'в')
+_PERFECTIVE_GERUND_2 = ('ившись', 'ывшись', 'ивши', 'ывши', 'ив', 'ыв')
+_REFLEXIVE = ('ся', 'сь')
+_ADJECTIVE = (
+    'ими', 'ыми', 'его', 'ого', 'ему', 'ому', 'ее', 'ие', 'ые', 'ое', 'ей', 'ий', 'ый', 'ой',
+    'ем', 'им', 'ым', 'ом', 'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею',
+)
+_PARTICIPLE_1 = ('ем', 'нн', 'вш', 'ющ', 'щ')
+_PARTICIPLE_2 = ('ивш', 'ывш', 'ующ')
+_VERB_1 = ('ете', 'йте', 'ешь', 'нно', 'ла', 'на', 'ли', 'ем', 'ло', 'но', 'ет', 'ют', 'ны', 'ть', 'й', 'л', 'н')
+_VERB_2 = (
+    'ейте', 'уйте', 'ила', 'ыла', 'ена', 'ите', 'или', 'ыли', 'ило', 'ыло', 'ено', 'ует', 'уют',
+    'ены', 'ить', 'ыть', 'ишь', 'ей', 'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ят', 'ит', 'ыт', 'ую', 'ю',
+)
+_NOUN = (
+    'иями', 'ями', 'ами', 'ией', 'иям', 'ием', 'иях', 'ев', 'ов', 'ие', 'ье', 'еи', 'ии', 'ей', 'ой',
+    'ий', 'ям', 'ем', 'ам', 'ом', 'ах', 'ях', 'ию', 'ью', 'ия', 'ья', 'а', 'е', 'и', 'й', 'о', 'у',
+    'ы', 'ь', 'ю', 'я',
+)
+_SUPERLATIVE = ('ейше', 'ейш')
+_DERIVATIONAL = ('ость', 'ост')
+
+
+def _by_length(endings):
+    return tuple(sorted(endings, key=len, reverse=True))
+
+
+_PERFECTIVE_GERUND_1 = _by_length(_PERFECTIVE_GERUND_1)
+_PERFECTIVE_GERUND_2 = _by_length(_PERFECTIVE_GERUND_2)
+_ADJECTIVE = _by_length(_ADJECTIVE)
+_PARTICIPLE_1 = _by_length(_PARTICIPLE_1)
+_PARTICIPLE_2 = _by_length(_PARTICIPLE_2)
+_VERB_1 = _by_length(_VERB_1)
+_VERB_2 = _by_length(_VERB_2)
+_NOUN = _by_length(_NOUN)
+
+
+def _strip(rv: str, endings: tuple, after_a: bool = False) -> str | None:
+    """Снимает самое длинное подходящее окончание. None - ни одно не подошло."""
+    for ending in endings:
+        if rv.endswith(ending):
+            rest = rv[:-len(ending)]
+            if after_a and not rest.endswith(('а', 'я')):
+                continue
+            return rest
+    return None
+
+
+def _strip_any(rv: str, group1: tuple, group2: tuple) -> str | None:
+    """Самое длинное окончание из двух групп (группа 1 - только после «а»/«я»)."""
+    candidates = [rest for rest in (_strip(rv, group1, after_a=True), _strip(rv, group2)) if rest is not None]
+    return min(candidates, key=len) if candidates else None
+
+
+def _region_start(word: str, start: int = 0) -> int:
+    """Начало области R1 (или R2 при повторном вызове): после первой согласной, идущей за гласной."""
+    for i in range(start + 1, len(word)):
+        if word[i] not in _VOWELS and word[i - 1] in _VOWELS:
+            return i + 1
+    return len(word)
+
+
+@lru_cache(maxsize=STEM_CACHE_SIZE)
+def stem(word: str) -> str:
+    """Основа русского слова (в нижнем регистре)."""
+    word = word.lower().replace('ё', 'е')
+    if not _CYRILLIC_RE.match(word):
+        return word
+
+    # RV - часть слова после первой гласной, окончания ищутся только в ней
+    rv_start = next((i + 1 for i, ch in enumerate(word) if ch in _VOWELS), len(word))
+    prefix, rv = word[:rv_start], word[rv_start:]
+    r2_start = _region_start(word, _region_start(word)) - rv_start
+
+    # Шаг 1: деепричастие, иначе возвратность и прилагательное/глагол/существительное
+    rest = _strip_any(rv, _PERFECTIVE_GERUND_1, _PERFECTIVE_GERUND_2)
+    if rest is not None:
+        rv = rest
+    else:
+        rest = _strip(rv, _REFLEXIVE)
+        if rest is not None:
+            rv = rest
+        rest = _strip(rv, _ADJECTIVE)
+        if rest is not None:
+            participle = _strip_any(rest, _PARTICIPLE_1, _PARTICIPLE_2)
+            rv = rest if participle is None else participle
+        else:
+            rest = _strip_any(rv, _VERB_1, _VERB_2)
+            if rest is None:
+                rest = _strip(rv, _NOUN)
+            if rest is not None:
+                rv = rest
+
+    # Шаг 2: конечное «и»
+    if rv.endswith('и'):
+        rv = rv[:-1]
+
+    # Шаг 3: словообразовательный суффикс «ость» - только в области R2
+    for ending in _DERIVATIONAL:
+        if rv.endswith(ending) and len(rv) - len(ending) >= r2_start:
+            rv = rv[:-len(ending)]
+            break
+
+    # Шаг 4: «нн» -> «н», превосходная степень, мягкий знак
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    else:
+        rest = _strip(rv, _SUPERLATIVE)
+        if rest is not None:
+            rv = rest[:-1] if rest.endswith('нн') else rest
+        elif rv.endswith('ь'):
+            rv = rv[:-1]
+
+    return prefix + rv
@@ -0,0 +1,18 @@
+import re
+
+# --- Токенизатор Сглыпы ---
+# Всё, что вырезается из сообщения, одним выражением: ссылки, упоминания ([id123|...])
+# и всё, кроме букв кириллицы/латиницы и пробельных символов. «[» стоит отдельной веткой
+# после упоминания, чтобы ветка «не буквы» не съела начало упоминания вместе с соседней
+# пунктуацией и не оставила от него буквы «id»
+_CLEAN_RE = re.compile(r'https?://\S+|\[id\d+\|.*?\]|[^a-zA-Zа-яА-ЯёЁ\s\[]+|\[')
+
+
+def tokenize(text: str) -> tuple[tuple[str, ...], str]:
+    """
+    Очищает текст от мусора одним re.sub и возвращает (слова, ключ для сравнения мемов).
+    Ключ - слова через пробел, поэтому сообщения, отличающиеся регистром,
+    пунктуацией или ссылками, считаются одинаковыми.
+    """
+    tokens = tuple(_CLEAN_RE.sub('', text).lower().split())
+    return tokens, ' '.join(tokens)
@@ -5,13 +5,38 @@ import json
 import os
 from vk_api.vk_api import VkApiMethod
 
+from core.vk_batch import VkBatch
+
 MAX_MESSAGE_LENGTH = 4000 # Немного меньше лимита VK (4096) для надежности
+# Потоковые ответы: первая часть уходит после первого абзаца, дальше - крупными частями
+STREAM_FIRST_PART_LENGTH = 200
+STREAM_PART_LENGTH = 1500
 SETTINGS_FILE = "settings.json"
 
 def get_random_id():
     """Генерирует случайный ID для сообщения VK."""
     return random.getrandbits(31) * random.choice([-1, 1])
 
+def split_message(message: str, limit: int = MAX_MESSAGE_LENGTH) -> list[str]:
+    """Разбивает текст на части не длиннее limit, стараясь резать по переносам строк."""
+    parts = []
+    remaining_message = message
+    while len(remaining_message) > 0:
+        if len(remaining_message) <= limit:
+            parts.append(remaining_message)
+            break
+        
+        # Ищем последний перенос строки в пределах лимита для красивого разрыва
+        split_index = remaining_message.rfind('\n', 0, limit)
+        
+        # Если переноса строки нет, или он не подходит, режем по максимальной длине
+        if split_index <= 0:
+            split_index = limit
+        
+        parts.append(remaining_message[:split_index])
+        remaining_message = remaining_message[split_index:].lstrip()
+    return parts
+
 def send_message(vk: VkApiMethod, peer_id: int, message: str, **kwargs):
     """
     Отправляет сообщение, автоматически разбивая его на части, если оно превышает лимит.
@@ -23,23 +48,10 @@ def send_message(vk: VkApiMethod, peer_id: int, message: str, **kwargs):
 
         logging.info(f"Сообщение для чата {peer_id} слишком длинное. Разбиваю на части.")
         
-        parts = []
-        remaining_message = message
-        while len(remaining_message) > 0:
-            if len(remaining_message) <= MAX_MESSAGE_LENGTH:
-                parts.append(remaining_message)
-                break
-            
-            # Ищем последний перенос строки в пределах лимита для красивого разрыва
-            split_index = remaining_message.rfind('\n', 0, MAX_MESSAGE_LENGTH)
-            
-            # Если переноса строки нет, или он не подходит, режем по максимальной длине
-            if split_index <= 0:
-                split_index = MAX_MESSAGE_LENGTH
-            
-            parts.append(remaining_message[:split_index])
-            remaining_message = remaining_message[split_index:].lstrip()
+        parts = split_message(message)
 
+        # Все части уходят одним запросом execute (по порядку), а не отдельным запросом на каждую
+        batch = VkBatch(vk)
         for i, part in enumerate(parts):
             if part:
                 header = f"📄 Часть {i + 1}/{len(parts)}\n"
@@ -50,13 +62,65 @@ def send_message(vk: VkApiMethod, peer_id: int, message: str, **kwargs):
                 else:
                     final_message = header + part
                 
-                vk.messages.send(peer_id=peer_id, message=final_message, random_id=get_random_id(), **kwargs)
+                batch.add("messages.send", peer_id=peer_id, message=final_message, random_id=get_random_id(), **kwargs)
+        batch.execute()
 
     except vk_api.exceptions.ApiError as e:
         logging.error(f"Ошибка VK API при отправке сообщения в чат {peer_id}: {e}")
     except Exception as e:
         logging.error(f"Неизвестная ошибка при отправке сообщения в чат {peer_id}: {e}")
 
+# Границы, по которым режется потоковый ответ, в порядке предпочтения: абзац, строка,
+# конец предложения (разрез после знака) и пробел между словами
+_STREAM_BOUNDARIES = (('\n\n', 0), ('\n', 0), ('. ', 1), ('! ', 1), ('? ', 1), ('… ', 1), (' ', 0))
+
+def _stream_split_index(buffer: str, minimum: int) -> int | None:
+    """Позиция разреза буфера по лучшей из границ, не раньше minimum. None - границы нет."""
+    sentence_end = None
+    for boundary, offset in _STREAM_BOUNDARIES:
+        index = buffer.rfind(boundary)
+        if index < minimum:
+            continue
+        if offset:
+            # Из концов предложений берётся самый поздний, каким бы знаком он ни был
+            sentence_end = max(sentence_end or 0, index + offset)
+            continue
+        if sentence_end is not None:
+            return sentence_end
+        return index
+    return sentence_end
+
+def send_streamed_message(vk: VkApiMethod, peer_id: int, chunks, first_part_length: int = STREAM_FIRST_PART_LENGTH,
+                          part_length: int = STREAM_PART_LENGTH) -> str:
+    """
+    Отправляет потоковый ответ по частям. Первая часть уходит, как только набралось
+    first_part_length символов, следующие копятся до part_length символов. Части режутся
+    по абзацам, а если их нет - по строкам, предложениям или словам.
+    Возвращает полный текст ответа.
+    """
+    full_text = []
+    buffer = ""
+    threshold = first_part_length
+    for chunk in chunks:
+        full_text.append(chunk)
+        buffer += chunk
+        if len(buffer) < threshold:
+            continue
+        # Отправляем всё до последней удобной границы (или всё, если буфер уже слишком большой)
+        split_index = _stream_split_index(buffer, threshold // 2)
+        if split_index is None:
+            if len(buffer) < MAX_MESSAGE_LENGTH:
+                continue
+            split_index = len(buffer)
+        part, buffer = buffer[:split_index].strip(), buffer[split_index:].lstrip()
+        if part:
+            send_message(vk, peer_id, part)
+            threshold = part_length
+    buffer = buffer.strip()
+    if buffer:
+        send_message(vk, peer_id, buffer)
+    return "".join(full_text)
+
 def load_settings():
     """Загружает настройки из файла settings.json."""
     if os.path.exists(SETTINGS_FILE):
@@ -0,0 +1,89 @@
+import json
+import logging
+
+# --- Настройки пакетных вызовов через execute ---
+# VK выполняет не больше 25 обращений к API внутри одного execute
+MAX_CALLS_PER_EXECUTE = 25
+# Ограничение на размер кода VKScript (с запасом от лимита запроса)
+MAX_CODE_LENGTH = 60000
+
+
+class BatchCall:
+    """Один вызов внутри пачки. После выполнения пачки в result лежит ответ метода (False - ошибка)."""
+    __slots__ = ('method', 'params', 'result', 'done')
+
+    def __init__(self, method: str, params: dict):
+        self.method = method
+        self.params = params
+        self.result = None
+        self.done = False
+
+    @property
+    def ok(self) -> bool:
+        return self.done and self.result is not False
+
+    def to_vkscript(self) -> str:
+        params = json.dumps(self.params, ensure_ascii=False, separators=(',', ':'))
+        return f"API.{self.method}({params})"
+
+
+class VkBatch:
+    """
+    Собирает вызовы VK API и выполняет их пачками по 25 через метод execute:
+    N вызовов стоят ceil(N / 25) HTTP-запросов. Внутри execute вызовы идут
+    по порядку, результат каждого возвращается в его BatchCall.
+
+        with VkBatch(vk) as batch:
+            calls = [batch.add("messages.delete", message_ids=i, delete_for_all=1) for i in ids]
+        deleted = sum(call.ok for call in calls)
+    """
+    def __init__(self, vk):
+        self.vk = vk
+        self._calls = []
+
+    def add(self, method: str, **params) -> BatchCall:
+        call = BatchCall(method, params)
+        self._calls.append(call)
+        return call
+
+    def execute(self) -> list[BatchCall]:
+        """Выполняет накопленные вызовы. Ошибка самого execute пробрасывается, ошибки вызовов - в result."""
+        calls, self._calls = self._calls, []
+        for chunk, code in _pack(calls):
+            results = self.vk.execute(code=code)
+            if not isinstance(results, list):
+                results = [results]
+            failed = 0
+            for call, result in zip(chunk, results):
+                call.result = result
+                call.done = True
+                failed += result is False
+            if failed:
+                logging.warning(f"В пачке execute не выполнено {failed} из {len(chunk)} вызовов ({chunk[0].method}).")
+        return calls
+
+    def __len__(self):
+        return len(self._calls)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.execute()
+
+
+def _pack(calls: list[BatchCall]):
+    """Режет вызовы на пачки не больше 25 штук и не длиннее MAX_CODE_LENGTH. Отдаёт (пачка, код)."""
+    chunk, parts, length = [], [], 0
+    for call in calls:
+        part = call.to_vkscript()
+        if chunk and (len(chunk) >= MAX_CALLS_PER_EXECUTE or length + len(part) > MAX_CODE_LENGTH):
+            yield chunk, f"return [{','.join(parts)}];"
+            chunk, parts, length = [], [], 0
+        chunk.append(call)
+        parts.append(part)
+        length += len(part) + 1
+    if chunk:
+        yield chunk, f"return [{','.join(parts)}];"
+
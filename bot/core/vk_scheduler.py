@@ -0,0 +1,197 @@
+import os
+import time
+import heapq
+import random
+import logging
+import itertools
+import threading
+
+import vk_api.exceptions
+
+# --- Настройки исходящих вызовов VK API ---
+# Лимит VK для ключа сообщества - 20 запросов в секунду на все методы вместе
+GROUP_RATE_LIMIT = float(os.getenv("VK_RATE_LIMIT", 20))
+# Отдельные лимиты для методов, которые вызываются пачками (удаление, чтение истории)
+METHOD_RATE_LIMITS = {
+    "messages.delete": float(os.getenv("VK_DELETE_RATE_LIMIT", 5)),
+    "messages.getHistory": float(os.getenv("VK_HISTORY_RATE_LIMIT", 5)),
+}
+# Повторы при ошибке 6 ("Too many requests per second")
+MAX_RATE_LIMIT_RETRIES = 5
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 8
+RATE_LIMIT_ERROR_CODE = 6
+
+# Приоритеты: меньше - раньше. Ответы пользователям обслуживаются раньше массовых админских операций
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+
+
+class TokenBucket:
+    """Ведро токенов: rate токенов в секунду, не больше capacity в запасе (размер всплеска)."""
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Через сколько секунд появится целый токен (0 - есть уже сейчас)."""
+        self._refill(now)
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def drain(self, now: float):
+        """Обнуляет запас: VK уже считает, что мы превысили лимит."""
+        self._refill(now)
+        self.tokens = min(self.tokens, 0)
+
+
+class VKCallScheduler:
+    """
+    Единая очередь исходящих вызовов VK API.
+    Каждый вызов берёт токен из общего ведра ключа сообщества и из ведра своего метода
+    (если для него задан лимит). Пока токенов нет, вызовы ждут в очереди по приоритету,
+    а при ошибке 6 повторяются с экспоненциальной задержкой со случайным разбросом.
+    """
+    def __init__(self, rate: float = GROUP_RATE_LIMIT, method_limits: dict | None = None):
+        self._cond = threading.Condition()
+        self._group = TokenBucket(rate)
+        self._methods = {
+            method: TokenBucket(limit)
+            for method, limit in (METHOD_RATE_LIMITS if method_limits is None else method_limits).items()
+        }
+        # [(priority, seq)] - очередь ожидающих; токен может взять только голова очереди
+        self._waiters = []
+        self._seq = itertools.count()
+        self.calls = 0
+        self.delayed = 0
+        self.wait_seconds = 0.0
+        self.rate_limited = 0
+
+    def acquire(self, method: str, priority: int = PRIORITY_INTERACTIVE) -> float:
+        """Ждёт своей очереди и токенов для вызова method. Возвращает время ожидания."""
+        ticket = (priority, next(self._seq))
+        started = time.monotonic()
+        buckets = [self._group]
+        if method in self._methods:
+            buckets.append(self._methods[method])
+
+        with self._cond:
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    if self._waiters[0] != ticket:
+                        self._cond.wait()
+                        continue
+                    wait = max(bucket.wait_time(time.monotonic()) for bucket in buckets)
+                    if wait <= 0:
+                        for bucket in buckets:
+                            bucket.take()
+                        break
+                    self._cond.wait(wait)
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+            waited = time.monotonic() - started
+            self.calls += 1
+            if waited > 0.001:
+                self.delayed += 1
+                self.wait_seconds += waited
+        return waited
+
+    def call(self, method: str, func, priority: int = PRIORITY_INTERACTIVE, **kwargs):
+        """Вызывает func(**kwargs) с соблюдением лимитов и повторами при ошибке 6."""
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            self.acquire(method, priority)
+            try:
+                return func(**kwargs)
+            except vk_api.exceptions.ApiError as e:
+                if e.code != RATE_LIMIT_ERROR_CODE or attempt == MAX_RATE_LIMIT_RETRIES:
+                    raise
+                with self._cond:
+                    self.rate_limited += 1
+                    self._group.drain(time.monotonic())
+                # Полный случайный разброс, чтобы повторы разных потоков не совпали
+                delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+                logging.warning(f"VK вернул ошибку 6 на {method}, повтор {attempt + 1} через {delay:.2f} с.")
+                time.sleep(delay)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                'calls': self.calls,
+                'delayed': self.delayed,
+                'avg_wait_ms': round(self.wait_seconds / self.delayed * 1000, 1) if self.delayed else 0.0,
+                'rate_limited': self.rate_limited,
+                'waiting': len(self._waiters),
+            }
+
+
+class RateLimitedVk:
+    """
+    Обёртка над объектом vk_session.get_api(): vk.messages.send(...) и любые другие
+    методы проходят через планировщик. Код обработчиков при этом не меняется.
+    """
+    __slots__ = ('_vk', '_scheduler', '_priority')
+
+    def __init__(self, vk, scheduler: VKCallScheduler, priority: int = PRIORITY_INTERACTIVE):
+        self._vk = vk
+        self._scheduler = scheduler
+        self._priority = priority
+
+    def with_priority(self, priority: int) -> 'RateLimitedVk':
+        return RateLimitedVk(self._vk, self._scheduler, priority)
+
+    def __getattr__(self, section: str):
+        return _RateLimitedSection(self, section)
+
+
+class _RateLimitedSection:
+    __slots__ = ('_owner', '_section')
+
+    def __init__(self, owner: RateLimitedVk, section: str):
+        self._owner = owner
+        self._section = section
+
+    def __getattr__(self, name: str):
+        owner = self._owner
+        method = getattr(getattr(owner._vk, self._section), name)
+        method_name = f"{self._section}.{name}"
+
+        def call(**kwargs):
+            return owner._scheduler.call(method_name, method, owner._priority, **kwargs)
+        return call
+
+    def __call__(self, **kwargs):
+        # Методы без раздела, например vk.execute(code=...)
+        owner = self._owner
+        return owner._scheduler.call(self._section, getattr(owner._vk, self._section), owner._priority, **kwargs)
+
+
+# Общий планировщик на процесс: у бота один ключ сообщества
+VK_SCHEDULER = VKCallScheduler()
+
+
+def rate_limited(vk, priority: int = PRIORITY_INTERACTIVE) -> RateLimitedVk:
+    """Оборачивает объект VK API так, чтобы все вызовы шли через общий планировщик."""
+    if isinstance(vk, RateLimitedVk):
+        return vk.with_priority(priority)
+    return RateLimitedVk(vk, VK_SCHEDULER, priority)
+
+
+def bulk(vk):
+    """Тот же VK API, но с низким приоритетом - для массовых операций (очистка чата, чтение истории)."""
+    if isinstance(vk, RateLimitedVk):
+        return vk.with_priority(PRIORITY_BULK)
+    return vk
@@ -1,9 +1,11 @@
 import sqlite3
 import logging
+import threading
+from core import db
 
 def init_db():
     """Инициализирует базу данных и создает необходимые таблицы."""
-    conn = sqlite3.connect('bot.db')
+    conn = db.get_connection()
     cursor = conn.cursor()
 
     # Таблица для связи пользователей VK с их игровыми персонажами
@@ -50,48 +52,112 @@ def init_db():
     except sqlite3.OperationalError:
         pass # Столбец уже существует
 
+    # Снимок активных кулдаунов, чтобы они переживали перезапуск бота
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cooldowns (
+            scope TEXT NOT NULL,
+            scope_id INTEGER NOT NULL,
+            command TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            hits TEXT NOT NULL,
+            PRIMARY KEY (scope, scope_id, command)
+        )
+    ''')
+
     conn.commit()
-    conn.close()
+    cursor.close()
+
+# --- Кэш ролей ---
+# { vk_id: role } - роли всех известных пользователей. Загружается один раз при старте
+# и обновляется только через set_user_role/set_users_role, поэтому проверка прав
+# на горячем пути никогда не обращается к диску.
+_ROLE_CACHE = {}
+_role_cache_loaded = False
+_role_cache_lock = threading.Lock()
+
+def load_role_cache():
+    """Загружает роли всех пользователей из БД в память."""
+    with _role_cache_lock:
+        _load_role_cache_locked()
+
+def _load_role_cache_locked():
+    # Чтение под блокировкой: иначе set_users_role между SELECT и заполнением кэша
+    # был бы перезаписан устаревшей ролью из БД
+    global _role_cache_loaded
+    rows = db.fetchall("SELECT vk_id, role FROM users")
+    _ROLE_CACHE.clear()
+    _ROLE_CACHE.update(rows)
+    _role_cache_loaded = True
+    logging.info(f"Кэш ролей загружен: {len(rows)} пользователей.")
+
+def get_user_role(vk_id: int) -> str:
+    """
+    Возвращает роль пользователя из кэша. Неизвестный пользователь сразу получает роль 'user',
+    а его запись в БД добавляется отложенно, пачкой с остальными записями.
+    """
+    role = _ROLE_CACHE.get(vk_id)
+    if role is not None:
+        return role
+    with _role_cache_lock:
+        # Повторная проверка под блокировкой: кэш загружает только первый поток
+        if not _role_cache_loaded:
+            _load_role_cache_locked()
+        role = _ROLE_CACHE.get(vk_id)
+        if role is None:
+            role = _ROLE_CACHE[vk_id] = 'user'
+            logging.info(f"Создан новый пользователь с vk_id: {vk_id}")
+            db.WRITE_BATCHER.add("INSERT OR IGNORE INTO users (vk_id) VALUES (?)", (vk_id,))
+    return role
 
 def get_or_create_user(vk_id: int):
     """
-    Получает пользователя из БД по его vk_id. Если пользователь не найден, создает нового с ролью 'user'.
+    Получает пользователя по его vk_id. Если пользователь не найден, создает нового с ролью 'user'.
     Возвращает словарь с данными пользователя.
     """
-    conn = sqlite3.connect('bot.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT vk_id, role FROM users WHERE vk_id = ?", (vk_id,))
-    user = cursor.fetchone()
-    
-    if user:
-        conn.close()
-        return {'vk_id': user[0], 'role': user[1]}
-    else:
-        logging.info(f"Создан новый пользователь с vk_id: {vk_id}")
-        cursor.execute("INSERT INTO users (vk_id) VALUES (?)", (vk_id,))
-        conn.commit()
-        conn.close()
-        return {'vk_id': vk_id, 'role': 'user'}
+    return {'vk_id': vk_id, 'role': get_user_role(vk_id)}
 
 def set_user_role(vk_id: int, role: str):
     """Устанавливает пользователю указанную роль."""
-    get_or_create_user(vk_id) # Убедимся, что пользователь существует
-    conn = sqlite3.connect('bot.db')
-    cursor = conn.cursor()
-    cursor.execute("UPDATE users SET role = ? WHERE vk_id = ?", (role, vk_id))
-    conn.commit()
-    conn.close()
+    set_users_role([vk_id], role)
     logging.info(f"Пользователю {vk_id} установлена роль '{role}'.")
 
+def set_users_role(vk_ids: list, role: str):
+    """Устанавливает указанную роль сразу нескольким пользователям одной транзакцией."""
+    with _role_cache_lock:
+        with db.transaction() as cursor:
+            # Убедимся, что пользователи существуют
+            cursor.executemany("INSERT OR IGNORE INTO users (vk_id) VALUES (?)", [(vk_id,) for vk_id in vk_ids])
+            cursor.executemany("UPDATE users SET role = ? WHERE vk_id = ?", [(role, vk_id) for vk_id in vk_ids])
+        # Кэш обновляется только после успешного коммита
+        for vk_id in vk_ids:
+            _ROLE_CACHE[vk_id] = role
+
 def get_users_by_role(role: str) -> list:
     """Возвращает список vk_id пользователей с указанной ролью."""
-    conn = sqlite3.connect('bot.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT vk_id FROM users WHERE role = ?", (role,))
-    users = cursor.fetchall()
-    conn.close()
+    users = db.fetchall("SELECT vk_id FROM users WHERE role = ?", (role,))
     return [user[0] for user in users]
 
+# --- Напоминания ---
+
+def add_reminder(target_vk_id: int, setter_vk_id: int, message: str, due_date, peer_id: int):
+    """Добавляет напоминание в базу данных."""
+    db.execute(
+        "INSERT INTO reminders (target_vk_id, setter_vk_id, message, due_date, peer_id) VALUES (?, ?, ?, ?, ?)",
+        (target_vk_id, setter_vk_id, message, due_date, peer_id)
+    )
+
+def get_due_reminders(now) -> list:
+    """Возвращает неотправленные напоминания из чатов (peer_id > 2000000000), срок которых наступил."""
+    return db.fetchall(
+        "SELECT id, target_vk_id, setter_vk_id, message, peer_id FROM reminders WHERE due_date <= ? AND sent = 0 AND peer_id > 2000000000",
+        (now,)
+    )
+
+def mark_reminders_sent(reminder_ids: list):
+    """Помечает напоминания отправленными одной транзакцией."""
+    if reminder_ids:
+        db.executemany("UPDATE reminders SET sent = 1 WHERE id = ?", [(rem_id,) for rem_id in reminder_ids])
+
 
 if __name__ == '__main__':
     init_db()
@@ -1,9 +1,12 @@
+import os
 import re
 import logging
+import threading
 from core.permissions import admin_required, check_admin_permissions
 from core.utils import get_random_id, send_message, check_and_use_otp
 from database import set_user_role, get_users_by_role, get_or_create_user
-from core import cooldowns, sglypa
+from core import cooldowns, sglypa, sglypa_training
+from core.vk_scheduler import bulk
 import vk_api.exceptions
 import vk_api
 
@@ -19,60 +22,115 @@ def parse_user_id(text_mention: str) -> int | None:
 
 @admin_required
 def sglypa_mode_command(vk, event, args):
-    """Управляет режимом Сглыпы. Формат: sdp sglypa [on|off|learn]"""
-    if not args or args[0] not in ['on', 'off', 'learn']:
-        send_message(vk, event.peer_id, "📝 Неверный формат. Используйте: `sdp sglypa [on|off|learn]`")
+    """Управляет режимом Сглыпы. Формат: sdp sglypa [on|off|learn [количество|файл]|order <1-3>]"""
+    if not args or args[0] not in ['on', 'off', 'learn', 'order']:
+        send_message(vk, event.peer_id, "📝 Неверный формат. Используйте: `sdp sglypa [on|off|learn|order <1-3>]`")
         return
 
     action = args[0]
     peer_id = event.peer_id
 
     if action == 'on':
-        sglypa.SGLYPA_MODE_CHATS.add(peer_id)
-        sglypa.save_sglypa_data()
+        sglypa.set_sglypa_mode(peer_id, True)
         message = "✅ Режим Сглыпы активирован для этого чата."
     
     elif action == 'off':
-        if peer_id in sglypa.SGLYPA_MODE_CHATS:
-            sglypa.SGLYPA_MODE_CHATS.remove(peer_id)
-            # При выключении режима можно сразу обучиться на том, что есть в памяти
-            peer_id_str = str(peer_id)
-            messages_to_learn = sglypa.MESSAGE_MEMORY.get(peer_id_str, [])
-            if messages_to_learn:
-                sglypa.build_model(peer_id, messages_to_learn)
-            sglypa.save_sglypa_data()
+        # Модель учится на каждом сообщении и сохраняется в фоне, дообучать при выключении нечего
+        if sglypa.set_sglypa_mode(peer_id, False):
             message = "👽 Режим Сглыпы выключен. Я запомнил всё, что вы тут написали. До новых встреч."
         else:
             message = "👽 Режим Сглыпы уже был выключен."
+
+    elif action == 'learn':
+        source = args[1] if len(args) > 1 else None
+        # Замок освобождает сам фоновый поток, когда закончит
+        if not sglypa_training.TRAINING_LOCK.acquire(blocking=False):
+            message = "⏳ Сглыпа уже учится (в этом или другом чате). Дождитесь окончания и попробуйте снова."
+        else:
+            threading.Thread(
+                target=_sglypa_learn_job, args=(vk, peer_id, source), name=f"sglypa-learn-{peer_id}", daemon=True
+            ).start()
+            message = "🧠 Сглыпа начала читать переписку. Это может занять пару минут, я напишу, когда закончу."
+
+    elif action == 'order':
+        if len(args) < 2 or not args[1].isdigit():
+            message = f"🧠 Текущий порядок модели: {sglypa.get_chat_order(peer_id)}. Изменить: `sdp sglypa order <1-3>`"
+        else:
+            order = sglypa.set_chat_order(peer_id, int(args[1]))
+            message = f"🧠 Порядок модели Сглыпы для этого чата: {order}. Чем он выше, тем связнее (и однообразнее) речь."
     else:
         message = "Неверный аргумент. Используйте 'on' или 'off'."
 
     send_message(vk, peer_id, message)
 
 
+def _sglypa_learn_job(vk, peer_id, source):
+    """Массовое обучение Сглыпы на истории чата (или на экспортированном файле) в фоне."""
+    try:
+        _sglypa_learn(vk, peer_id, source)
+    finally:
+        sglypa_training.TRAINING_LOCK.release()
+
+
+def _sglypa_learn(vk, peer_id, source):
+    try:
+        if source is None or source.isdigit():
+            limit = int(source) if source else sglypa_training.DEFAULT_HISTORY_LIMIT
+            # Чтение истории - массовая операция, ответы в чатах идут раньше неё
+            messages = sglypa_training.iter_history(bulk(vk), peer_id, limit)
+        else:
+            # Только имя файла, без путей: читаем исключительно из папки импорта
+            file_path = os.path.join(sglypa_training.IMPORT_DIR, os.path.basename(source))
+            if not os.path.exists(file_path):
+                send_message(vk, peer_id, f"❌ Файл `{os.path.basename(source)}` не найден в папке `{sglypa_training.IMPORT_DIR}`.")
+                return
+            messages = sglypa_training.iter_export(file_path)
+        result = sglypa_training.train(peer_id, messages)
+    except Exception as e:
+        # Здесь же ошибки пула процессов и записи в БД: иначе поток молча завершится
+        logging.error(f"Ошибка при обучении Сглыпы в чате {peer_id}: {e}", exc_info=True)
+        send_message(vk, peer_id, f"❌ Не удалось обучить Сглыпу: {e}")
+        return
+
+    send_message(
+        vk, peer_id,
+        f"🧠 Сглыпа прочитала {result['messages']} сообщений и выучила {result['transitions']} переходов "
+        f"за {result['seconds']:.1f} с."
+    )
+
+
 @admin_required
 def set_cooldown_command(vk, event, args):
-    """Устанавливает кулдаун для команды. Формат: sdp setcd <команда> <секунды>"""
-    if len(args) != 2:
-        send_message(vk, event.peer_id, "📝 Неверный формат. Используйте: `sdp setcd <команда> <секунды>`\nНапример: `sdp setcd gif 60`")
+    """Устанавливает кулдаун для команды. Формат: sdp setcd <команда> <секунды> [использований] [user|chat|global]"""
+    if len(args) < 2 or len(args) > 4:
+        send_message(
+            vk, event.peer_id,
+            "📝 Неверный формат. Используйте: `sdp setcd <команда> <секунды> [использований] [user|chat|global]`\n"
+            "Например: `sdp setcd gif 60` или `sdp setcd gif 60 5 chat` (не больше 5 гифок в минуту на чат)"
+        )
         return
 
-    command, time_str = args
+    command, time_str = args[0], args[1]
+    uses_str = args[2] if len(args) > 2 else "1"
+    scope = args[3] if len(args) > 3 else "user"
     try:
         seconds = int(time_str)
-        if seconds < 0:
+        uses = int(uses_str)
+        if seconds < 0 or uses < 1:
             raise ValueError
     except ValueError:
-        send_message(vk, event.peer_id, "🚫 Время должно быть положительным целым числом.")
+        send_message(vk, event.peer_id, "🚫 Время и число использований должны быть положительными целыми числами.")
+        return
+    if scope not in cooldowns.SCOPES:
+        send_message(vk, event.peer_id, "🚫 Область должна быть одной из: user (пользователь), chat (весь чат), global (все чаты).")
         return
     
-    cooldowns.COMMAND_COOLDOWNS[command] = seconds
-    cooldowns.save_cooldown_settings()
+    cooldowns.set_limit(command, seconds, uses, scope)
 
     if seconds == 0:
-        message = f"✅ Кулдаун для команды `{command}` был убран."
+        message = f"✅ Кулдаун для команды `{command}` ({scope}) был убран."
     else:
-        message = f"✅ Установлен кулдаун для команды `{command}`: {seconds} сек."
+        message = f"✅ Установлен кулдаун для команды `{command}`: {cooldowns.describe_limits(command)}."
 
     send_message(vk, event.peer_id, message)
 
@@ -84,13 +142,15 @@ def list_cooldowns_command(vk, event, args):
     # Убедимся, что загружены последние настройки
     cooldowns.load_cooldown_settings()
 
-    if not cooldowns.COMMAND_COOLDOWNS:
+    # Показываем только те, у которых есть кулдаун
+    limited = [(command, cooldowns.describe_limits(command)) for command in cooldowns.COMMAND_COOLDOWNS]
+    limited = [(command, description) for command, description in limited if description]
+    if not limited:
         message = "ℹ️ Не установлено ни одного персонального кулдауна."
     else:
         message = "⚙️ Текущие настройки кулдаунов:\n\n"
-        for command, seconds in cooldowns.COMMAND_COOLDOWNS.items():
-            if seconds > 0: # Показываем только те, у которых есть кулдаун
-                message += f"🔹 `{command}`: {seconds} сек.\n"
+        for command, description in limited:
+            message += f"🔹 `{command}`: {description}\n"
     
     message += "\nℹ️ Для всех остальных команд кулдаун отсутствует. Вы можете добавить его командой `setcd`."
 
@@ -153,14 +213,13 @@ def show_admins(vk, event, args):
 def autism_command(vk, event, args):
     """Включает/выключает режим Аутизма для Сглыпы в текущем чате."""
     peer_id = event.peer_id
-    if peer_id in sglypa.AUTISM_MODE_CHATS:
-        sglypa.AUTISM_MODE_CHATS.remove(peer_id)
+    if sglypa.is_autism_mode(peer_id):
+        sglypa.set_autism_mode(peer_id, False)
         message = "Режим Аутизма для Сглыпы ВЫКЛЮЧЕН. (´-ω-`)"
     else:
-        sglypa.AUTISM_MODE_CHATS.add(peer_id)
+        sglypa.set_autism_mode(peer_id, True)
         message = "Режим Аутизма для Сглыпы ВКЛЮЧЕН. (^ω^)"
     
-    sglypa.save_sglypa_data()
     send_message(vk, peer_id, message)
 
 def otp_command(vk, event, args):
@@ -393,6 +452,74 @@ def warn_command(vk, event, args):
     
     send_message(vk, event.peer_id, message)
 
+# --- Массовое удаление сообщений ---
+# Максимум сообщений за одну команду очистки
+MAX_CLEAR_MESSAGES = 2000
+# Максимальный размер страницы messages.getHistory
+HISTORY_PAGE_SIZE = 200
+# Сколько ID удаляется одним вызовом messages.delete (ID передаются через запятую)
+DELETE_BATCH_SIZE = 100
+# Начиная с какого объёма сообщать о ходе очистки, и как часто
+PROGRESS_REPORT_THRESHOLD = 300
+PROGRESS_REPORT_EVERY = 500
+
+
+def _fetch_recent_messages(vk, peer_id: int, count: int) -> list[dict]:
+    """Постранично читает последние count сообщений чата (getHistory отдаёт не больше 200 за раз)."""
+    items = []
+    while len(items) < count:
+        page = vk.messages.getHistory(
+            peer_id=peer_id, count=min(HISTORY_PAGE_SIZE, count - len(items)), offset=len(items)
+        )['items']
+        if not page:
+            break
+        items.extend(page)
+    return items[:count]
+
+
+def _count_deleted(response, requested: int) -> int:
+    """Считает успешные удаления в ответе messages.delete (формат зависит от способа адресации)."""
+    if isinstance(response, dict):
+        return sum(1 for result in response.values() if result == 1)
+    if isinstance(response, list):
+        return sum(1 for result in response if isinstance(result, dict) and result.get('response') == 1)
+    return requested if response == 1 else 0
+
+
+def _delete_messages(vk, peer_id: int, messages: list[dict], on_progress=None) -> int:
+    """
+    Удаляет сообщения пачками по DELETE_BATCH_SIZE ID через запятую.
+    Сообщения без глобального ID адресуются через conversation_message_id.
+    Возвращает число удалённых сообщений.
+    """
+    message_ids = [message['id'] for message in messages if message.get('id')]
+    cmids = [message['conversation_message_id'] for message in messages
+             if not message.get('id') and message.get('conversation_message_id')]
+    batches = [
+        {'message_ids': ','.join(map(str, message_ids[i:i + DELETE_BATCH_SIZE]))}
+        for i in range(0, len(message_ids), DELETE_BATCH_SIZE)
+    ] + [
+        {'peer_id': peer_id, 'cmids': ','.join(map(str, cmids[i:i + DELETE_BATCH_SIZE]))}
+        for i in range(0, len(cmids), DELETE_BATCH_SIZE)
+    ]
+
+    deleted = 0
+    reported = 0
+    for params in batches:
+        requested = len(params.get('message_ids', params.get('cmids', '')).split(','))
+        try:
+            response = vk.messages.delete(delete_for_all=1, **params)
+            deleted += _count_deleted(response, requested)
+        except vk_api.exceptions.ApiError as e:
+            # Например, сообщения старше суток: пропускаем пачку, очистка продолжается
+            logging.warning(f"Не удалось удалить пачку из {requested} сообщений в чате {peer_id}: {e}")
+        # Итог сообщит сама команда, промежуточный отчёт нужен только пока работа не закончена
+        if on_progress and deleted - reported >= PROGRESS_REPORT_EVERY and deleted < len(messages):
+            reported = deleted
+            on_progress(deleted)
+    return deleted
+
+
 @admin_required
 def clear_command(vk, event, args):
     """Очищает чат от сообщений (удаляет последние N сообщений). Формат: sdp очистить [количество]"""
@@ -402,33 +529,34 @@ def clear_command(vk, event, args):
 
     try:
         count = int(args[0])
-        if count <= 0 or count > 100:
-            send_message(vk, event.peer_id, "❌ Количество должно быть от 1 до 100.")
+        if count <= 0 or count > MAX_CLEAR_MESSAGES:
+            send_message(vk, event.peer_id, f"❌ Количество должно быть от 1 до {MAX_CLEAR_MESSAGES}.")
             return
     except ValueError:
         send_message(vk, event.peer_id, "❌ Неверное количество сообщений.")
         return
 
+    peer_id = event.peer_id
     try:
-        # Получаем последние сообщения
-        messages = vk.messages.getHistory(peer_id=event.peer_id, count=count)
-        
-        deleted_count = 0
-        for message in messages['items']:
-            try:
-                vk.messages.delete(message_ids=message['id'], delete_for_all=1)
-                deleted_count += 1
-            except:
-                pass  # Игнорируем ошибки удаления отдельных сообщений
+        # Удаление идёт с низким приоритетом и с лимитом запросов, не мешая ответам в других чатах
+        bulk_vk = bulk(vk)
+        messages = _fetch_recent_messages(bulk_vk, peer_id, count)
+
+        on_progress = None
+        if len(messages) >= PROGRESS_REPORT_THRESHOLD:
+            send_message(vk, peer_id, f"🗑️ Начинаю удаление {len(messages)} сообщений...")
+            on_progress = lambda deleted: send_message(vk, peer_id, f"🗑️ Удалено {deleted} из {len(messages)}...")
+
+        deleted_count = _delete_messages(bulk_vk, peer_id, messages, on_progress)
         
         message = f"🗑️ Удалено {deleted_count} из {count} сообщений."
-        logging.info(f"Удалено {deleted_count} сообщений в чате {event.peer_id}")
+        logging.info(f"Удалено {deleted_count} сообщений в чате {peer_id}")
         
     except vk_api.exceptions.ApiError as e:
         message = f"❌ Ошибка при очистке чата: {e}"
-        logging.error(f"Ошибка при очистке чата {event.peer_id}: {e}")
+        logging.error(f"Ошибка при очистке чата {peer_id}: {e}")
     
-    send_message(vk, event.peer_id, message)
+    send_message(vk, peer_id, message)
 
 @admin_required
 def info_command(vk, event, args):
@@ -1,12 +1,16 @@
 import logging
-import threading
 from core import utils
 from core import ai_handler
-from database import get_or_create_user
+from core.ai_executor import submit_ai_job
+from core.singleflight import SingleFlight
+from database import get_user_role
 import uuid
 import os
 import vk_api
 
+# Одинаковые запросы, пришедшие, пока первый выполняется, получают его ответ
+AI_SINGLE_FLIGHT = SingleFlight()
+
 def _extract_text_from_event(vk, event):
     """
     Извлекает текст из пересланных сообщений или из ответа,
@@ -62,26 +66,35 @@ def _extract_text_from_event(vk, event):
 
 
 # =========================================================================================
-# === ПОТОЧНЫЕ ФУНКЦИИ (ДЛЯ АСИНХРОННОГО ВЫПОЛНЕНИЯ) =======================================
+# === ЗАДАЧИ ДЛЯ ИСПОЛНИТЕЛЯ AI (ВЫПОЛНЯЮТСЯ В ЕГО ПОТОКАХ) ===============================
 # =========================================================================================
 
-def _sglypa_ai_thread_target(vk, peer_id, user_text):
-    """Целевая функция для потока, выполняющая запрос к Сглыпе-AI."""
-    response = ai_handler.query_sglypa_ai(user_text)
-    utils.send_message(vk, peer_id, response)
+def _run_coalesced_query(key, query_func, user_text):
+    """Задача ведущего запроса: выполняет его и раздаёт ответ всем подписавшимся чатам."""
+    response = "💥 Произошла ошибка при обращении к AI."
+    try:
+        response = query_func(user_text)
+    finally:
+        AI_SINGLE_FLIGHT.resolve(key, response)
 
-def _grok_ai_thread_target(vk, peer_id, user_text):
-    """Целевая функция для потока, выполняющая запрос к Grok-AI."""
-    response = ai_handler.query_grok_ai(user_text)
-    utils.send_message(vk, peer_id, response)
+def _submit_text_query(vk, peer_id, command: str, query_func, user_text: str):
+    """
+    Ставит текстовый AI-запрос в очередь. Если такой же запрос (команда, модель, текст)
+    уже выполняется, чат просто подписывается на его ответ, без второго обращения к API.
+    """
+    key = (command, ai_handler.CHAT_MODEL, user_text)
+    deliver = lambda response: utils.send_message(vk, peer_id, response)
+    if not AI_SINGLE_FLIGHT.join(key, deliver):
+        logging.info(f"Запрос '{command}' из чата {peer_id} присоединён к уже выполняющемуся.")
+        return
 
-def _does_he_know_thread_target(vk, peer_id, user_text):
-    """Целевая функция для потока, выполняющая запрос к "Does he know?"-AI."""
-    response = ai_handler.query_does_he_know_ai(user_text)
-    utils.send_message(vk, peer_id, response)
+    if not submit_ai_job(vk, ai_handler.CHAT_MODEL, peer_id, _run_coalesced_query, key, query_func, user_text):
+        # Ведущий уже получил сообщение о перегрузке, сообщаем тем, кто успел присоединиться
+        for follower in AI_SINGLE_FLIGHT.cancel(key):
+            follower("🚦 Нейросеть сейчас перегружена, очередь заполнена. Попробуйте чуть позже.")
 
-def _image_generation_thread_target(vk, peer_id, prompt, vk_session):
-    """Целевая функция для потока, генерирующая и отправляющая изображение."""
+def _image_generation_job(vk, peer_id, prompt, vk_session):
+    """Задача, генерирующая и отправляющая изображение."""
     image_bytes, error_message = ai_handler.generate_image_ai(prompt)
 
     if error_message:
@@ -115,7 +128,7 @@ def _image_generation_thread_target(vk, peer_id, prompt, vk_session):
             os.remove(temp_file_path)
 
 # =========================================================================================
-# === ОБРАБОТЧИКИ КОМАНД (ЗАПУСКАЮТ ПОТОКИ) ================================================
+# === ОБРАБОТЧИКИ КОМАНД (СТАВЯТ ЗАДАЧИ В ОЧЕРЕДЬ) =========================================
 # =========================================================================================
 
 def sglypa_ai_command(vk, event, args):
@@ -127,12 +140,8 @@ def sglypa_ai_command(vk, event, args):
 
     utils.send_message(vk, event['peer_id'], "🧠 Хуй Шестака обрабатывает запрос...")
     
-    # Запускаем тяжелую операцию в отдельном потоке
-    thread = threading.Thread(
-        target=_sglypa_ai_thread_target,
-        args=(vk, event['peer_id'], user_text)
-    )
-    thread.start()
+    # Ставим тяжелую операцию в очередь исполнителя AI
+    _submit_text_query(vk, event['peer_id'], 'нейронка', ai_handler.query_sglypa_ai, user_text)
 
 
 def grok_ai_command(vk, event, args):
@@ -144,12 +153,8 @@ def grok_ai_command(vk, event, args):
             
     utils.send_message(vk, event['peer_id'], "⚡️ Grok анализирует правдивость...")
     
-    # Запускаем тяжелую операцию в отдельном потоке
-    thread = threading.Thread(
-        target=_grok_ai_thread_target,
-        args=(vk, event['peer_id'], user_text)
-    )
-    thread.start()
+    # Ставим тяжелую операцию в очередь исполнителя AI
+    _submit_text_query(vk, event['peer_id'], 'grok', ai_handler.query_grok_ai, user_text)
 
 
 def does_he_know_command(vk, event, args):
@@ -161,19 +166,14 @@ def does_he_know_command(vk, event, args):
 
     utils.send_message(vk, event['peer_id'], "🤔...")
     
-    # Запускаем тяжелую операцию в отдельном потоке
-    thread = threading.Thread(
-        target=_does_he_know_thread_target,
-        args=(vk, event['peer_id'], user_text)
-    )
-    thread.start()
+    # Ставим тяжелую операцию в очередь исполнителя AI
+    _submit_text_query(vk, event['peer_id'], 'doesheknow', ai_handler.query_does_he_know_ai, user_text)
 
 
 def image_generation_command(vk, event, args, vk_session):
     """Генерирует изображение по запросу из пересланных/отвеченных сообщений."""
     user_id = event.get('from_id')
-    user_role = get_or_create_user(user_id).get('role')
-    if user_role != 'admin':
+    if get_user_role(user_id) != 'admin':
         utils.send_message(vk, event['peer_id'], "🚫 У вас нет прав для использования этой команды.")
         return
 
@@ -186,9 +186,5 @@ def image_generation_command(vk, event, args, vk_session):
     prompt_short = prompt[:200] + '...' if len(prompt) > 200 else prompt
     utils.send_message(vk, event['peer_id'], f"🎨 Нейросеть рисует шедевр по запросу: \"{prompt_short}\"")
 
-    # Запускаем тяжелую операцию в отдельном потоке
-    thread = threading.Thread(
-        target=_image_generation_thread_target,
-        args=(vk, event['peer_id'], prompt, vk_session)
-    )
-    thread.start()
+    # Ставим тяжелую операцию в очередь исполнителя AI
+    submit_ai_job(vk, ai_handler.IMAGE_MODEL, event['peer_id'], _image_generation_job, vk, event['peer_id'], prompt, vk_session)
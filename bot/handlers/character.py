@@ -26,9 +26,8 @@ def character_info(vk, event, args):
         return
 
     query = " ".join(args)
-    vk_id = event.user_id
-    
-    character = find_character(vk_id, query)
+
+    character = find_character(query)
 
     if character:
         # Форматирование атрибутов
@@ -5,6 +5,7 @@ from io import BytesIO
 
 from vk_api.upload import VkUpload
 
+from core import http
 from core.utils import send_message
 
 def get_gif(vk, event, args, vk_session):
@@ -36,7 +37,7 @@ def get_gif(vk, event, args, vk_session):
     }
 
     try:
-        response = requests.get(api_url, params=params)
+        response = http.get(api_url, endpoint="giphy:search", params=params)
         response.raise_for_status() # Проверяем на ошибки HTTP
         data = response.json()
 
@@ -49,7 +50,7 @@ def get_gif(vk, event, args, vk_session):
         gif_url = gif_data["images"]["original"]["url"]
 
         # Скачиваем гифку в память
-        gif_response = requests.get(gif_url)
+        gif_response = http.get(gif_url, endpoint="giphy:download")
         gif_response.raise_for_status()
         gif_bytes = BytesIO(gif_response.content)
         gif_bytes.name = f"{search_query.replace(' ', '_')}.gif" # VK требует имя файла
@@ -1,10 +1,47 @@
+import os
 import re
 import logging
+import threading
 from core.utils import send_message
+from core.search_index import SearchIndex, normalize_terms, query_terms, source_signature, load_index, save_index
+from core.documents import load_passages
 
 # Кэш для данных справочника, чтобы не читать файл каждый раз
 _handbook_data = None
 HANDBOOK_FILE_PATH = '../frontend/src/panels/Handbook.tsx'
+# Документы по миру в корне проекта: индексируются вместе со справочником, по фрагменту на заголовок
+LORE_DOCS_DIR = os.getenv("HANDBOOK_DOCS_DIR", "..")
+LORE_DOCUMENTS = (
+    'Лор_и_Мир.md',
+    'Руководство_по_Миру.md',
+    'Боевая_Система.md',
+    'Основы_Персонажа.md',
+    'Система_Биржи_Анализ.md',
+)
+# Готовый индекс сохраняется на диск, чтобы при запуске не разбирать справочник заново
+HANDBOOK_INDEX_FILE = os.getenv("HANDBOOK_INDEX_FILE", "handbook_index.pkl")
+
+# Веса полей при ранжировании. У фрагментов документов заголовок идёт в 'title',
+# родительские заголовки - в 'description', текст - в 'detailed'
+FIELD_WEIGHTS = {
+    'title': 10,
+    'content_title': 10,
+    'key_points': 7,
+    'description': 3,
+    'detailed': 1,
+}
+# Минимальная оценка BM25, с которой секция считается найденной:
+# отсекает совпадения только по словам, которые есть почти в каждой секции
+MIN_SECTION_SCORE = 0.1
+# Запрос из нескольких слов, найденный в тексте дословно, поднимает оценку в PHRASE_MATCH_BOOST раз.
+# Проверяются только PHRASE_RERANK_CANDIDATES лучших по BM25 документов
+PHRASE_MATCH_BOOST = 1.5
+PHRASE_RERANK_CANDIDATES = 10
+# Максимальная длина выдержки из фрагмента документа в ответе
+PASSAGE_EXCERPT_LENGTH = 700
+
+_handbook_index = None
+_index_lock = threading.Lock()
 
 def parse_handbook_tsx(file_path: str):
     """
@@ -86,83 +123,113 @@ def parse_detailed_content(text: str) -> dict:
         subsections[title] = content
     return subsections
 
+def lore_document_paths() -> list[str]:
+    return [os.path.join(LORE_DOCS_DIR, name) for name in LORE_DOCUMENTS]
+
+def build_handbook_index(sections: list, passages: list | None = None) -> SearchIndex:
+    """
+    Строит общий индекс справочника и документов по миру: поля разбиваются на слова один раз,
+    подсекции ('###') выделяются заранее вместе с основами слов их заголовков.
+    """
+    index = SearchIndex(FIELD_WEIGHTS)
+    for section in sections:
+        content = section.get('content', {})
+        detailed = content.get('detailedContent', '')
+        subsections = [
+            (sub_title, sub_content, sub_title.lower(), frozenset(normalize_terms(sub_title)))
+            for sub_title, sub_content in parse_detailed_content(detailed).items()
+        ]
+        index.add({'section': section, 'subsections': subsections}, {
+            'title': section.get('title', ''),
+            'content_title': content.get('title', ''),
+            'key_points': ' '.join(content.get('keyPoints', [])),
+            'description': content.get('description', ''),
+            'detailed': detailed,
+        })
+    for passage in passages or []:
+        index.add({'passage': passage}, {
+            'title': passage['title'],
+            'description': ' '.join(passage['path'][:-1]),
+            'detailed': passage['text'],
+        })
+    index.finalize()
+    return index
+
+def get_handbook_index() -> SearchIndex | None:
+    """Индекс справочника: из памяти, с диска (если справочник не менялся) или построенный заново."""
+    global _handbook_index
+    if _handbook_index is not None:
+        return _handbook_index
+    with _index_lock:
+        if _handbook_index is None:
+            signature = source_signature([HANDBOOK_FILE_PATH, *lore_document_paths()])
+            index = load_index(HANDBOOK_INDEX_FILE, signature)
+            if index is None:
+                sections = get_handbook_data() or []
+                passages = load_passages(lore_document_paths())
+                if not sections and not passages:
+                    return None
+                index = build_handbook_index(sections, passages)
+                save_index(HANDBOOK_INDEX_FILE, signature, index)
+                logging.info(f"Индекс справочника построен: {index.stats()}")
+            _handbook_index = index
+    return _handbook_index
+
+def _document_text(doc: dict) -> str:
+    """Полный текст документа индекса: подробное содержание секции или текст фрагмента."""
+    if 'passage' in doc:
+        return doc['passage']['text']
+    return doc['section'].get('content', {}).get('detailedContent', '')
+
 def search_in_handbook(query: str):
     """
-    Ищет наиболее релевантную секцию (и подсекцию) в справочнике.
+    Ищет наиболее релевантную секцию (и подсекцию) в справочнике или фрагмент документа по миру.
     Возвращает кортеж (секция, подзаголовок, контент подсекции) или (None, None, None).
+    Для фрагмента документа вместо секции возвращается словарь фрагмента (с ключом 'source').
     """
-    data = get_handbook_data()
-    if not data:
+    index = get_handbook_index()
+    if not index:
         return None, None, None
 
-    query_words = set(re.findall(r'\w+', query.lower()))
-    best_section_score = 0
-    best_section = None
-
-    # Этап 1: Найти лучшую СЕКЦИЮ
-    for section in data:
-        score = 0
-        content = section.get('content', {})
-        
-        # Заголовки (вес 10)
-        title_words = set(re.findall(r'\w+', section.get('title', '').lower()))
-        score += 10 * len(query_words.intersection(title_words))
-        content_title_words = set(re.findall(r'\w+', content.get('title', '').lower()))
-        score += 10 * len(query_words.intersection(content_title_words))
-
-        # Ключевые моменты (вес 7)
-        key_points_text = ' '.join(content.get('keyPoints', [])).lower()
-        key_points_words = set(re.findall(r'\w+', key_points_text))
-        score += 7 * len(query_words.intersection(key_points_words))
-
-        # Описание (вес 3)
-        desc_words = set(re.findall(r'\w+', content.get('description', '').lower()))
-        score += 3 * len(query_words.intersection(desc_words))
-
-        # Полный текст (вес 1 за слово, 15 за фразу)
-        detailed_text = content.get('detailedContent', '').lower()
-        if query.lower() in detailed_text:
-            score += 15
-        detailed_words = set(re.findall(r'\w+', detailed_text))
-        score += 1 * len(query_words.intersection(detailed_words))
-
-        if score > best_section_score:
-            best_section_score = score
-            best_section = section
-
-    # Этап 2: Если секция найдена, ищем лучшую ПОДСЕКЦИЮ внутри нее
-    if best_section and best_section_score > 4:
-        content = best_section.get('content', {})
-        detailed_content_text = content.get('detailedContent')
-
-        if detailed_content_text:
-            subsections = parse_detailed_content(detailed_content_text)
-            best_subsection_score = 0
-            best_subsection_title = None
-            best_subsection_content = None
-
-            for sub_title, sub_content in subsections.items():
-                sub_score = 0
-                # Очень высокий вес за прямое совпадение с подзаголовком
-                if query.lower() in sub_title.lower():
-                    sub_score += 50
-                
-                sub_title_words = set(re.findall(r'\w+', sub_title.lower()))
-                sub_score += 20 * len(query_words.intersection(sub_title_words))
-
-                if sub_score > best_subsection_score:
-                    best_subsection_score = sub_score
-                    best_subsection_title = sub_title
-                    best_subsection_content = sub_content
-            
-            # Если нашли подходящую подсекцию, возвращаем ее
-            if best_subsection_score > 20:
-                return best_section, best_subsection_title, best_subsection_content
-
-        # Если подсекцию не нашли, возвращаем основную секцию
-        return best_section, None, None
-
-    return None, None, None
+    # Этап 1: лучшая СЕКЦИЯ по BM25 с весами полей и бонусом за точную фразу
+    query_lower = query.lower()
+    results = index.search(query, limit=PHRASE_RERANK_CANDIDATES)
+    if len(query_lower.split()) > 1:
+        results = sorted(
+            ((score * PHRASE_MATCH_BOOST if query_lower in _document_text(doc).lower() else score, doc)
+             for score, doc in results),
+            key=lambda item: item[0], reverse=True,
+        )
+    if not results or results[0][0] < MIN_SECTION_SCORE:
+        return None, None, None
+    doc = results[0][1]
+    if 'passage' in doc:
+        return doc['passage'], None, None
+
+    # Этап 2: лучшая ПОДСЕКЦИЯ внутри нее по заранее разобранным заголовкам
+    query_words = set(query_terms(query))
+    best_subsection_score = 0
+    best_subsection = None
+    for sub_title, sub_content, sub_title_lower, sub_title_words in doc['subsections']:
+        sub_score = 0
+        # Очень высокий вес за прямое совпадение с подзаголовком
+        if query_lower in sub_title_lower:
+            sub_score += 50
+        sub_score += 20 * len(query_words & sub_title_words)
+        # Все слова запроса есть в подзаголовке с точностью до окончаний («прокачки» -> «Прокачка»)
+        if query_words and query_words <= sub_title_words:
+            sub_score += 30
+
+        if sub_score > best_subsection_score:
+            best_subsection_score = sub_score
+            best_subsection = (sub_title, sub_content)
+
+    # Если нашли подходящую подсекцию, возвращаем ее
+    if best_subsection_score > 20:
+        return doc['section'], best_subsection[0], best_subsection[1]
+
+    # Если подсекцию не нашли, возвращаем основную секцию
+    return doc['section'], None, None
 
 def format_section_for_vk(section, subsection_title=None, subsection_content=None):
     """Форматирует найденную секцию (или подсекцию) в красивое сообщение для VK."""
@@ -202,6 +269,32 @@ def format_section_for_vk(section, subsection_title=None, subsection_content=Non
     message += f"\n(Найдено в разделе: «{section.get('title', 'N/A')}»)"
     return message
 
+def _clean_markdown(text: str) -> str:
+    text = re.sub(r'#+\s*', '🔸 ', text)
+    # Подчёркивания внутри слов (названия полей вроде base_trend) не трогаем
+    text = re.sub(r'\*+|`+|(?<!\w)_+|_+(?!\w)', '', text)
+    return re.sub(r'^-\s', '🔹 ', text, flags=re.MULTILINE)
+
+def format_passage_for_vk(passage: dict, query: str) -> str:
+    """Форматирует фрагмент документа: выдержка с самого подходящего абзаца и источник."""
+    paragraphs = [p.strip() for p in passage['text'].split('\n') if p.strip()]
+    query_words = set(query_terms(query))
+    # Выдержка начинается с абзаца, где больше всего слов запроса
+    start = max(range(len(paragraphs)), key=lambda i: len(query_words & set(normalize_terms(paragraphs[i]))))
+
+    excerpt = ''
+    for paragraph in paragraphs[start:]:
+        if excerpt and len(excerpt) + len(paragraph) > PASSAGE_EXCERPT_LENGTH:
+            break
+        excerpt = f"{excerpt}\n{paragraph}" if excerpt else paragraph
+    if len(excerpt) > PASSAGE_EXCERPT_LENGTH:
+        end_pos = excerpt.rfind('.', 0, PASSAGE_EXCERPT_LENGTH)
+        excerpt = excerpt[:end_pos + 1] if end_pos != -1 else excerpt[:PASSAGE_EXCERPT_LENGTH] + '...'
+
+    message = f"📘 Справочник: {passage['title']}\n\n{_clean_markdown(excerpt)}"
+    message += f"\n\n(Источник: «{passage['source']}», раздел «{' › '.join(passage['path'])}»)"
+    return message
+
 def handbook_command(vk, event, args):
     """Ищет информацию в справочнике."""
     query = " ".join(args).strip()
@@ -210,13 +303,15 @@ def handbook_command(vk, event, args):
         return
         
     # Предварительная загрузка данных, если они еще не загружены
-    if get_handbook_data() is None:
+    if _handbook_index is None:
         send_message(vk, event.peer_id, "⏳ Первый запуск, индексирую справочник... Это может занять несколько секунд.")
     
     # Поиск
     result_section, sub_title, sub_content = search_in_handbook(query)
     
-    if result_section:
+    if result_section and 'source' in result_section:
+        result_message = format_passage_for_vk(result_section, query)
+    elif result_section:
         result_message = format_section_for_vk(result_section, sub_title, sub_content)
     else:
         result_message = f"ℹ️ По вашему запросу «{query}» ничего не найдено в справочнике. Попробуйте использовать другие ключевые слова."
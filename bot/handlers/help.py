@@ -10,7 +10,7 @@ def help_command(vk, event, args):
     `sdp пиво` — Получить кружку пива.
     `sdp roll [N]d[M]+[X]` — Бросить кости. (Например, `sdp roll 2d20+5`). Алиас: `r`.
     `sdp мои персонажи` — Показать список ваших персонажей.
-    `sdp инфо [имя/id]` — Показать информацию о персонаже.
+    `sdp персонаж [имя/id]` — Показать информацию о персонаже.
     `sdp напомнить [@пользователь] через [время] [текст]` — Установить напоминание. (Например, `sdp напомнить @user через 1д написать пост`).
     `sdp gif [запрос]` — Найти и отправить гифку.
     `sdp справочник [запрос]` — Поиск по справочнику проекта.
@@ -42,15 +42,17 @@ def admin_help_command(vk, event, args):
     `sdp бан [id|@пользователь] [причина]` — Забанить в группе.
     `sdp разбан [id|@пользователь]` — Разбанить в группе.
     `sdp варн [id|@пользователь] [причина]` — Выдать предупреждение.
-    `sdp очистить [количество]` — Удалить последние N сообщений (до 100).
+    `sdp очистить [количество]` — Удалить последние N сообщений (до 2000, большие объёмы удаляются пачками).
 
     **ℹ️ Информация:**
     `sdp инфо [id|@пользователь]` — Информация о пользователе.
 
     **⚙️ Настройки:**
-    `sdp setcd <команда> <секунды>` — Установить кулдаун для команды.
+    `sdp setcd <команда> <секунды> [использований] [user|chat|global]` — Установить кулдаун для команды (N использований за окно на пользователя, чат или всех).
     `sdp cd` — Показать текущие кулдауны.
     `sdp sglypa <on|off>` — Включить/выключить режим "Сглыпы".
+    `sdp sglypa learn [количество|файл]` — Обучить Сглыпу на истории чата или на экспорте из папки `sglypa_imports`.
+    `sdp sglypa order <1-3>` — Порядок модели Сглыпы (сколько слов учитывается при генерации).
     `sdp аутизм` — Включить/выключить режим Аутизма (камодзи).
 
     **🧠 Нейро-команды (по ответу на сообщение):**
@@ -1,10 +1,10 @@
 import re
-import sqlite3
 import logging
 from datetime import datetime, timedelta
 from core.utils import get_random_id, send_message
 from handlers.admin import parse_user_id
 import pytz
+import database
 
 def parse_time(time_str: str) -> timedelta | None:
     """Парсит строку времени (напр., '1д', '5ч', '30м') и возвращает timedelta."""
@@ -28,14 +28,7 @@ def parse_time(time_str: str) -> timedelta | None:
 
 def add_reminder(target_vk_id: int, setter_vk_id: int, message: str, due_date: datetime, peer_id: int):
     """Добавляет напоминание в базу данных."""
-    conn = sqlite3.connect('bot.db')
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO reminders (target_vk_id, setter_vk_id, message, due_date, peer_id) VALUES (?, ?, ?, ?, ?)",
-        (target_vk_id, setter_vk_id, message, due_date, peer_id)
-    )
-    conn.commit()
-    conn.close()
+    database.add_reminder(target_vk_id, setter_vk_id, message, due_date, peer_id)
 
 def remind_command(vk, event, args):
     """Обрабатывает команду 'напомнить'."""
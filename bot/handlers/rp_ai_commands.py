@@ -1,13 +1,12 @@
 import logging
-import asyncio
-import threading
 from typing import List, Dict, Any
 from vk_api.vk_api import VkApiMethod, VkApi
 from vk_api.bot_longpoll import VkBotMessageEvent
 
-from core.utils import send_message
+from core.utils import send_message, send_streamed_message
 from core.permissions import is_admin
-from core.ai_handler import query_rp_opinion_ai, query_rp_verdict_ai
+from core.ai_handler import stream_rp_opinion_ai, stream_rp_verdict_ai, REASONING_MODEL
+from core.ai_executor import submit_ai_job
 
 # --- Утилиты ---
 
@@ -55,29 +54,33 @@ def _extract_text_from_event(vk: VkApiMethod, event: Dict[str, Any]) -> str:
 
     return "\n\n".join(texts)
 
-# --- Логика выполнения в потоке ---
+# --- Задача для исполнителя AI ---
 
-def _rp_ai_thread_target(vk: VkApiMethod, event: VkBotMessageEvent, text: str, extra_instructions: str, mode: str):
+def _rp_ai_job(vk: VkApiMethod, event: VkBotMessageEvent, text: str, extra_instructions: str, mode: str):
     """
-    Целевая функция для потока, которая запускает асинхронный запрос к AI.
+    Задача исполнителя AI, которая выполняет запрос к reasoning-модели.
     """
     try:
-        logging.info(f"Запускаю RP AI ({mode}) в отдельном потоке для чата {event.peer_id}")
+        logging.info(f"Запускаю RP AI ({mode}) для чата {event.peer_id}")
         send_message(vk, event.peer_id, f"⌛️ Анализирую посты для режима «{mode}»... Это может занять некоторое время.")
 
         if mode == 'мнение':
-            response = query_rp_opinion_ai(text, extra_instructions)
+            chunks = stream_rp_opinion_ai(text, extra_instructions)
         elif mode == 'вердикт':
-            response = query_rp_verdict_ai(text, extra_instructions)
+            chunks = stream_rp_verdict_ai(text, extra_instructions)
         else:
             # Эта проверка дублируется, но она полезна для безопасности
-            response = "❌ Неизвестный режим для RP AI."
+            send_message(vk, event.peer_id, "❌ Неизвестный режим для RP AI.")
+            return
 
-        logging.info(f"RP AI ({mode}) вернул ответ для чата {event.peer_id}.")
-        send_message(vk, event.peer_id, response)
+        # Ответ reasoning-модели длинный: отправляем его частями по мере генерации
+        response = send_streamed_message(vk, event.peer_id, chunks)
+        if not response.strip():
+            send_message(vk, event.peer_id, "🤷 Модель вернула пустой ответ.")
+        logging.info(f"RP AI ({mode}) вернул ответ для чата {event.peer_id} ({len(response)} символов).")
 
     except Exception as e:
-        logging.error(f"Ошибка в потоке RP AI ({mode}): {e}", exc_info=True)
+        logging.error(f"Ошибка в задаче RP AI ({mode}): {e}", exc_info=True)
         send_message(vk, event.peer_id, f"💥 Произошла серьезная ошибка при обработке вашего запроса RP AI ({mode}).")
 
 # --- Команда ---
@@ -97,16 +100,12 @@ def rp_ai_command(vk: VkApiMethod, vk_session: VkApi, event: VkBotMessageEvent,
     mode = command_args[0].lower()
     extra_instructions = ' '.join(command_args[1:]) if len(command_args) > 1 else "Нет"
 
-    # Используем vk_session.get_api(), т.к. для vk.users.get нужен полный объект vk_api
-    text_to_analyze = _extract_text_from_event(vk_session.get_api(), full_message_object)
+    # vk - полный объект API (через планировщик вызовов), vk.users.get на нём работает
+    text_to_analyze = _extract_text_from_event(vk, full_message_object)
 
     if not text_to_analyze:
         send_message(vk, event.peer_id, "❌ Не найдены сообщения для анализа. Используйте команду в ответ на пост или перешлите сообщения.")
         return
 
-    # Запускаем тяжелую операцию в отдельном потоке
-    ai_thread = threading.Thread(
-        target=_rp_ai_thread_target,
-        args=(vk, event, text_to_analyze, extra_instructions, mode)
-    )
-    ai_thread.start()
+    # Ставим тяжелую операцию в очередь исполнителя AI
+    submit_ai_job(vk, REASONING_MODEL, event.peer_id, _rp_ai_job, vk, event, text_to_analyze, extra_instructions, mode)
@@ -5,14 +5,16 @@ from dotenv import load_dotenv
 import logging
 from types import SimpleNamespace
 from apscheduler.schedulers.background import BackgroundScheduler
-import sqlite3
 from datetime import datetime
 import pytz
 import random
 import re
 import time
+import asyncio
+import signal
 
-from database import get_or_create_user, init_db, set_user_role
+from database import get_user_role, load_role_cache, init_db, set_users_role, get_due_reminders, mark_reminders_sent
+from core import db
 from core.utils import get_random_id, send_message
 from handlers import admin, general, dice, character, reminders, help, gifs, handbook, ai_commands, games
 from handlers.help import help_command, admin_help_command
@@ -22,6 +24,16 @@ from handlers.ai_commands import sglypa_ai_command, grok_ai_command, image_gener
 from handlers.rp_ai_commands import rp_ai_command
 import core.cooldowns as cooldowns
 import core.sglypa as sglypa
+from core import http
+import core.backend_api as backend_api
+import core.ai_handler as ai_handler
+from core.dispatcher import EventDispatcher, receive_longpoll_events
+from core.ai_executor import AI_EXECUTOR
+from core.vk_scheduler import VK_SCHEDULER, rate_limited
+from core.router import (
+    CommandRouter, SIGNATURE_SESSION, SIGNATURE_RP, SIGNATURE_MESSAGE,
+    SIGNATURE_MESSAGE_SESSION, SIGNATURE_GAME,
+)
 from vkbottle import Bot
 from vkbottle.bot import Message, BotLabeler
 
@@ -31,8 +43,7 @@ bot = Bot(token="fake")
 labeler = BotLabeler()
 
 # --- Асинхронный обработчик для игр ---
-# Так как новые хендлеры асинхронные, их нужно запускать в event loop'е
-import asyncio
+# Так как новые хендлеры асинхронные, их нужно запускать в event loop'е диспетчера
 
 async def run_game_command(command_func, message_obj):
     """Запускает асинхронную команду игры."""
@@ -53,49 +64,57 @@ async def run_game_command(command_func, message_obj):
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Словарь команд
-COMMANDS = {
-    'start': general.start,
-    'начать': general.start,
-    'пиво': general.beer_command,
-    'roll': dice.roll,
-    'r': dice.roll,
-    'напомнить': reminders.remind_command,
-    'персонажи': character.my_characters,
-    'инфо': character.character_info,
-    'помощь': help_command,
-    'gif': get_gif,
-    'справочник': handbook_command,
-    # Игровые команды
-    'блэкджек': games.start_blackjack,
-    'взять': games.blackjack_hit,
-    'хватит': games.blackjack_stand,
-    # Админ-команды
-    'датьадминку': admin.promote_to_admin,
-    'снятьадминку': admin.demote_to_user,
-    'админы': admin.show_admins,
-    'помощьадминам': admin_help_command,
-    'setcd': admin.set_cooldown_command,
-    'cd': admin.list_cooldowns_command,
-    'sglypa': admin.sglypa_mode_command,
-    'аутизм': admin.autism_command,
-    'otp': admin.otp_command,
-    # Команды модерации
-    'мут': admin.mute_command,
-    'размут': admin.unmute_command,
-    'кик': admin.kick_command,
-    'бан': admin.ban_command,
-    'разбан': admin.unban_command,
-    'варн': admin.warn_command,
-    'очистить': admin.clear_command,
-    'инфо': admin.info_command,
-    # Нейро-команды
-    'нейронка': sglypa_ai_command,
-    'шедевр': image_generation_command,
-    'rp': rp_ai_command
-}
 PREFIXES = ['sdp', '&']
 
+# --- Реестр команд ---
+# Имя команды и алиасы, сигнатура обработчика, ключ кулдауна и требование прав администратора.
+# Администраторы не ограничены кулдаунами, кроме команд с admin_bypasses_cooldown=False.
+# Повторная регистрация имени приводит к ошибке при запуске.
+ROUTER = CommandRouter(PREFIXES)
+
+# Команды без префикса (точная фраза)
+ROUTER.register_phrase(["grok это правда?", "грок это правда?"], grok_ai_command, cooldown_key="grok",
+                       admin_bypasses_cooldown=False)
+ROUTER.register_phrase(["does he know?", "знает ли он?"], does_he_know_command, cooldown_key="doesheknow",
+                       admin_bypasses_cooldown=False)
+
+ROUTER.register(['start', 'начать'], general.start)
+ROUTER.register('пиво', general.beer_command)
+ROUTER.register(['roll', 'r'], dice.roll)
+ROUTER.register('напомнить', reminders.remind_command)
+ROUTER.register('персонажи', character.my_characters)
+ROUTER.register('персонаж', character.character_info)
+ROUTER.register('помощь', help_command)
+ROUTER.register('gif', get_gif, signature=SIGNATURE_SESSION)
+ROUTER.register('справочник', handbook_command)
+# Игровые команды
+ROUTER.register('блэкджек', games.start_blackjack, signature=SIGNATURE_GAME)
+ROUTER.register('взять', games.blackjack_hit, signature=SIGNATURE_GAME)
+ROUTER.register('хватит', games.blackjack_stand, signature=SIGNATURE_GAME)
+# Админ-команды
+ROUTER.register('датьадминку', admin.promote_to_admin, admin_only=True)
+ROUTER.register('снятьадминку', admin.demote_to_user, admin_only=True)
+ROUTER.register('админы', admin.show_admins, admin_only=True)
+ROUTER.register('помощьадминам', admin_help_command)
+ROUTER.register('setcd', admin.set_cooldown_command, admin_only=True)
+ROUTER.register('cd', admin.list_cooldowns_command, admin_only=True)
+ROUTER.register('sglypa', admin.sglypa_mode_command, admin_only=True)
+ROUTER.register('аутизм', admin.autism_command, admin_only=True)
+ROUTER.register('otp', admin.otp_command)
+# Команды модерации
+ROUTER.register('мут', admin.mute_command, admin_only=True)
+ROUTER.register('размут', admin.unmute_command, admin_only=True)
+ROUTER.register('кик', admin.kick_command, admin_only=True)
+ROUTER.register('бан', admin.ban_command, admin_only=True)
+ROUTER.register('разбан', admin.unban_command, admin_only=True)
+ROUTER.register('варн', admin.warn_command, admin_only=True)
+ROUTER.register('очистить', admin.clear_command, admin_only=True)
+ROUTER.register('инфо', admin.info_command, admin_only=True)
+# Нейро-команды
+ROUTER.register('нейронка', sglypa_ai_command, signature=SIGNATURE_MESSAGE)
+ROUTER.register('шедевр', image_generation_command, signature=SIGNATURE_MESSAGE_SESSION, admin_only=True)
+ROUTER.register('rp', rp_ai_command, signature=SIGNATURE_RP, admin_only=True)
+
 # Определяем ID бота для фильтрации сообщений от самого себя
 GROUP_ID_STR = os.getenv("GROUP_ID")
 BOT_ID = -int(GROUP_ID_STR) if GROUP_ID_STR and GROUP_ID_STR.isdigit() else None
@@ -136,15 +155,11 @@ def get_chat_members(vk, peer_id):
 def check_reminders(vk):
     """Проверяет и отправляет просроченные напоминания (только для чатов)."""
     try:
-        conn = sqlite3.connect('bot.db')
-        cursor = conn.cursor()
-        
         utc_tz = pytz.utc
         now = datetime.now(utc_tz)
         
-        # Выбираем только напоминания из чатов (peer_id > 2000000000)
-        cursor.execute("SELECT id, target_vk_id, setter_vk_id, message, peer_id FROM reminders WHERE due_date <= ? AND sent = 0 AND peer_id > 2000000000", (now,))
-        due_reminders = cursor.fetchall()
+        due_reminders = get_due_reminders(now)
+        sent_ids = []
 
         for rem in due_reminders:
             rem_id, target_id, setter_id, msg, peer_id = rem
@@ -154,14 +169,12 @@ def check_reminders(vk):
             try:
                 # Используем новую функцию для отправки
                 send_message(vk, peer_id, reminder_text)
-                
-                # Помечаем как отправленное в случае успеха
-                cursor.execute("UPDATE reminders SET sent = 1 WHERE id = ?", (rem_id,))
+                sent_ids.append(rem_id)
             except Exception as send_error:
                 logging.error(f"Не удалось отправить напоминание ID {rem_id} в чат {peer_id}: {send_error}")
         
-        conn.commit()
-        conn.close()
+        # Помечаем отправленные одной транзакцией
+        mark_reminders_sent(sent_ids)
         if due_reminders:
             logging.info(f"Обработано {len(due_reminders)} напоминаний для чатов.")
     except Exception as e:
@@ -173,8 +186,7 @@ def setup_admins(vk, group_id):
         managers = vk.groups.getMembers(group_id=group_id, filter='managers')
         manager_ids = [manager['id'] for manager in managers['items']]
         
-        for manager_id in manager_ids:
-            set_user_role(manager_id, 'admin')
+        set_users_role(manager_ids, 'admin')
         
         if manager_ids:
             logging.info(f"Назначены права администратора {len(manager_ids)} руководителям.")
@@ -185,7 +197,165 @@ def setup_admins(vk, group_id):
         logging.error(f"Неизвестная ошибка при назначении админов: {e}")
 
 
-# === ГЛАВНЫЙ ЦИКЛ ОБРАБОТКИ СООБЩЕНИЙ ===
+# === ОБРАБОТКА СООБЩЕНИЙ ===
+def accept_event(event):
+    """Возвращает peer_id, если событие нужно обработать, иначе None."""
+    if event.type != VkBotEventType.MESSAGE_NEW:
+        return None
+    peer_id = event.obj.message['peer_id']
+    # Игнорируем сообщения из личных чатов
+    if peer_id < 2000000000:
+        return None
+    return peer_id
+
+
+def invoke_command(command, vk, vk_session, dispatcher, event, event_for_handler, args):
+    """Вызывает обработчик команды в соответствии с его сигнатурой."""
+    message_obj = event.obj.message
+    signature = command.signature
+    if command.is_async:
+        # Корутина выполняется в общем event loop'е диспетчера
+        dispatcher.run_coroutine(run_game_command(command.func, message_obj))
+    elif signature == SIGNATURE_SESSION:
+        command.func(vk, event_for_handler, args, vk_session)
+    elif signature == SIGNATURE_RP:
+        command.func(vk, vk_session, event_for_handler, args, message_obj)
+    elif signature == SIGNATURE_MESSAGE:
+        command.func(vk, message_obj, args)
+    elif signature == SIGNATURE_MESSAGE_SESSION:
+        command.func(vk, message_obj, args, vk_session)
+    else:
+        command.func(vk, event_for_handler, args)
+
+
+def handle_message_event(vk, vk_session, dispatcher, event):
+    """Обрабатывает одно событие MESSAGE_NEW. Выполняется в потоке воркера диспетчера."""
+    try:
+        message_obj = event.obj.message
+        from_id = message_obj.get('from_id')
+
+        # Адаптируем структуру event'а, чтобы не переписывать обработчики
+        event_for_handler = SimpleNamespace(
+            user_id=from_id,
+            peer_id=message_obj.get('peer_id'),
+            text=message_obj.get('text')
+        )
+
+        logging.info(f"Новое сообщение от {event_for_handler.user_id} в чате {event_for_handler.peer_id}: '{event_for_handler.text}'")
+
+        user_id = event_for_handler.user_id
+        peer_id = event_for_handler.peer_id
+
+        route = ROUTER.resolve(event_for_handler.text)
+        if route is None:
+            # Не команда: в чатах с режимом Сглыпы она учится на сообщении и иногда отвечает
+            reply = sglypa.handle_chat_message(peer_id, event_for_handler.text)
+            if reply:
+                send_message(vk, peer_id, reply)
+            return
+
+        command = route.command
+        if command is None:
+            # Если команда не найдена
+            send_message(vk, peer_id, "иди нахуй")
+            return
+
+        is_admin_user = get_user_role(user_id) == 'admin'
+        if command.admin_only and not is_admin_user:
+            send_message(vk, peer_id, "⛔ У вас нет прав для выполнения этой команды.")
+            return
+
+        # --- Проверка кулдаунов (админов - только для команд без обхода кулдауна) ---
+        # Использование отмечается сразу при проверке: обработчики разных чатов идут параллельно,
+        # и без этого два сообщения могли бы одновременно пройти общий лимит
+        cooldown_stamp = None
+        if not (is_admin_user and command.admin_bypasses_cooldown):
+            cooldown_stamp = cooldowns.acquire_cooldown_and_notify(vk, user_id, peer_id, command.cooldown_key)
+            if cooldown_stamp is None:
+                return
+
+        try:
+            invoke_command(command, vk, vk_session, dispatcher, event, event_for_handler, route.args)
+        except Exception as e:
+            # Команда не выполнилась - использование возвращается
+            if cooldown_stamp is not None:
+                cooldowns.refund_cooldown(user_id, command.cooldown_key, peer_id, cooldown_stamp)
+            logging.error(f"Ошибка при выполнении команды '{route.name}': {e}", exc_info=True)
+            send_message(vk, peer_id, f"Произошла ошибка при выполнении команды '{route.name}'. Администратор уже уведомлен.")
+
+    except Exception as e:
+        logging.critical(f"Критическая ошибка при обработке события: {e}", exc_info=True)
+        peer_id = None
+        try:
+            # Пытаемся извлечь peer_id из события, чтобы уведомить чат
+            if event and hasattr(event, 'obj') and hasattr(event.obj, 'message'):
+                peer_id = event.obj.message.get('peer_id')
+        except Exception:
+            pass  # Игнорируем, если не удалось получить peer_id
+
+        if peer_id and vk:
+            try:
+                error_message = f"💥 Произошла критическая ошибка. Бот продолжает работать. Администратор уведомлен."
+                send_message(vk, peer_id, error_message)
+            except Exception as notify_error:
+                logging.error(f"Не удалось отправить уведомление об ошибке в чат {peer_id}: {notify_error}")
+
+
+def log_dispatcher_stats(dispatcher):
+    """Пишет в лог задержку диспетчеризации (p50/p99), время обработки событий и очереди AI."""
+    logging.info(f"Статистика диспетчера: {dispatcher.stats()}")
+    logging.info(f"Очереди AI: {AI_EXECUTOR.stats()}")
+    logging.info(f"Кэш ответов AI: {ai_handler.AI_RESPONSE_CACHE.stats()}, склейка запросов: {ai_commands.AI_SINGLE_FLIGHT.stats()}")
+    logging.info(f"Кулдауны: {cooldowns.stats()}, вызовы VK API: {VK_SCHEDULER.stats()}")
+    logging.info(f"Сглыпа: хранилище {sglypa.STORE.stats()}")
+    logging.info(f"HTTP-запросы к бэкенду и GIPHY: {http.stats()}, клиент бэкенда: {backend_api.BACKEND.stats()}")
+    logging.info(f"Кэш персонажей: {backend_api.cache_stats()}")
+
+
+def persist_state():
+    """
+    Сохраняет всё, что живёт в памяти: кулдауны, кэш ответов AI и изменения моделей Сглыпы.
+    Каждый шаг независим, ошибка в одном не мешает сохранить остальное.
+    """
+    for name, save in (
+        ("кулдауны", cooldowns.save_cooldown_state),
+        ("кэш ответов AI", ai_handler.save_ai_cache),
+        ("модели Сглыпы", sglypa.STORE.stop),
+    ):
+        try:
+            save()
+        except Exception as e:
+            logging.error(f"Не удалось сохранить {name} при завершении: {e}", exc_info=True)
+
+
+async def run_bot(vk, vk_session, longpoll, scheduler):
+    """Долгоживущий asyncio-рантайм: приём событий longpoll и пул воркеров."""
+    try:
+        # run.py перезапускает бота через SIGTERM: завершаемся так же штатно, как по Ctrl+C
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    except NotImplementedError:
+        pass  # Windows: обработчики сигналов в цикле событий не поддерживаются
+
+    dispatcher = EventDispatcher(
+        lambda event: handle_message_event(vk, vk_session, dispatcher, event)
+    )
+    await dispatcher.start()
+    # Клиент бэкенда работает в этом же event loop'е и не блокирует его
+    backend_api.BACKEND.attach(asyncio.get_running_loop())
+    scheduler.add_job(log_dispatcher_stats, 'interval', minutes=10, args=[dispatcher])
+
+    logging.info("Бот запущен и слушает сообщения...")
+    try:
+        await receive_longpoll_events(longpoll, dispatcher, accept_event)
+    finally:
+        await dispatcher.stop()
+        # Сохраняем сразу, не дожидаясь потока longpoll, который может висеть до 90 секунд:
+        # run.py добивает процесс, если тот не завершился за 5 секунд
+        persist_state()
+        await backend_api.BACKEND.close()
+
+
+# === ЗАПУСК БОТА ===
 def main():
     """Основная функция запуска бота."""
     load_dotenv()
@@ -208,7 +378,8 @@ def main():
         # Используем VkBotLongPoll для работы от имени сообщества
         # Увеличиваем wait до 90 секунд, чтобы избежать ReadTimeout
         longpoll = VkBotLongPoll(vk_session, group_id, wait=90)
-        vk = vk_session.get_api()
+        # Все вызовы VK API идут через общий планировщик с лимитами запросов в секунду
+        vk = rate_limited(vk_session.get_api())
         logging.info("Авторизация в VK прошла успешно.")
     except Exception as error_msg:
         logging.error(f"Ошибка авторизации VK: {error_msg}")
@@ -216,11 +387,19 @@ def main():
     
     # Инициализация базы данных
     init_db()
+    # Роли загружаются в память один раз, дальше проверки прав идут без обращения к диску
+    load_role_cache()
+    # Фоновый сброс отложенных записей в БД
+    db.WRITE_BATCHER.start()
 
     # Загружаем настройки кулдаунов
     cooldowns.load_cooldown_settings()
+    # Восстанавливаем кулдауны, действовавшие до перезапуска
+    cooldowns.load_cooldown_state()
     # Загружаем данные Сглыпы
     sglypa.load_sglypa_data()
+    # Восстанавливаем кэш ответов AI
+    ai_handler.load_ai_cache()
 
     # Назначение админских прав руководителям группы
     setup_admins(vk, group_id)
@@ -228,138 +407,19 @@ def main():
     # Запускаем планировщик для проверки напоминаний
     scheduler = BackgroundScheduler(timezone="UTC")
     scheduler.add_job(check_reminders, 'interval', minutes=1, args=[vk])
+    scheduler.add_job(ai_handler.save_ai_cache, 'interval', minutes=10)
+    scheduler.add_job(sglypa.STORE.compact, 'interval', hours=1)
+    scheduler.add_job(cooldowns.save_cooldown_state, 'interval', seconds=cooldowns.SNAPSHOT_INTERVAL_SECONDS)
     scheduler.start()
     logging.info("Планировщик для напоминаний запущен.")
 
-    logging.info("Бот запущен и слушает сообщения...")
-
-    while True:
-        try:
-            for event in longpoll.listen():
-                try:
-                    # Используем VkBotEventType.MESSAGE_NEW
-                    if event.type == VkBotEventType.MESSAGE_NEW:
-                        
-                        # Игнорируем сообщения из личных чатов
-                        if event.obj.message['peer_id'] < 2000000000:
-                            continue
-
-                        message_obj = event.obj.message
-                        from_id = message_obj.get('from_id')
-
-                        # Адаптируем структуру event'а, чтобы не переписывать обработчики
-                        event_for_handler = SimpleNamespace(
-                            user_id=from_id,
-                            peer_id=message_obj.get('peer_id'),
-                            text=message_obj.get('text')
-                        )
-                        # Для команд, работающих с ответами, нам нужен полный объект сообщения
-                        full_message_object = message_obj
-
-                        logging.info(f"Новое сообщение от {event_for_handler.user_id} в чате {event_for_handler.peer_id}: '{event_for_handler.text}'")
-                        
-                        message_text = event_for_handler.text
-                        user_id = event_for_handler.user_id
-
-                        # --- Обработка команд без префикса ---
-                        lower_message = message_text.lower().strip()
-
-                        # GROK
-                        if lower_message in ["grok это правда?", "грок это правда?"]:
-                            command_name = "grok"
-                            if cooldowns.check_cooldown_and_notify(vk, user_id, event_for_handler.peer_id, command_name):
-                                continue
-                            ai_commands.grok_ai_command(vk, event.obj.message, [])
-                            cooldowns.set_cooldown(user_id, command_name)
-                            continue
-
-                        # DOES HE KNOW?
-                        if lower_message in ["does he know?", "знает ли он?"]:
-                            command_name = "doesheknow"
-                            if cooldowns.check_cooldown_and_notify(vk, user_id, event_for_handler.peer_id, command_name):
-                                continue
-                            ai_commands.does_he_know_command(vk, event.obj.message, [])
-                            cooldowns.set_cooldown(user_id, command_name)
-                            continue
-
-                        # --- Обработка команд с префиксом ---
-                        used_prefix = None
-                        for prefix in PREFIXES:
-                            if message_text.lower().startswith(prefix.lower()):
-                                used_prefix = prefix
-                                command_body = message_text[len(prefix):].strip()
-                                break
-                            elif message_text.lower().startswith(prefix + ' '):
-                                used_prefix = prefix
-                                command_body = message_text[len(prefix):].strip()
-                                break
-
-                        if used_prefix is None:
-                            continue
-
-                        command_parts = command_body.split()
-                        if not command_parts:
-                            continue
-                        
-                        command_name = command_parts[0].lower()
-                        args = command_parts[1:]
-
-                        # --- Проверка кулдаунов (кроме админов) ---
-                        if get_or_create_user(user_id).get('role') != 'admin':
-                            if cooldowns.check_cooldown_and_notify(vk, user_id, event_for_handler.peer_id, command_name):
-                                continue
-
-                        command_func = COMMANDS.get(command_name)
-                        
-                        if command_func:
-                            try:
-                                # --- Обработка игровых асинхронных команд ---
-                                if command_name in ['блэкджек', 'взять', 'хватит']:
-                                    # Для асинхронных функций нужен event loop
-                                    asyncio.run(run_game_command(command_func, event.obj.message))
-                                    cooldowns.set_cooldown(user_id, command_name) # Ставим кулдаун после вызова
-                                    continue # Переходим к следующему событию
-
-                                # Команды с разными сигнатурами вызываются по-разному
-                                if command_name in ["шедевр", "gif"]:
-                                    command_func(vk, event_for_handler, args, vk_session)
-                                elif command_name == "rp":
-                                    command_func(vk, vk_session, event_for_handler, args, event.message)
-                                else: # Для 'нейронка' и всех остальных стандартных команд
-                                    command_func(vk, event_for_handler, args)
-
-                                # Устанавливаем кулдаун после успешного выполнения
-                                if get_or_create_user(user_id).get('role') != 'admin':
-                                     cooldowns.set_cooldown(user_id, command_name)
-
-                            except Exception as e:
-                                logging.error(f"Ошибка при выполнении команды '{command_name}': {e}", exc_info=True)
-                                send_message(vk, event_for_handler.peer_id, f"Произошла ошибка при выполнении команды '{command_name}'. Администратор уже уведомлен.")
-                        else:
-                            # Если команда не найдена
-                            send_message(vk, event_for_handler.peer_id, "иди нахуй")
-
-                except Exception as e:
-                    logging.critical(f"Критическая ошибка при обработке события: {e}", exc_info=True)
-                    peer_id = None
-                    try:
-                        # Пытаемся извлечь peer_id из события, чтобы уведомить чат
-                        if event and hasattr(event, 'obj') and hasattr(event.obj, 'message'):
-                            peer_id = event.obj.message.get('peer_id')
-                    except Exception:
-                        pass  # Игнорируем, если не удалось получить peer_id
-                    
-                    if peer_id and vk:
-                        try:
-                            error_message = f"💥 Произошла критическая ошибка. Бот продолжает работать. Администратор уведомлен."
-                            send_message(vk, peer_id, error_message)
-                        except Exception as notify_error:
-                            logging.error(f"Не удалось отправить уведомление об ошибке в чат {peer_id}: {notify_error}")
-
-        except Exception as e:
-            logging.critical(f"Критическая ошибка в цикле longpoll.listen() (возможно, проблема с сетью): {e}", exc_info=True)
-            logging.info("Переподключение через 15 секунд...")
-            time.sleep(15)
+    try:
+        asyncio.run(run_bot(vk, vk_session, longpoll, scheduler))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        logging.info("Получен сигнал завершения. Завершаю работу...")
+    finally:
+        scheduler.shutdown(wait=False)
+        db.close_all()
 
 
 if __name__ == '__main__':